@@ -0,0 +1,117 @@
+"""
+Jobs that run on the conversion process pool.
+
+Only the conversion engine and artifact storage are imported here, so pool
+children never have to load the web app, its auth stack or the database
+driver.
+"""
+import hashlib
+
+import numpy as np
+
+import storage
+from xero_converter import (
+    auto_map_columns, currency_exponent, dataframe_from_records, format_frame_chunks, iter_csv_bytes,
+    iter_frame_chunks, iter_records_json, merge_summaries, occurrence_hashes, parse_file_content, parse_file_path,
+    read_records_json, search_entries, summarize, transaction_keys
+)
+
+
+def read_original_dataframe(file_id):
+    """
+    Load a stored dataset, parsing its records a line at a time as storage
+    streams them. The frame itself is built whole, since column types are
+    inferred over every row.
+    """
+    return dataframe_from_records(read_records_json(storage.stream(storage.original_key(file_id))))
+
+
+def write_original_dataframe(file_id, df):
+    """
+    Store the dataset as JSON records, serialized and uploaded a chunk of rows
+    at a time; returns the sha256 of what was written
+    """
+    digest = hashlib.sha256()
+
+    def hashed(chunks):
+        for chunk in chunks:
+            digest.update(chunk)
+            yield chunk
+
+    storage.put(storage.original_key(file_id), hashed(iter_records_json(df)))
+    return digest.hexdigest()
+
+
+def convert_stored_file(file_id, column_mapping, output_key, mapping_defaults=None):
+    """
+    Convert a stored dataset and store the Xero CSV under output_key (skipped
+    when output_key is None). If column_mapping is None the file's
+    auto-mapping is used, with mapping_defaults (e.g. the rule set) applied on top.
+    Returns (column_mapping, row count, derived) as convert_dataframe.
+    """
+    df = read_original_dataframe(file_id)
+    return convert_dataframe(df, column_mapping, output_key, mapping_defaults)
+
+
+def convert_dataframe(df, column_mapping, output_key, mapping_defaults=None):
+    """
+    convert_stored_file for a frame that is already loaded. Returns
+    (column_mapping, row count, derived), where derived holds what the one
+    formatting pass gathers for the indexes: "hashes" (duplicate detection),
+    "search_entries" and "summary".
+    """
+    if column_mapping is None:
+        column_mapping = {**auto_map_columns(df), **(mapping_defaults or {})}
+    exponent = currency_exponent(column_mapping)
+    keys = []
+    entries = []
+    summaries = []
+
+    def indexed(formatted_chunks):
+        for chunk, values in formatted_chunks:
+            keys.append(transaction_keys(chunk, values['units']))
+            entries.extend(search_entries(chunk, values, exponent))
+            summaries.append(summarize(values, exponent))
+            yield chunk
+
+    # Formatted (and indexed) a chunk at a time as the output is written
+    xero_chunks = indexed(format_frame_chunks(iter_frame_chunks(df), column_mapping))
+    if output_key is not None:
+        storage.put(output_key, iter_csv_bytes(xero_chunks))
+    else:
+        for _ in xero_chunks:
+            pass
+    derived = {
+        "hashes": occurrence_hashes(np.concatenate(keys)),
+        "search_entries": entries,
+        "summary": merge_summaries(summaries)
+    }
+    return column_mapping, len(df), derived
+
+
+def ingest_dataframe(file_id, df, mapping_defaults=None):
+    """Store a parsed dataset; returns (dataset hash, derived from its auto-mapping, see convert_dataframe)"""
+    dataset_hash = write_original_dataframe(file_id, df)
+    _, _, derived = convert_dataframe(df, None, None, mapping_defaults)
+    return dataset_hash, derived
+
+
+def ingest_file_content(file_id, file_content, file_type, mapping_defaults=None):
+    """Parse an uploaded file's bytes and store its dataset; returns (dataset hash, derived)"""
+    return ingest_dataframe(file_id, parse_file_content(file_content, file_type), mapping_defaults)
+
+
+def ingest_path(file_id, path, file_type, convert=False, column_mapping=None, output_key=None, mapping_defaults=None):
+    """
+    Parse a file on disk and store its dataset, optionally converting it in
+    the same pass (see convert_stored_file). Returns (dataset hash, the
+    conversion's column mapping, row count, derived); without convert the
+    mapping is None and derived comes from the auto-mapping.
+    """
+    df = parse_file_path(path, file_type)
+    if not convert:
+        dataset_hash, derived = ingest_dataframe(file_id, df, mapping_defaults)
+        return dataset_hash, None, len(df), derived
+    dataset_hash = write_original_dataframe(file_id, df)
+    column_mapping, row_count, derived = convert_dataframe(df, column_mapping, output_key, mapping_defaults)
+    return dataset_hash, column_mapping, row_count, derived
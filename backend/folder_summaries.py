@@ -0,0 +1,99 @@
+"""
+Per-folder rollups of the file summaries (see xero_converter.summary).
+
+One document per user and folder ("root" for unfiled files) in the
+folder_summaries collection holds the running totals: files, rows, debit
+and credit units (at the summaries' amount_exponent, which is stored with
+them), the date span and the per-month sums. Adding, removing,
+moving or re-summarizing a file applies its summary with $inc (and $min /
+$max for the span), so reading a folder's totals is a single lookup and
+never touches datasets. A removal can shrink the span, which $inc can't
+express; the span is then re-read from the folder's file records with two
+sorted lookups on their stored summaries.
+"""
+from pymongo import ASCENDING, DESCENDING
+
+TOTAL_FIELDS = ("rows", "debit_units", "credit_units")
+
+
+def folder_key(folder_id):
+    return folder_id if folder_id and folder_id != "root" else "root"
+
+
+def folder_files_filter(user_id, folder):
+    return {"user_id": user_id, "folder_id": {"$in": [None, "root"]} if folder == "root" else folder}
+
+
+class FolderSummaries:
+    def __init__(self, collection, files):
+        self.collection = collection
+        self.files = files
+        self.indexes_ready = False
+
+    def ensure_indexes(self):
+        if self.indexes_ready:
+            return
+        self.collection.create_index([("user_id", ASCENDING), ("folder_id", ASCENDING)], unique=True)
+        self.indexes_ready = True
+
+    def apply(self, user_id, changes):
+        """
+        Apply (folder_id, summary, sign) changes: sign 1 adds a file's summary
+        to its folder, -1 takes it away. Call after the file records reflect
+        the change, so a shrunken span is re-read correctly.
+        """
+        self.ensure_indexes()
+        updates = {}
+        for folder_id, summary, sign in changes:
+            folder = folder_key(folder_id)
+            update = updates.setdefault(folder, {"$inc": {}, "$min": {}, "$max": {}, "$set": {}, "removed": False})
+            increments = update["$inc"]
+            increments["files"] = increments.get("files", 0) + sign
+            for field in TOTAL_FIELDS:
+                increments[field] = increments.get(field, 0) + sign * summary[field]
+            for month, sums in summary["months"].items():
+                for field in TOTAL_FIELDS:
+                    key = f"months.{month}.{field}"
+                    increments[key] = increments.get(key, 0) + sign * sums[field]
+            if sign < 0:
+                update["removed"] = True
+            else:
+                # The scale of the totals (the same for every summary)
+                update["$set"]["amount_exponent"] = summary["amount_exponent"]
+                if summary["first_date"] is not None:
+                    current = update["$min"].get("first_date")
+                    update["$min"]["first_date"] = min(filter(None, (current, summary["first_date"])))
+                if summary["last_date"] is not None:
+                    current = update["$max"].get("last_date")
+                    update["$max"]["last_date"] = max(filter(None, (current, summary["last_date"])))
+
+        for folder, update in updates.items():
+            removed = update.pop("removed")
+            self.collection.update_one(
+                {"user_id": user_id, "folder_id": folder},
+                {operator: fields for operator, fields in update.items() if fields},
+                upsert=True
+            )
+            if removed:
+                self.refresh_span(user_id, folder)
+
+    def refresh_span(self, user_id, folder):
+        """Re-read the folder's date span from its files' summaries"""
+        query = {**folder_files_filter(user_id, folder), "summary.first_date": {"$ne": None}}
+        projection = {"_id": 0, "summary.first_date": 1, "summary.last_date": 1}
+        first = self.files.find_one(query, projection, sort=[("summary.first_date", ASCENDING)])
+        last = self.files.find_one(query, projection, sort=[("summary.last_date", DESCENDING)])
+        if first:
+            update = {"$set": {"first_date": first["summary"]["first_date"], "last_date": last["summary"]["last_date"]}}
+        else:
+            # No dates left: unset rather than null, since $min would keep a null
+            update = {"$unset": {"first_date": "", "last_date": ""}}
+        self.collection.update_one({"user_id": user_id, "folder_id": folder}, update)
+
+    def get(self, user_id, folder_id):
+        self.ensure_indexes()
+        return self.collection.find_one({"user_id": user_id, "folder_id": folder_key(folder_id)}, {"_id": 0})
+
+    def remove(self, user_id, folder_id):
+        self.ensure_indexes()
+        self.collection.delete_one({"user_id": user_id, "folder_id": folder_key(folder_id)})
@@ -0,0 +1,46 @@
+"""
+Production launcher settings: gunicorn managing uvicorn workers.
+
+    gunicorn -c gunicorn.conf.py server:app
+
+WEB_CONCURRENCY sets the worker count (default: number of CPUs).
+Send SIGHUP to the master for a graceful reload; workers finish their
+in-flight requests (up to GRACEFUL_TIMEOUT seconds) before being replaced.
+"""
+import multiprocessing
+import os
+import shutil
+
+bind = os.environ.get("BIND", "0.0.0.0:8001")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Large uploads and conversions can take a while
+timeout = int(os.environ.get("WORKER_TIMEOUT", "300"))
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+# Recycle workers now and then so slow leaks can't accumulate
+max_requests = int(os.environ.get("MAX_REQUESTS", "2000"))
+max_requests_jitter = max_requests // 10
+
+# Each worker has its own conversion process pool; split the CPUs between them
+os.environ.setdefault("CONVERSION_WORKERS", str(max(1, multiprocessing.cpu_count() // workers)))
+
+accesslog = "-"
+errorlog = "-"
+
+# Prometheus metrics have to be aggregated across worker processes. The
+# directory must be set before any worker imports prometheus_client.
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus_multiproc")
+
+
+def on_starting(server):
+    # Start from a clean slate so metrics from a previous run aren't summed in
+    shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
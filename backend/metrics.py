@@ -0,0 +1,162 @@
+"""
+Prometheus metrics for the converter API.
+
+Exposes request latency per route, per-stage pipeline timings, row
+throughput, bytes ingested, cache hit/miss counts, Mongo command timings,
+storage evictions and worker pool queue depth. server.py serves them at /metrics.
+"""
+import os
+import time
+import functools
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from pymongo import monitoring
+
+# Buckets from 1ms to ~1 minute; conversions of large statements take seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+STAGE_LATENCY = Histogram(
+    "conversion_stage_duration_seconds",
+    "Time spent in each conversion pipeline stage",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+ROWS_PROCESSED = Counter(
+    "conversion_rows_processed_total",
+    "Rows processed per pipeline stage",
+    ["stage"],
+)
+
+ROWS_PER_SECOND = Histogram(
+    "conversion_rows_per_second",
+    "Row throughput of a single pipeline stage call",
+    ["stage"],
+    buckets=(1e2, 1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 5e6),
+)
+
+BYTES_INGESTED = Counter(
+    "ingested_bytes_total",
+    "Bytes of statement data received",
+    ["source"],
+)
+
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Cache lookups by cache and result (hit/miss)",
+    ["cache", "result"],
+)
+
+MONGO_COMMAND_LATENCY = Histogram(
+    "mongo_command_duration_seconds",
+    "MongoDB command latency",
+    ["command", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+
+STORAGE_EVICTIONS = Counter(
+    "storage_evicted_files_total",
+    "Converted outputs removed by the storage sweeper",
+    ["reason"],
+)
+
+STORAGE_EVICTED_BYTES = Counter(
+    "storage_evicted_bytes_total",
+    "Bytes freed by the storage sweeper",
+    ["reason"],
+)
+
+EXECUTOR_QUEUE_DEPTH = Gauge(
+    "executor_queue_depth",
+    "Tasks submitted to a worker pool that have not finished yet",
+    ["executor"],
+    multiprocess_mode="livesum",
+)
+
+
+@contextmanager
+def observe_stage(stage, rows=None):
+    """Time a block as a pipeline stage; optionally count the rows it handled"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.labels(stage).observe(elapsed)
+        if rows is not None:
+            record_rows(stage, rows, elapsed)
+
+
+def record_rows(stage, rows, elapsed):
+    ROWS_PROCESSED.labels(stage).inc(rows)
+    if elapsed > 0 and rows:
+        ROWS_PER_SECOND.labels(stage).observe(rows / elapsed)
+
+
+def timed_stage(stage, count_rows=False):
+    """
+    Decorator form of observe_stage. With count_rows=True the length of the
+    returned dataframe is recorded as the stage's row count.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+            STAGE_LATENCY.labels(stage).observe(elapsed)
+            if count_rows and hasattr(result, "__len__"):
+                record_rows(stage, len(result), elapsed)
+            return result
+        return wrapper
+    return decorator
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo command listener that times every command sent to the server"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_LATENCY.labels(event.command_name, "success").observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        MONGO_COMMAND_LATENCY.labels(event.command_name, "failure").observe(event.duration_micros / 1e6)
+
+
+async def track_executor(executor_name, awaitable):
+    """Count a worker pool task in the queue depth gauge until it finishes"""
+    gauge = EXECUTOR_QUEUE_DEPTH.labels(executor_name)
+    gauge.inc()
+    try:
+        return await awaitable
+    finally:
+        gauge.dec()
+
+
+def render_metrics():
+    """
+    Return (body, content_type) for the /metrics endpoint. Under the
+    multi-worker launcher (PROMETHEUS_MULTIPROC_DIR set) every worker's
+    samples are aggregated.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
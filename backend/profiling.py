@@ -0,0 +1,61 @@
+"""
+Sampling profiler for individual requests.
+
+A background thread samples the stack of the thread serving the request
+every few milliseconds and aggregates the samples as collapsed stacks
+("frame;frame;frame count" per line), which speedscope and
+flamegraph.pl both read. Nothing runs unless a profile is started.
+
+Only the one thread is sampled. In the server that is the event-loop
+thread, so samples include any other request the worker serves meanwhile,
+and work handed to another thread or process does not appear at all.
+"""
+import os
+import sys
+import threading
+from collections import Counter
+
+DEFAULT_INTERVAL = 0.005  # seconds between samples
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class SamplingProfiler:
+    def __init__(self, thread_id=None, interval=DEFAULT_INTERVAL):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.samples = Counter()
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            # Collapsed stacks are written root first
+            self.samples[";".join(reversed(stack))] += 1
+            self.sample_count += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def collapsed(self):
+        """Samples in collapsed-stack format, heaviest stacks first"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
@@ -1,26 +1,38 @@
 import os
-import pandas as pd
-import numpy as np
 import uuid
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Form, Body
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Form, Body, Header, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from starlette.datastructures import Headers, MutableHeaders
 from pydantic import BaseModel, EmailStr, Field
 from typing import List, Dict, Optional, Any, Union
 from datetime import datetime, timedelta
-from passlib.context import CryptContext
-from jose import JWTError, jwt
+import pymongo
 from pymongo import MongoClient
-import re
-import io
+from pymongo.errors import BulkWriteError
 import json
-from bson.json_util import dumps
-from openpyxl import load_workbook
+import functools
+import asyncio
+import time
+import hashlib
+import zipfile
+import tempfile
+from urllib.parse import parse_qs, quote
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from metrics import (
+    BYTES_INGESTED, REQUEST_LATENCY, STORAGE_EVICTED_BYTES, STORAGE_EVICTIONS, MongoCommandMetrics,
+    observe_stage, record_cache, render_metrics, timed_stage, track_executor
+)
+from profiling import SamplingProfiler
+import storage
 
 # Set up MongoDB connection
 MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
 DB_NAME = os.environ.get("DB_NAME", "xero_converter")
-client = MongoClient(MONGO_URL)
+client = MongoClient(MONGO_URL, event_listeners=[MongoCommandMetrics()])
 db = client[DB_NAME]
 
 # Set up FastAPI app
@@ -33,15 +45,43 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
+# Compress large responses: brotli when the optional brotli-asgi package is
+# installed (falling back to gzip for clients without br), plain gzip otherwise
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))
+try:
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, quality=4, minimum_size=COMPRESSION_MIN_BYTES, gzip_fallback=True)
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_BYTES, compresslevel=6)
+
+# Record request latency per route template
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        route_path = route.path if route is not None else "unmatched"
+        REQUEST_LATENCY.labels(request.method, route_path, str(status)).observe(time.perf_counter() - start)
+
 # Set up JWT authentication
 SECRET_KEY = os.environ.get("SECRET_KEY", "a_very_secret_key_for_development_only")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 1 day
 
-# Set up password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Set up password hashing (passlib/bcrypt are loaded on first use)
+@functools.lru_cache(maxsize=None)
+def get_pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/token")
 
 # Models
@@ -125,12 +165,28 @@ class ConversionRequest(BaseModel):
     column_mappings: List[ColumnMapping]
     formatted_filename: Optional[str] = None
 
+class DCRule(BaseModel):
+    match: str = "exact"
+    pattern: str
+    side: str
+    priority: int = 100
+
+class RuleSetCreate(BaseModel):
+    name: str
+    rules: List[DCRule]
+    is_default: bool = False
+
+class RuleExplainRequest(BaseModel):
+    values: List[Optional[str]]
+    rule_set_id: Optional[str] = None
+    rules: Optional[List[DCRule]] = None
+
 # Helper functions
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def get_user(email):
     user_data = db.users.find_one({"email": email})
@@ -158,28 +214,128 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
+    from jose import jwt
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
-    credentials_exception = HTTPException(
-        status_code=401,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+def get_user_from_token(token):
+    """Resolve a JWT access token to a user, or None if it is invalid"""
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
-            raise credentials_exception
+            return None
         token_data = TokenData(email=email)
     except JWTError:
-        raise credentials_exception
-    user = get_user(email=token_data.email)
+        return None
+    return get_user(email=token_data.email)
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    credentials_exception = HTTPException(
+        status_code=401,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    user = get_user_from_token(token)
     if user is None:
         raise credentials_exception
     return user
 
+# Admin accounts (comma-separated emails) can profile requests and read profiles
+ADMIN_EMAILS = {email.strip().lower() for email in os.environ.get("ADMIN_EMAILS", "").split(",") if email.strip()}
+
+def is_admin(user):
+    return user is not None and user.email.lower() in ADMIN_EMAILS
+
+async def get_admin_user(current_user: User = Depends(get_current_user)):
+    if not is_admin(current_user):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+# Opt-in request profiling: admins send "X-Profile: 1" (or ?profile=1) to one of
+# these routes and the request runs under the sampling profiler. Profiles are
+# kept in artifact storage so any instance can serve them. The middleware is
+# only installed when ADMIN_EMAILS names someone who could profile, so it
+# costs nothing otherwise.
+#
+# The profiler samples the event-loop thread, which serves every request on
+# this worker, and not the conversion pool's processes. A profile is only the
+# request's own work while the worker is otherwise idle, so each one records
+# how many other requests overlapped it; profile against an idle worker.
+PROFILED_ROUTES = {"/api/upload", "/api/preview", "/api/convert"}
+_requests_in_flight = 0
+_running_profiles = []
+
+def profile_requested(scope):
+    if scope["path"] not in PROFILED_ROUTES:
+        return False
+    if (b"x-profile", b"1") in scope["headers"]:
+        return True
+    return parse_qs(scope["query_string"].decode("latin-1")).get("profile") == ["1"]
+
+class RequestProfiler:
+    """Pure ASGI middleware: other requests pass straight through, only counted"""
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        global _requests_in_flight
+        for profile in _running_profiles:
+            profile["overlapping_requests"] += 1
+        _requests_in_flight += 1
+        try:
+            if profile_requested(scope):
+                await self.profile(scope, receive, send)
+            else:
+                await self.app(scope, receive, send)
+        finally:
+            _requests_in_flight -= 1
+    
+    async def profile(self, scope, receive, send):
+        authorization = Headers(scope=scope).get("authorization", "")
+        user = get_user_from_token(authorization[7:]) if authorization.lower().startswith("bearer ") else None
+        if not is_admin(user):
+            response = JSONResponse(status_code=403, content={"detail": "Profiling requires an admin account"})
+            return await response(scope, receive, send)
+        
+        profile_id = str(uuid.uuid4())
+        running = {"overlapping_requests": _requests_in_flight - 1, "status_code": 500}
+        
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                running["status_code"] = message["status"]
+                MutableHeaders(scope=message)["X-Profile-Id"] = profile_id
+            await send(message)
+        
+        _running_profiles.append(running)
+        profiler = SamplingProfiler().start()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profiler.stop()
+            _running_profiles.remove(running)
+        duration = time.perf_counter() - start
+        
+        # Store the collapsed stacks for later retrieval
+        storage.put(storage.profile_key(profile_id), [profiler.collapsed().encode()])
+        db.profiles.insert_one({
+            "id": profile_id,
+            "user_id": user.id,
+            "route": scope["path"],
+            "status_code": running["status_code"],
+            "duration_seconds": duration,
+            "sample_count": profiler.sample_count,
+            "overlapping_requests": running["overlapping_requests"],
+            "created_at": datetime.utcnow()
+        })
+
+if ADMIN_EMAILS:
+    app.add_middleware(RequestProfiler)
+
 # Routes for authentication
 @app.post("/api/register", response_model=UserResponse)
 async def register(user_create: UserCreate):
@@ -229,219 +385,526 @@ async def read_users_me(current_user: User = Depends(get_current_user)):
         "created_at": current_user.created_at
     }
 
-# File parsing helper functions
+# Conversion engine. xero_converter pulls in pandas/numpy, so it is only
+# imported the first time a conversion actually runs; auth and folder
+# endpoints (and worker boot) never pay for it.
+def _engine():
+    import xero_converter
+    return xero_converter
+
+def _worker_jobs():
+    import conversion_worker
+    return conversion_worker
+
+def _rules():
+    from xero_converter import dc_rules
+    return dc_rules
+
+_transaction_index = None
+
+def get_transaction_index():
+    """Duplicate-detection index (transaction_index loads numpy, so it is created on first use)"""
+    global _transaction_index
+    if _transaction_index is None or _transaction_index.collection.database is not db:
+        from transaction_index import TransactionIndex
+        _transaction_index = TransactionIndex(db.transaction_hashes)
+    return _transaction_index
+
+_transaction_search = None
+
+def get_transaction_search():
+    """Transaction search index (see transaction_search), created on first use"""
+    global _transaction_search
+    if _transaction_search is None or _transaction_search.collection.database is not db:
+        from transaction_search import TransactionSearch
+        _transaction_search = TransactionSearch(db.transaction_search)
+    return _transaction_search
+
+_folder_summaries = None
+
+def get_folder_summaries():
+    """Per-folder totals (see folder_summaries)"""
+    global _folder_summaries
+    if _folder_summaries is None or _folder_summaries.collection.database is not db:
+        from folder_summaries import FolderSummaries
+        _folder_summaries = FolderSummaries(db.folder_summaries, db.files)
+    return _folder_summaries
+
+@timed_stage("parse", count_rows=True)
 def parse_file_content(file_content, file_type):
-    if file_type == "csv":
-        # Parse CSV with pandas
-        df = pd.read_csv(io.StringIO(file_content.decode('utf-8')))
-    elif file_type == "xlsx":
-        # Parse XLSX with pandas
-        df = pd.read_excel(io.BytesIO(file_content))
-    else:
-        raise HTTPException(status_code=400, detail="Unsupported file type")
+    return _engine().parse_file_content(file_content, file_type)
+
+@timed_stage("parse", count_rows=True)
+def parse_file_path(file_path, file_type):
+    return _engine().parse_file_path(file_path, file_type)
+
+@timed_stage("auto_map")
+def auto_map_columns(df):
+    return _engine().auto_map_columns(df)
+
+@timed_stage("format", count_rows=True)
+def apply_xero_format(df, column_mapping):
+    return _engine().apply_xero_format(df, column_mapping)
+
+def format_frame(df, column_mapping):
+    """apply_xero_format, also returning the parsed dates and amounts (see xero_converter.format_frame)"""
+    with observe_stage("format", rows=len(df)):
+        return _engine().format_frame(df, column_mapping)
+
+@timed_stage("serialize", count_rows=True)
+def safe_json_serialize(df):
+    return _engine().safe_json_serialize(df)
+
+# Recently loaded datasets by dataset hash, most recent last. Stored datasets
+# never change, and an entry is only reachable through a file record carrying
+# its hash, so a file deleted on another worker can't be served from this
+# worker's cache; its entry just ages out.
+DATASET_CACHE_SIZE = int(os.environ.get("DATASET_CACHE_SIZE", "4"))
+_dataset_cache = OrderedDict()
+
+def load_original_dataframe(file_record):
+    """Load the stored original dataset for a file record (callers must not mutate the result)"""
+    dataset_hash = get_dataset_hash(file_record)
+    df = _dataset_cache.get(dataset_hash) if dataset_hash else None
+    record_cache("dataset", df is not None)
+    if df is not None:
+        _dataset_cache.move_to_end(dataset_hash)
+        return df
     
-    # Replace NaN, Infinity, and -Infinity with None to avoid JSON serialization issues
-    df = df.replace([float('inf'), -float('inf'), float('nan')], None)
+    with observe_stage("load"):
+        df = _worker_jobs().read_original_dataframe(file_record["id"])
     
+    if DATASET_CACHE_SIZE > 0 and dataset_hash:
+        _dataset_cache[dataset_hash] = df
+        while len(_dataset_cache) > DATASET_CACHE_SIZE:
+            _dataset_cache.popitem(last=False)
     return df
 
-def format_date(date_str):
-    try:
-        # Try to parse the date using pandas
-        date = pd.to_datetime(date_str)
-        return date.strftime('%d/%m/%Y')
-    except:
-        # Return the original string if parsing fails
-        return date_str
-
-def format_amount(amount_str, reference_str=None):
+@timed_stage("store")
+def store_original_dataframe(file_id, df):
+    """Persist the parsed dataset so it can be re-mapped and converted later; returns its sha256"""
+    return _worker_jobs().write_original_dataframe(file_id, df)
+
+def build_file_record(file_id, filename, file_type, file_size, folder_id, current_user, dataset_hash=None):
+    return {
+        "id": file_id,
+        "user_id": current_user.id,
+        "folder_id": folder_id if folder_id else None,
+        "original_filename": filename,
+        "file_type": file_type,
+        "size_bytes": file_size,
+        "dataset_hash": dataset_hash,
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    }
+
+# Conditional GETs. ETags are derived from the stored dataset's hash and the
+# column mapping, so a revisit with an unchanged mapping costs one Mongo
+# lookup instead of a reformat. Bump ETAG_VERSION when the converter's output
+# changes for the same input so clients drop their cached copies.
+ETAG_VERSION = "3"
+CONDITIONAL_CACHE_HEADERS = {"Cache-Control": "private, no-cache"}
+
+def hash_stored_object(key):
+    digest = hashlib.sha256()
+    for chunk in storage.stream(key):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_mapping(column_mapping):
+    return hashlib.sha256(json.dumps(column_mapping, sort_keys=True).encode()).hexdigest()
+
+def get_dataset_hash(file_record):
     """
-    Format amount for Xero based on reference value:
-    - If reference contains "C", "CR", or "Credit" -> Keep amount POSITIVE (no prefix)
-    - If reference contains "D", "DB", or "Debit" -> Add NEGATIVE prefix (-)
-    - If no reference provided, keep original behavior
+    sha256 of a file's stored dataset. Records created before hashes were
+    stored are hashed on first use and backfilled; returns None if the
+    dataset is missing.
     """
-    # Convert to string if not already
-    amount_str = str(amount_str) if amount_str is not None else ""
+    dataset_hash = file_record.get("dataset_hash")
+    if dataset_hash:
+        return dataset_hash
+    original_key = storage.original_key(file_record["id"])
+    if not storage.exists(original_key):
+        return None
+    dataset_hash = hash_stored_object(original_key)
+    db.files.update_one({"id": file_record["id"]}, {"$set": {"dataset_hash": dataset_hash}})
+    return dataset_hash
+
+def make_etag(dataset_hash, *parts):
+    digest = hashlib.sha256("\0".join([ETAG_VERSION, dataset_hash, *parts]).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+def etag_matches(request, etag):
+    """If-None-Match check (weak comparison, since nginx weakens ETags when it compresses)"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+def not_modified(etag):
+    return Response(status_code=304, headers={"ETag": etag, **CONDITIONAL_CACHE_HEADERS})
+
+def etag_headers(etag):
+    return {"ETag": etag, **CONDITIONAL_CACHE_HEADERS} if etag else {}
+
+def ingest_dataframe(df, filename, file_type, file_size, folder_id, current_user):
+    """Auto-map and store a parsed upload; returns the upload response payload"""
+    # Auto-map columns
+    column_mapping = resolve_rule_set(auto_map_columns(df), current_user)
     
-    # Remove all punctuation except for the decimal point
-    cleaned_amount = re.sub(r'[^\d.-]', '', amount_str)
+    # Get column names for frontend display
+    original_columns = df.columns.tolist()
     
-    try:
-        # Convert to float
-        amount = float(cleaned_amount)
-        
-        # Check reference if provided
-        if reference_str is not None and isinstance(reference_str, str):
-            reference_lower = reference_str.lower()
-            
-            # Reference indicates Credit -> keep as POSITIVE (remove any minus)
-            if any(term in reference_lower for term in ['c', 'cr', 'credit']):
-                if amount < 0:  # Remove minus if negative
-                    return cleaned_amount.replace('-', '')
-                return cleaned_amount
-            
-            # Reference indicates Debit -> make NEGATIVE (add minus prefix)
-            elif any(term in reference_lower for term in ['d', 'db', 'debit']):
-                if amount > 0:  # Only add minus if positive
-                    return f"-{cleaned_amount}"
-                return cleaned_amount
-        
-        # Default behavior (no reference or unrecognized reference)
-        # Keep as is
-        return cleaned_amount
-    except:
-        return amount_str
-
-def add_reference_code(amount_str, transaction_type=None):
-    """
-    Determine if a transaction is a debit or credit based on:
-    1. The transaction type column if provided (db/dr/debit = D, cr/credit = C)
-    2. The amount value (negative = D, positive = C) if transaction type not provided or not recognized
-    """
-    # First check if there's a transaction type provided
-    if transaction_type is not None and isinstance(transaction_type, str):
-        transaction_type = transaction_type.lower().strip()
-        
-        # Check for debit indicators
-        if transaction_type in ['db', 'dr', 'debit', 'dbt', 'debited', 'd']:
-            return "D"
-        
-        # Check for credit indicators
-        if transaction_type in ['cr', 'credit', 'cdt', 'credited', 'c']:
-            return "C"
+    # Apply Xero format using the auto-mapping
+    xero_df, values = format_frame(df, column_mapping)
     
-    # Fall back to amount-based detection if transaction type not recognized
-    try:
-        amount = float(str(amount_str).replace(',', ''))
-        return "D" if amount < 0 else "C"
-    except:
-        return ""
-
-def auto_map_columns(df):
-    """Auto-map columns to Xero format based on content analysis"""
-    column_mapping = {}
-    columns = df.columns.tolist()
-    
-    # Look for date column
-    date_candidates = [col for col in columns if any(term in col.lower() for term in ['date', 'dt', 'day'])]
-    if date_candidates:
-        column_mapping['A'] = date_candidates[0]
-    else:
-        # Try to find a column with date-like values
-        for col in columns:
-            if df[col].dtype == 'object':
-                sample = df[col].dropna().iloc[0] if not df[col].dropna().empty else None
-                if sample and isinstance(sample, str) and re.search(r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}', sample):
-                    column_mapping['A'] = col
-                    break
-    
-    # Look for cheque/reference number
-    cheque_candidates = [col for col in columns if any(term in col.lower() for term in ['cheque', 'check', 'ref', 'reference', 'no', 'num', 'number', 'id'])]
-    if cheque_candidates:
-        column_mapping['B'] = cheque_candidates[0]
-    
-    # Look for description
-    desc_candidates = [col for col in columns if any(term in col.lower() for term in ['desc', 'narration', 'details', 'memo', 'note', 'particular', 'narr', 'transaction', 'name'])]
-    if desc_candidates:
-        column_mapping['C'] = desc_candidates[0]
-    
-    # Look for amount
-    amount_candidates = [col for col in columns if any(term in col.lower() for term in ['amount', 'sum', 'value', 'debit', 'credit', 'amt'])]
-    if amount_candidates:
-        column_mapping['D'] = amount_candidates[0]
-    
-    # Look for transaction type column (for reference field)
-    type_candidates = [col for col in columns if any(term in col.lower() for term in ['type', 'transaction type', 'tr type', 'db/cr', 'dr/cr', 'debit/credit'])]
-    if type_candidates:
-        column_mapping['transaction_type'] = type_candidates[0]
-    
-    # If we couldn't find specific columns, make best guesses
-    if 'A' not in column_mapping and len(columns) > 0:
-        column_mapping['A'] = columns[0]  # First column often contains dates
-    
-    if 'B' not in column_mapping and len(columns) > 1:
-        column_mapping['B'] = columns[1]
-    
-    if 'C' not in column_mapping and len(columns) > 2:
-        column_mapping['C'] = columns[2]
-    
-    if 'D' not in column_mapping and len(columns) > 3:
-        # Look for numeric columns for amount
-        numeric_cols = [col for col in columns if pd.api.types.is_numeric_dtype(df[col])]
-        if numeric_cols:
-            column_mapping['D'] = numeric_cols[0]
-        else:
-            column_mapping['D'] = columns[3] if len(columns) > 3 else ""
+    # Generate a unique file ID
+    file_id = str(uuid.uuid4())
     
-    # For reference, we'll derive it from the amount and transaction type if available
-    if 'D' in column_mapping:
-        column_mapping['E'] = column_mapping['D']  # Reference will be derived from amount and transaction type
+    # Store the dataframe for later use
+    dataset_hash = store_original_dataframe(file_id, df)
     
-    return column_mapping
-
-def apply_xero_format(df, column_mapping):
-    """Apply Xero formatting rules to the data"""
-    xero_df = pd.DataFrame()
+    # Store file metadata in database, with its summary
+    file_record = build_file_record(file_id, filename, file_type, file_size, folder_id, current_user, dataset_hash)
+    exponent = _engine().currency_exponent(column_mapping)
+    file_record["summary"] = _engine().summarize(values, exponent)
     
-    # Check if we're using a transaction type column
-    has_transaction_type = 'transaction_type' in column_mapping and column_mapping['transaction_type']
+    db.files.insert_one(file_record)
     
-    # Format date (Column A)
-    if 'A' in column_mapping and column_mapping['A']:
-        xero_df['Date'] = df[column_mapping['A']].apply(format_date)
-    else:
-        xero_df['Date'] = ""
+    # Make its transactions searchable and add it to the folder totals
+    index_search_entries(file_record, _engine().search_entries(xero_df, values, exponent))
+    rollup_summaries(current_user.id, [(folder_id, file_record["summary"], 1)])
     
-    # Add Cheque No. (Column B)
-    if 'B' in column_mapping and column_mapping['B']:
-        xero_df['Cheque No.'] = df[column_mapping['B']]
-    else:
-        xero_df['Cheque No.'] = ""
+    # Prepare response
+    response = {
+        "file_id": file_id,
+        "original_filename": filename,
+        "file_type": file_type,
+        "size_bytes": file_size,
+        "folder_id": folder_id,
+        "created_at": file_record["created_at"].isoformat(),
+        "original_data": safe_json_serialize(df.head(50)),
+        "formatted_data": safe_json_serialize(xero_df.head(50)),
+        "original_columns": original_columns,
+        "column_mapping": column_mapping
+    }
     
-    # Add Description (Column C)
-    if 'C' in column_mapping and column_mapping['C']:
-        xero_df['Description'] = df[column_mapping['C']]
-    else:
-        xero_df['Description'] = ""
-    
-    # Format Amount (Column D)
-    if 'D' in column_mapping and column_mapping['D']:
-        # If we have a transaction type column, use it for reference-based formatting
-        if has_transaction_type:
-            xero_df['Amount'] = df.apply(
-                lambda row: format_amount(
-                    row[column_mapping['D']], 
-                    row[column_mapping['transaction_type']] if pd.notna(row[column_mapping['transaction_type']]) else None
-                ), 
-                axis=1
-            )
-        else:
-            # No reference column, use default formatting
-            xero_df['Amount'] = df[column_mapping['D']].apply(lambda x: format_amount(x, None))
-    else:
-        xero_df['Amount'] = ""
-    
-    # Add Reference (Column E) - derived from Amount and Transaction Type if available
-    if 'D' in column_mapping and column_mapping['D']:
-        if has_transaction_type:
-            # We have both amount and transaction type
-            xero_df['Reference'] = df.apply(
-                lambda row: add_reference_code(
-                    row[column_mapping['D']], 
-                    row[column_mapping['transaction_type']] if pd.notna(row[column_mapping['transaction_type']]) else None
-                ), 
-                axis=1
-            )
-        else:
-            # We only have amount
-            xero_df['Reference'] = df[column_mapping['D']].apply(add_reference_code)
-    else:
-        xero_df['Reference'] = ""
+    return response
+
+def get_formatted_filename(original_filename, formatted_filename=None):
+    """Default output name is <original>_formatted.csv; always ends in .csv"""
+    if not formatted_filename:
+        return f"{original_filename.split('.')[0]}_formatted.csv"
+    if not formatted_filename.endswith('.csv'):
+        return formatted_filename + '.csv'
+    return formatted_filename
+
+def build_conversion_record(file_record, formatted_filename, column_mapping, current_user):
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": current_user.id,
+        "file_id": file_record["id"],
+        "original_filename": file_record["original_filename"],
+        "formatted_filename": formatted_filename,
+        "column_mapping": column_mapping,
+        "dataset_hash": get_dataset_hash(file_record),
+        "created_at": datetime.utcnow()
+    }
+
+# Duplicate detection against earlier conversions (see transaction_index):
+# "ignore" skips the check, "flag" reports duplicate rows, "drop" also
+# leaves them out of the output
+DUPLICATE_MODES = ("ignore", "flag", "drop")
+
+def duplicate_account(file_record, column_mapping):
+    """Statements are compared within an account: the mapping's "account", else the file's folder"""
+    return str(column_mapping.get("account") or file_record.get("folder_id") or "root")
+
+def check_duplicates(xero_df, values, column_mapping, file_record, current_user, mode):
+    """
+    Hash the formatted rows (with the values format_frame parsed them from)
+    and look them up in the index. Returns
+    (xero_df, hashes, duplicates): with mode "drop" the frame loses its
+    duplicate rows, and duplicates (None for "ignore") reports them by
+    row position in the original data.
+    """
+    hashes = _engine().transaction_hashes(xero_df, values["units"])
+    if mode == "ignore":
+        return xero_df, hashes, None
     
-    return xero_df
+    seen = get_transaction_index().find_seen(
+        current_user.id, duplicate_account(file_record, column_mapping), hashes, exclude_file_id=file_record["id"]
+    )
+    rows = [int(row) for row in seen.nonzero()[0]]
+    if mode == "drop" and rows:
+        xero_df = xero_df[~seen]
+    return xero_df, hashes, {"mode": mode, "count": len(rows), "rows": rows}
+
+def index_conversion(file_record, column_mapping, hashes, conversion_id, current_user):
+    """Add a conversion's rows to the duplicate index"""
+    if hashes is not None and len(hashes):
+        get_transaction_index().add(
+            current_user.id, duplicate_account(file_record, column_mapping), hashes, file_record["id"], conversion_id
+        )
+
+def index_search_entries(file_record, entries):
+    """Replace the file's rows in the transaction search index"""
+    if entries is not None:
+        get_transaction_search().index_file(file_record["user_id"], file_record["id"], entries)
+
+def rollup_summaries(user_id, changes):
+    """Apply (folder_id, summary, sign) changes to the folder totals; files without a summary are skipped"""
+    changes = [change for change in changes if change[1]]
+    if changes:
+        get_folder_summaries().apply(user_id, changes)
+
+def set_file_summary(file_record, summary):
+    """Store a file's new summary and move its folder's totals from the old one"""
+    if summary is None or file_record.get("summary") == summary:
+        return
+    db.files.update_one({"id": file_record["id"]}, {"$set": {"summary": summary}})
+    rollup_summaries(file_record["user_id"], [
+        (file_record.get("folder_id"), file_record.get("summary"), -1),
+        (file_record.get("folder_id"), summary, 1)
+    ])
+    file_record["summary"] = summary
+
+def parse_column_mapping(column_mappings):
+    """The column_mappings form field as a dict; 400 if it isn't a JSON object"""
+    try:
+        column_mapping = json.loads(column_mappings)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="column_mappings must be valid JSON")
+    if not isinstance(column_mapping, dict):
+        raise HTTPException(status_code=400, detail="column_mappings must be a JSON object")
+    return column_mapping
+
+def resolve_rule_set(column_mapping, current_user):
+    """
+    Attach the debit/credit rules a conversion should use to its mapping, so
+    they travel with it to the worker, into the conversion record and into
+    ETags. In order: the mapping's rule_set_id, rules given inline as
+    "dc_rules", the user's default rule set; otherwise the engine's default
+    rules apply. A currency_exponent the engine can't use is a 400.
+    """
+    column_mapping = dict(column_mapping)
+    if "currency_exponent" in column_mapping:
+        try:
+            _engine().currency_exponent(column_mapping)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    rule_set_id = column_mapping.get("rule_set_id")
+    if rule_set_id:
+        rule_set = db.rule_sets.find_one({"id": rule_set_id, "user_id": current_user.id})
+        if not rule_set:
+            raise HTTPException(status_code=400, detail="Rule set not found")
+        column_mapping["dc_rules"] = rule_set["rules"]
+    elif column_mapping.get("dc_rules") is not None:
+        try:
+            column_mapping["dc_rules"] = _rules().normalize_rules(column_mapping["dc_rules"])
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        rule_set = db.rule_sets.find_one({"user_id": current_user.id, "is_default": True})
+        if rule_set:
+            column_mapping["rule_set_id"] = rule_set["id"]
+            column_mapping["dc_rules"] = rule_set["rules"]
+    return column_mapping
+
+# Worker pool for CPU-bound conversions (created on first use)
+CONVERSION_WORKERS = int(os.environ.get("CONVERSION_WORKERS", os.cpu_count() or 1))
+_conversion_executor = None
+
+def get_conversion_executor():
+    global _conversion_executor
+    if _conversion_executor is None:
+        _conversion_executor = ProcessPoolExecutor(max_workers=CONVERSION_WORKERS)
+    return _conversion_executor
+
+def run_in_conversion_pool(func, *args):
+    """Run func on the conversion pool; awaitable, counted in the queue depth metric"""
+    loop = asyncio.get_running_loop()
+    return track_executor("conversion", loop.run_in_executor(get_conversion_executor(), func, *args))
+
+@app.on_event("shutdown")
+def shutdown_conversion_executor():
+    if _conversion_executor is not None:
+        _conversion_executor.shutdown(wait=False, cancel_futures=True)
 
 # Routes for file conversion
+def get_upload_file_type(filename):
+    """Map a (lowercased) upload filename to csv, csv.gz, xlsx or zip; None if unsupported"""
+    if filename.endswith('.csv.gz'):
+        return "csv.gz"
+    if filename.endswith('.csv'):
+        return "csv"
+    if filename.endswith('.xlsx'):
+        return "xlsx"
+    if filename.endswith('.zip'):
+        return "zip"
+    return None
+
+def insert_file_records(pending, results):
+    """
+    Store queued file records with a single unordered bulk insert.
+    pending holds (file_record, index into results, derived), derived being
+    what ingest gathered (see conversion_worker.convert_dataframe) or None.
+    Records are stored with their summary; failed documents are mapped back
+    to their result entry and their stored dataset is removed, the rest are
+    indexed for search and added to their folder's totals.
+    """
+    if not pending:
+        return
+    for file_record, _, derived in pending:
+        if derived is not None:
+            file_record["summary"] = derived["summary"]
+    failed = set()
+    try:
+        db.files.insert_many([file_record for file_record, _, _ in pending], ordered=False)
+    except BulkWriteError as bwe:
+        for error in bwe.details.get("writeErrors", []):
+            file_record, result_index, _ = pending[error["index"]]
+            failed.add(error["index"])
+            results[result_index] = {
+                "filename": file_record["original_filename"],
+                "success": False,
+                "error": error.get("errmsg", "Failed to store file metadata")
+            }
+            storage.delete(storage.original_key(file_record["id"]))
+    rollups = {}
+    for index, (file_record, _, derived) in enumerate(pending):
+        if index not in failed and derived is not None:
+            index_search_entries(file_record, derived["search_entries"])
+            rollups.setdefault(file_record["user_id"], []).append((file_record["folder_id"], derived["summary"], 1))
+    for user_id, changes in rollups.items():
+        rollup_summaries(user_id, changes)
+
+# Limits on what a ZIP may expand to. Sizes are checked against the member
+# headers before anything is decompressed (zipfile never returns more than
+# the declared size), so a small archive can't inflate into gigabytes.
+ARCHIVE_MAX_MEMBER_BYTES = int(os.environ.get("ARCHIVE_MAX_MEMBER_BYTES", 512 * 1024 * 1024))
+ARCHIVE_MAX_TOTAL_BYTES = int(os.environ.get("ARCHIVE_MAX_TOTAL_BYTES", 2 * 1024 * 1024 * 1024))
+ARCHIVE_MAX_COMPRESSION_RATIO = int(os.environ.get("ARCHIVE_MAX_COMPRESSION_RATIO", 100))
+# Small members may compress very well legitimately; the ratio only applies above this
+ARCHIVE_RATIO_MIN_BYTES = 1024 * 1024
+# Members are decompressed to disk this many bytes at a time
+ARCHIVE_COPY_CHUNK_BYTES = 1024 * 1024
+
+def archive_member_error(info, expanded_bytes):
+    """Why a member must not be decompressed, or None"""
+    if info.file_size > ARCHIVE_MAX_MEMBER_BYTES:
+        return f"File is larger than {ARCHIVE_MAX_MEMBER_BYTES} bytes uncompressed"
+    if expanded_bytes + info.file_size > ARCHIVE_MAX_TOTAL_BYTES:
+        return f"Archive expands to more than {ARCHIVE_MAX_TOTAL_BYTES} bytes"
+    if info.file_size > ARCHIVE_RATIO_MIN_BYTES and info.file_size > info.compress_size * ARCHIVE_MAX_COMPRESSION_RATIO:
+        return f"File compresses more than {ARCHIVE_MAX_COMPRESSION_RATIO}:1"
+    return None
+
+def spool_archive_member(zf, info, path):
+    """Decompress a member to path a chunk at a time, stopping if it expands past its size limit"""
+    limit = min(info.file_size, ARCHIVE_MAX_MEMBER_BYTES)
+    written = 0
+    with zf.open(info) as member, open(path, "wb") as out:
+        while True:
+            chunk = member.read(ARCHIVE_COPY_CHUNK_BYTES)
+            if not chunk:
+                break
+            written += len(chunk)
+            if written > limit:
+                raise ValueError(f"File expands past its declared size of {info.file_size} bytes")
+            out.write(chunk)
+
+async def ingest_zip_archive(fileobj, archive_name, folder_id, current_user, results, pending):
+    """
+    Ingest every CSV/XLSX member of a ZIP. Members are decompressed one at a
+    time, in bounded chunks, to a temporary file that the worker pool parses
+    from disk; at most two members per worker are spooled at once, and none
+    is held in memory whole. Members over the ARCHIVE_MAX_* limits are
+    reported as failed without being read. Appends one entry per member to
+    results (same shape as bulk-upload).
+    """
+    with tempfile.TemporaryDirectory(prefix="archive_") as spool_dir:
+        await ingest_zip_members(fileobj, archive_name, spool_dir, folder_id, current_user, results, pending)
+
+async def ingest_zip_members(fileobj, archive_name, spool_dir, folder_id, current_user, results, pending):
+    loop = asyncio.get_running_loop()
+    in_flight = asyncio.Semaphore(CONVERSION_WORKERS * 2)
+    # Search entries and summaries come from each member's auto-mapping with the user's rule set
+    rule_defaults = resolve_rule_set({}, current_user)
+
+    async def run_member(file_id, path, file_type):
+        try:
+            dataset_hash, _, _, derived = await run_in_conversion_pool(
+                _worker_jobs().ingest_path, file_id, path, file_type, False, None, None, rule_defaults
+            )
+            return dataset_hash, derived
+        finally:
+            os.remove(path)
+            in_flight.release()
+
+    jobs = []
+    expanded_bytes = 0
+    with zipfile.ZipFile(fileobj) as zf:
+        for info in zf.infolist():
+            member_name = os.path.basename(info.filename).lower()
+            # Skip directories and OS metadata entries
+            if info.is_dir() or not member_name or member_name.startswith('.') or info.filename.startswith('__MACOSX/'):
+                continue
+
+            member_type = get_upload_file_type(member_name)
+            if member_type not in ("csv", "csv.gz", "xlsx"):
+                results.append({
+                    "filename": member_name,
+                    "archive": archive_name,
+                    "success": False,
+                    "error": "Unsupported file type. Only CSV and XLSX files are supported."
+                })
+                continue
+
+            error = archive_member_error(info, expanded_bytes)
+            if error:
+                results.append({"filename": member_name, "archive": archive_name, "success": False, "error": error})
+                continue
+            expanded_bytes += info.file_size
+
+            await in_flight.acquire()
+            file_id = str(uuid.uuid4())
+            path = os.path.join(spool_dir, f"{file_id}.{member_type}")
+            try:
+                await loop.run_in_executor(None, spool_archive_member, zf, info, path)
+            except Exception as e:
+                if os.path.exists(path):
+                    os.remove(path)
+                in_flight.release()
+                results.append({"filename": member_name, "archive": archive_name, "success": False, "error": str(e)})
+                continue
+
+            BYTES_INGESTED.labels("archive").inc(info.compress_size)
+            task = asyncio.ensure_future(run_member(file_id, path, member_type))
+            # Reserve the result slot so results stay in archive order
+            results.append(None)
+            jobs.append((task, len(results) - 1, file_id, member_name, member_type, info.file_size))
+
+    for task, result_index, file_id, member_name, member_type, file_size in jobs:
+        try:
+            dataset_hash, derived = await task
+        except Exception as e:
+            results[result_index] = {"filename": member_name, "archive": archive_name, "success": False, "error": str(e)}
+            continue
+
+        file_type = "csv" if member_type == "csv.gz" else member_type
+        file_record = build_file_record(file_id, member_name, file_type, file_size, folder_id, current_user, dataset_hash)
+        pending.append((file_record, result_index, derived))
+        results[result_index] = {
+            "file_id": file_id,
+            "filename": member_name,
+            "archive": archive_name,
+            "success": True
+        }
+
 @app.post("/api/upload")
 async def upload_file(
     file: UploadFile = File(...),
@@ -457,86 +920,43 @@ async def upload_file(
         
         # Check file extension
         filename = file.filename.lower()
-        if not (filename.endswith('.csv') or filename.endswith('.xlsx')):
-            raise HTTPException(status_code=400, detail="Only CSV and XLSX files are supported")
+        upload_type = get_upload_file_type(filename)
+        if upload_type is None:
+            raise HTTPException(status_code=400, detail="Only CSV, XLSX, ZIP and CSV.GZ files are supported")
+        
+        # ZIP archives expand to several files; respond with the bulk-upload results list
+        if upload_type == "zip":
+            results = []
+            pending = []
+            await ingest_zip_archive(file.file, filename, folder_id, current_user, results, pending)
+            insert_file_records(pending, results)
+            return {"results": results}
+        
+        if upload_type == "csv.gz":
+            # Parse straight from the gzip stream
+            file_size = file.size if file.size is not None else os.fstat(file.file.fileno()).st_size
+            BYTES_INGESTED.labels("upload").inc(file_size)
+            try:
+                df = parse_file_path(file.file, "csv.gz")
+            except (OSError, EOFError) as e:
+                raise HTTPException(status_code=400, detail=f"Invalid gzip file: {str(e)}")
+            return ingest_dataframe(df, filename, "csv", file_size, folder_id, current_user)
         
         # Read file content
         file_content = await file.read()
         file_size = len(file_content)
-        file_type = "csv" if filename.endswith('.csv') else "xlsx"
+        file_type = upload_type
+        BYTES_INGESTED.labels("upload").inc(file_size)
         
         # Parse file
         df = parse_file_content(file_content, file_type)
         
-        # Auto-map columns
-        column_mapping = auto_map_columns(df)
-        
-        # Get column names for frontend display
-        original_columns = df.columns.tolist()
-        
-        # Apply Xero format using the auto-mapping
-        xero_df = apply_xero_format(df, column_mapping)
-        
-        # Handle problematic values for JSON serialization
-        def safe_json_serialize(df):
-            # Replace problematic values
-            df_cleaned = df.copy()
-            # Replace inf/-inf with None
-            df_cleaned = df_cleaned.replace([np.inf, -np.inf], None)
-            # Convert to records
-            records = df_cleaned.to_dict(orient="records")
-            # Convert all NaN to None for JSON serialization
-            for record in records:
-                for k, v in record.items():
-                    if isinstance(v, float) and np.isnan(v):
-                        record[k] = None
-            return records
-        
-        # Generate a unique file ID
-        file_id = str(uuid.uuid4())
-        
-        # Store file metadata in database
-        file_record = {
-            "id": file_id,
-            "user_id": current_user.id,
-            "folder_id": folder_id if folder_id else None,
-            "original_filename": filename,
-            "file_type": file_type,
-            "size_bytes": file_size,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        }
-        
-        db.files.insert_one(file_record)
-        
-        # Prepare response
-        response = {
-            "file_id": file_id,
-            "original_filename": filename,
-            "file_type": file_type,
-            "size_bytes": file_size,
-            "folder_id": folder_id,
-            "created_at": file_record["created_at"].isoformat(),
-            "original_data": safe_json_serialize(df.head(50)),
-            "formatted_data": safe_json_serialize(xero_df.head(50)),
-            "original_columns": original_columns,
-            "column_mapping": column_mapping
-        }
-        
-        # Store the dataframe for later use
-        # Clean the dataframe before storing
-        clean_df = df.replace([np.inf, -np.inf], None)
-        records = clean_df.to_dict(orient="records")
-        for record in records:
-            for k, v in record.items():
-                if isinstance(v, float) and np.isnan(v):
-                    record[k] = None
-        
-        with open(f"/tmp/{file_id}_original.json", "w") as f:
-            json.dump(records, f)
-        
-        return response
+        return ingest_dataframe(df, filename, file_type, file_size, folder_id, current_user)
     
+    except HTTPException:
+        raise
+    except zipfile.BadZipFile as e:
+        raise HTTPException(status_code=400, detail=f"Invalid ZIP archive: {str(e)}")
     except Exception as e:
         print(f"Error in upload_file: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -555,64 +975,43 @@ async def bulk_upload(
                 raise HTTPException(status_code=404, detail="Folder not found")
         
         results = []
+        pending = []
+        jobs = []
+        rule_defaults = resolve_rule_set({}, current_user)
         
         for file in files:
             # Check file extension
             filename = file.filename.lower()
-            if not (filename.endswith('.csv') or filename.endswith('.xlsx')):
+            upload_type = get_upload_file_type(filename)
+            if upload_type is None:
                 # Skip unsupported files but continue with others
                 results.append({
                     "filename": filename,
                     "success": False,
-                    "error": "Unsupported file type. Only CSV and XLSX files are supported."
+                    "error": "Unsupported file type. Only CSV, XLSX, ZIP and CSV.GZ files are supported."
                 })
                 continue
             
             try:
+                # Archives add one result per member
+                if upload_type == "zip":
+                    await ingest_zip_archive(file.file, filename, folder_id, current_user, results, pending)
+                    continue
+                
                 # Read file content
                 file_content = await file.read()
                 file_size = len(file_content)
-                file_type = "csv" if filename.endswith('.csv') else "xlsx"
+                BYTES_INGESTED.labels("bulk_upload").inc(file_size)
                 
-                # Parse file
-                df = parse_file_content(file_content, file_type)
-                
-                # Auto-map columns
-                column_mapping = auto_map_columns(df)
-                
-                # Generate a unique file ID
+                # Parse and store it on the worker pool, gathering its search entries
+                # and summary; the files of a batch are processed concurrently
                 file_id = str(uuid.uuid4())
-                
-                # Store file metadata in database
-                file_record = {
-                    "id": file_id,
-                    "user_id": current_user.id,
-                    "folder_id": folder_id if folder_id else None,
-                    "original_filename": filename,
-                    "file_type": file_type,
-                    "size_bytes": file_size,
-                    "created_at": datetime.utcnow(),
-                    "updated_at": datetime.utcnow()
-                }
-                
-                db.files.insert_one(file_record)
-                
-                # Store the dataframe for later use
-                clean_df = df.replace([np.inf, -np.inf], None)
-                records = clean_df.to_dict(orient="records")
-                for record in records:
-                    for k, v in record.items():
-                        if isinstance(v, float) and np.isnan(v):
-                            record[k] = None
-                
-                with open(f"/tmp/{file_id}_original.json", "w") as f:
-                    json.dump(records, f)
-                
-                results.append({
-                    "file_id": file_id,
-                    "filename": filename,
-                    "success": True
-                })
+                task = asyncio.ensure_future(run_in_conversion_pool(
+                    _worker_jobs().ingest_file_content, file_id, file_content, upload_type, rule_defaults
+                ))
+                # Reserve the result slot so results stay in upload order
+                results.append(None)
+                jobs.append((task, len(results) - 1, file_id, filename, upload_type, file_size))
             
             except Exception as e:
                 results.append({
@@ -621,137 +1020,857 @@ async def bulk_upload(
                     "error": str(e)
                 })
         
+        for task, result_index, file_id, filename, upload_type, file_size in jobs:
+            try:
+                dataset_hash, derived = await task
+            except Exception as e:
+                results[result_index] = {"filename": filename, "success": False, "error": str(e)}
+                continue
+            
+            # Queue the metadata; all records are written in one round-trip below
+            file_type = "csv" if upload_type == "csv.gz" else upload_type
+            file_record = build_file_record(file_id, filename, file_type, file_size, folder_id, current_user, dataset_hash)
+            pending.append((file_record, result_index, derived))
+            results[result_index] = {
+                "file_id": file_id,
+                "filename": filename,
+                "success": True
+            }
+        
+        # Store file metadata in database with a single unordered bulk insert
+        insert_file_records(pending, results)
+        
         return {"results": results}
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in bulk_upload: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Resumable chunked uploads (init / upload part / complete). Parts are kept
+# in artifact storage, so any instance can receive them or complete the upload.
+# Uploads left pending longer than UPLOAD_EXPIRY_SECONDS since their last part
+# are removed, parts and all, by the storage sweep.
+MAX_UPLOAD_PART_BYTES = 64 * 1024 * 1024
+UPLOAD_EXPIRY_SECONDS = int(os.environ.get("UPLOAD_EXPIRY_SECONDS", 24 * 60 * 60))
+
+def get_upload_session(upload_id, current_user):
+    upload = db.uploads.find_one({"id": upload_id, "user_id": current_user.id})
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return upload
+
+def assemble_upload(upload, path):
+    """Concatenate the upload's parts from storage into a local file, a chunk at a time"""
+    with open(path, "wb") as out:
+        for part_number in range(1, upload["total_parts"] + 1):
+            for chunk in storage.stream(storage.upload_part_key(upload["id"], part_number)):
+                out.write(chunk)
+
+def delete_upload_parts(upload):
+    # Every possible part, not just the recorded ones: a part can be stored
+    # before the request that sent it records it
+    for part_number in range(1, upload["total_parts"] + 1):
+        storage.delete(storage.upload_part_key(upload["id"], part_number))
+
+def expire_uploads(now=None):
+    """Remove uploads pending for more than UPLOAD_EXPIRY_SECONDS and their parts; returns how many"""
+    now = datetime.utcnow() if now is None else now
+    cutoff = now - timedelta(seconds=UPLOAD_EXPIRY_SECONDS)
+    expired = 0
+    for upload in db.uploads.find({"status": "pending", "updated_at": {"$lt": cutoff}}):
+        # Skip uploads that received a part since they were read
+        if db.uploads.delete_one({"id": upload["id"], "updated_at": upload["updated_at"]}).deleted_count:
+            delete_upload_parts(upload)
+            expired += 1
+    return expired
+
+@app.post("/api/uploads/init")
+async def init_chunked_upload(
+    filename: str = Form(...),
+    size_bytes: int = Form(...),
+    part_size: int = Form(8 * 1024 * 1024),
+    folder_id: Optional[str] = Form(None),
+    current_user: User = Depends(get_current_user)
+):
+    # Check folder if provided
+    if folder_id and folder_id != "root":
+        folder = db.folders.find_one({"id": folder_id, "user_id": current_user.id})
+        if not folder:
+            raise HTTPException(status_code=404, detail="Folder not found")
+    
+    # Check file extension; large archives come through here too
+    filename = filename.lower()
+    if get_upload_file_type(filename) is None:
+        raise HTTPException(status_code=400, detail="Only CSV, XLSX, ZIP and CSV.GZ files are supported")
+    
+    if size_bytes <= 0:
+        raise HTTPException(status_code=400, detail="size_bytes must be positive")
+    if part_size <= 0 or part_size > MAX_UPLOAD_PART_BYTES:
+        raise HTTPException(status_code=400, detail=f"part_size must be between 1 and {MAX_UPLOAD_PART_BYTES} bytes")
+    
+    upload = {
+        "id": str(uuid.uuid4()),
+        "user_id": current_user.id,
+        "folder_id": folder_id if folder_id else None,
+        "filename": filename,
+        "size_bytes": size_bytes,
+        "part_size": part_size,
+        "total_parts": -(-size_bytes // part_size),
+        "parts": {},
+        "status": "pending",
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    }
+    db.uploads.insert_one(upload)
+    
+    return {
+        "upload_id": upload["id"],
+        "part_size": part_size,
+        "total_parts": upload["total_parts"]
+    }
+
+@app.get("/api/uploads/{upload_id}")
+async def get_chunked_upload(upload_id: str, current_user: User = Depends(get_current_user)):
+    """Upload status; clients resume by sending only the parts not listed in received_parts"""
+    upload = get_upload_session(upload_id, current_user)
+    return {
+        "upload_id": upload_id,
+        "filename": upload["filename"],
+        "size_bytes": upload["size_bytes"],
+        "part_size": upload["part_size"],
+        "total_parts": upload["total_parts"],
+        "received_parts": sorted(int(n) for n in upload["parts"]),
+        "status": upload["status"]
+    }
+
+@app.put("/api/uploads/{upload_id}/parts/{part_number}")
+async def upload_part(
+    upload_id: str,
+    part_number: int,
+    request: Request,
+    x_part_checksum: str = Header(...),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Upload one part as the raw request body. X-Part-Checksum is the hex SHA-256
+    of the part; parts that don't match are rejected and must be re-sent.
+    Re-sending a part that was already received overwrites it.
+    """
+    upload = get_upload_session(upload_id, current_user)
+    if upload["status"] != "pending":
+        raise HTTPException(status_code=409, detail="Upload is already complete")
+    if part_number < 1 or part_number > upload["total_parts"]:
+        raise HTTPException(status_code=400, detail="Invalid part number")
+    
+    # Stream the body to storage while hashing it; the part only replaces an
+    # earlier copy once it is complete and its checksum matches
+    writer = storage.open_writer(storage.upload_part_key(upload_id, part_number))
+    digest = hashlib.sha256()
+    part_size = 0
+    try:
+        async for chunk in request.stream():
+            part_size += len(chunk)
+            if part_size > upload["part_size"]:
+                raise HTTPException(status_code=413, detail="Part is larger than the negotiated part size")
+            digest.update(chunk)
+            writer.write(chunk)
+        
+        if digest.hexdigest() != x_part_checksum.lower():
+            raise HTTPException(status_code=400, detail="Part checksum mismatch")
+    except BaseException:
+        writer.abort()
+        raise
+    writer.commit()
+    BYTES_INGESTED.labels("chunked_upload").inc(part_size)
+    
+    db.uploads.update_one(
+        {"id": upload_id},
+        {"$set": {
+            f"parts.{part_number}": {"size": part_size, "sha256": digest.hexdigest()},
+            "updated_at": datetime.utcnow()
+        }}
+    )
+    
+    return {"part_number": part_number, "size": part_size, "sha256": digest.hexdigest()}
+
+@app.post("/api/uploads/{upload_id}/complete")
+async def complete_chunked_upload(upload_id: str, current_user: User = Depends(get_current_user)):
+    """Assemble the parts on local disk and ingest the file; returns the same payload as /api/upload"""
+    upload = get_upload_session(upload_id, current_user)
+    if upload["status"] != "pending":
+        raise HTTPException(status_code=409, detail="Upload is already complete")
+    
+    missing_parts = [n for n in range(1, upload["total_parts"] + 1) if str(n) not in upload["parts"]]
+    if missing_parts:
+        raise HTTPException(status_code=400, detail=f"Missing parts: {missing_parts}")
+    
+    received_size = sum(part["size"] for part in upload["parts"].values())
+    if received_size != upload["size_bytes"]:
+        raise HTTPException(status_code=400, detail="Assembled size does not match the declared size")
+    
+    assembly_dir = tempfile.TemporaryDirectory(prefix="upload_")
+    try:
+        # Concatenate the parts without holding the file in memory
+        filename = upload["filename"]
+        upload_type = get_upload_file_type(filename)
+        assembled_path = os.path.join(assembly_dir.name, f"assembled.{upload_type}")
+        assemble_upload(upload, assembled_path)
+        
+        # Hand off to ingestion, parsing straight from disk; archives are
+        # unpacked like a single-request ZIP upload
+        if upload_type == "zip":
+            results = []
+            pending = []
+            try:
+                with open(assembled_path, "rb") as archive:
+                    await ingest_zip_archive(archive, filename, upload["folder_id"], current_user, results, pending)
+            except zipfile.BadZipFile as e:
+                raise HTTPException(status_code=400, detail=f"Invalid ZIP archive: {str(e)}")
+            insert_file_records(pending, results)
+            response = {"results": results}
+            completed = {"file_ids": [result["file_id"] for result in results if result["success"]]}
+        else:
+            file_type = "csv" if upload_type == "csv.gz" else upload_type
+            try:
+                df = parse_file_path(assembled_path, upload_type)
+            except (OSError, EOFError) as e:
+                if upload_type != "csv.gz":
+                    raise
+                raise HTTPException(status_code=400, detail=f"Invalid gzip file: {str(e)}")
+            response = ingest_dataframe(df, filename, file_type, received_size, upload["folder_id"], current_user)
+            completed = {"file_id": response["file_id"]}
+        
+        db.uploads.update_one(
+            {"id": upload_id},
+            {"$set": {"status": "complete", **completed, "updated_at": datetime.utcnow()}}
+        )
+        delete_upload_parts(upload)
+        
+        return response
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in complete_chunked_upload: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        assembly_dir.cleanup()
+
 @app.post("/api/preview")
 async def preview_conversion(
+    request: Request,
     file_id: str = Form(...),
     column_mappings: str = Form(...),
     preview_only: str = Form("false"),
+    duplicates: str = Form("ignore"),
     current_user: User = Depends(get_current_user)
 ):
     try:
+        if duplicates not in DUPLICATE_MODES:
+            raise HTTPException(status_code=400, detail="duplicates must be 'ignore', 'flag' or 'drop'")
+        
         # Check if file exists and belongs to the user
         file_record = db.files.find_one({"id": file_id, "user_id": current_user.id})
         if not file_record:
             raise HTTPException(status_code=404, detail="File not found")
         
-        # Load the original data
-        with open(f"/tmp/{file_id}_original.json", "r") as f:
-            records = json.load(f)
-            df = pd.DataFrame.from_records(records)
-        
         # Parse column mappings
-        column_mapping = json.loads(column_mappings)
+        column_mapping = resolve_rule_set(parse_column_mapping(column_mappings), current_user)
         
-        # Apply Xero format using the provided mapping
-        xero_df = apply_xero_format(df, column_mapping)
+        # Same dataset and mapping as the client's copy: nothing to recompute.
+        # Duplicate checks depend on later conversions too, so they aren't cached.
+        dataset_hash = get_dataset_hash(file_record)
+        etag = None
+        if dataset_hash and duplicates == "ignore":
+            etag = make_etag(dataset_hash, hash_mapping(column_mapping), "preview")
+        if etag_matches(request, etag):
+            return not_modified(etag)
         
-        # Handle problematic values for JSON serialization
-        def safe_json_serialize(df):
-            # Replace problematic values
-            df_cleaned = df.copy()
-            # Replace inf/-inf with None
-            df_cleaned = df_cleaned.replace([np.inf, -np.inf], None)
-            # Convert to records
-            records = df_cleaned.to_dict(orient="records")
-            # Convert all NaN to None for JSON serialization
-            for record in records:
-                for k, v in record.items():
-                    if isinstance(v, float) and np.isnan(v):
-                        record[k] = None
-            return records
+        # Load the original data
+        df = load_original_dataframe(file_record)
         
-        # Return the formatted data for preview
-        return {
+        # Apply Xero format using the provided mapping
+        xero_df, values = format_frame(df, column_mapping)
+        
+        response = {
             "file_id": file_id,
-            "formatted_data": safe_json_serialize(xero_df),
             "column_mapping": column_mapping,
             "message": "Preview updated with transaction type detection"
         }
+        if duplicates != "ignore":
+            xero_df, _, response["duplicates"] = check_duplicates(
+                xero_df, values, column_mapping, file_record, current_user, duplicates
+            )
+        
+        # Return the formatted data for preview
+        response["formatted_data"] = safe_json_serialize(xero_df)
+        return JSONResponse(content=response, headers=etag_headers(etag))
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in preview_conversion: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Number of formatted rows shown in the preview table by default, and the
+# most a client can ask the live preview to keep up to date
+PREVIEW_WINDOW_ROWS = 50
+PREVIEW_MAX_WINDOW_ROWS = 1000
+
+@app.websocket("/api/ws/preview/{file_id}")
+async def preview_websocket(websocket: WebSocket, file_id: str, token: str = ""):
+    """
+    Live preview channel for interactive mapping edits.
+
+    The client authenticates once with ?token=<access token>. The dataset is
+    loaded once and kept for the lifetime of the connection. Messages:
+    - {"type": "mapping", "delta": {"A": "Posted"}} -> patch of changed visible rows
+    - {"type": "viewport", "offset": 0, "limit": 50} -> snapshot of the new window
+    """
+    user = get_user_from_token(token)
+    if user is None:
+        await websocket.close(code=4401)
+        return
+
+    file_record = db.files.find_one({"id": file_id, "user_id": user.id})
+    if not file_record:
+        await websocket.close(code=4404)
+        return
+
+    await websocket.accept()
+
+    try:
+        df = load_original_dataframe(file_record)
+    except Exception as e:
+        print(f"Error in preview_websocket: {str(e)}")
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1011)
+        return
+
+    column_mapping = resolve_rule_set(auto_map_columns(df), user)
+    offset = 0
+    limit = PREVIEW_WINDOW_ROWS
+    seq = 0
+
+    def render_window():
+        window = df.iloc[offset:offset + limit]
+        return safe_json_serialize(apply_xero_format(window, column_mapping))
+
+    visible_rows = render_window()
+    await websocket.send_json({
+        "type": "snapshot",
+        "seq": seq,
+        "offset": offset,
+        "total_rows": len(df),
+        "column_mapping": column_mapping,
+        "rows": visible_rows
+    })
+
+    async def send_error(detail):
+        await websocket.send_json({"type": "error", "seq": seq, "detail": detail})
+
+    try:
+        while True:
+            # Malformed messages get an error reply; the connection stays usable
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            seq += 1
+            try:
+                message = json.loads(frame["text"]) if frame.get("text") is not None else None
+            except ValueError:
+                message = None
+            if not isinstance(message, dict):
+                await send_error("Messages must be JSON objects")
+                continue
+            message_type = message.get("type")
+
+            if message_type == "mapping":
+                delta = message.get("delta") or {}
+                if not isinstance(delta, dict):
+                    await send_error("delta must be an object")
+                    continue
+                previous_mapping = dict(column_mapping)
+                column_mapping.update(delta)
+                try:
+                    # Switching rule sets (or editing inline rules) re-resolves them
+                    if "rule_set_id" in delta or "dc_rules" in delta:
+                        if "rule_set_id" in delta and "dc_rules" not in delta:
+                            column_mapping.pop("dc_rules", None)
+                        column_mapping = resolve_rule_set(column_mapping, user)
+                    new_rows = render_window()
+                except HTTPException as e:
+                    column_mapping = previous_mapping
+                    await send_error(e.detail)
+                    continue
+                except Exception as e:
+                    # Unknown source column etc. - keep the last good mapping
+                    column_mapping = previous_mapping
+                    await send_error(str(e))
+                    continue
+
+                # Only send the cells that changed in the visible window
+                changed_rows = []
+                for i, (old_row, new_row) in enumerate(zip(visible_rows, new_rows)):
+                    changed = {k: v for k, v in new_row.items() if old_row.get(k) != v}
+                    if changed:
+                        changed_rows.append({"index": offset + i, "values": changed})
+                visible_rows = new_rows
+
+                await websocket.send_json({
+                    "type": "patch",
+                    "seq": seq,
+                    "column_mapping": column_mapping,
+                    "rows": changed_rows
+                })
+
+            elif message_type == "viewport":
+                try:
+                    new_offset = int(message.get("offset", 0))
+                    new_limit = int(message.get("limit", PREVIEW_WINDOW_ROWS))
+                except (TypeError, ValueError, OverflowError):
+                    await send_error("offset and limit must be integers")
+                    continue
+                offset = max(new_offset, 0)
+                limit = min(max(new_limit, 1), PREVIEW_MAX_WINDOW_ROWS)
+                visible_rows = render_window()
+                await websocket.send_json({
+                    "type": "snapshot",
+                    "seq": seq,
+                    "offset": offset,
+                    "total_rows": len(df),
+                    "column_mapping": column_mapping,
+                    "rows": visible_rows
+                })
+
+            else:
+                await send_error("Unknown message type")
+
+    except WebSocketDisconnect:
+        pass
+
+# Periods /api/convert can split its output into (see xero_converter.periods)
+SPLIT_PERIODS = ("month", "quarter")
+
+def convert_split(file_record, xero_df, labels, split_by, formatted_filename, column_mapping, hashes,
+                  duplicate_report, current_user):
+    """
+    Partition a formatted frame by period in one groupby and return a ZIP
+    of one CSV per period (<name>_2024-01.csv, <name>_2024-Q1.csv, and
+    <name>_undated.csv for rows without a date). Each period gets its own
+    conversion record, all written with a single insert_many, so periods
+    can be downloaded, rebuilt and deleted one by one.
+    """
+    engine = _engine()
+    base = formatted_filename[:-len(".csv")]
+    
+    # Rows left out as duplicates, by the period they would have been in
+    dropped = {}
+    if duplicate_report and duplicate_report["mode"] == "drop":
+        for row in duplicate_report["rows"]:
+            dropped.setdefault(labels.iloc[row], []).append(row)
+    
+    partitions = engine.partition_by_period(xero_df, labels)
+    conversions = []
+    for label, rows in partitions:
+        conversion = build_conversion_record(file_record, f"{base}_{label}.csv", column_mapping, current_user)
+        conversion["period"] = {"split_by": split_by, "label": label}
+        if label in dropped:
+            conversion["dropped_rows"] = dropped[label]
+        conversions.append(conversion)
+    
+    if conversions:
+        db.conversions.insert_many(conversions)
+    for conversion, (_, rows) in zip(conversions, partitions):
+        index_conversion(file_record, column_mapping, hashes[rows.index.to_numpy()], conversion["id"], current_user)
+    
+    def members():
+        for conversion, (_, rows) in zip(conversions, partitions):
+            chunks = engine.iter_csv_chunks(rows)
+            if storage.PERSIST_CONVERTED_OUTPUTS:
+                chunks = storage.write_through(
+                    chunks, storage.converted_key(file_record["id"], conversion["formatted_filename"])
+                )
+            yield conversion["formatted_filename"], chunks
+    
+    with observe_stage("serialize", rows=len(xero_df)):
+        archive = build_zip_archive(members())
+    
+    headers = {
+        **attachment_headers(f"{base}_by_{split_by}.zip"),
+        "X-Conversion-Results": json.dumps([
+            {"conversion_id": conversion["id"], "period": conversion["period"]["label"]} for conversion in conversions
+        ])
+    }
+    if duplicate_report is not None:
+        headers["X-Duplicates"] = json.dumps({"mode": duplicate_report["mode"], "count": duplicate_report["count"]})
+    return StreamingResponse(iter_archive(archive), media_type="application/zip", headers=headers)
+
 @app.post("/api/convert")
 async def convert_file(
     file_id: str = Form(...),
     column_mappings: str = Form(...),
     formatted_filename: str = Form(None),
+    duplicates: str = Form("ignore"),
+    split_by: Optional[str] = Form(None),
     current_user: User = Depends(get_current_user)
 ):
+    """
+    Convert a file with the given mapping. With split_by ("month" or
+    "quarter") the output is a ZIP of one CSV per period instead, each with
+    its own conversion record (see convert_split).
+    """
     try:
+        if duplicates not in DUPLICATE_MODES:
+            raise HTTPException(status_code=400, detail="duplicates must be 'ignore', 'flag' or 'drop'")
+        if split_by and split_by not in SPLIT_PERIODS:
+            raise HTTPException(status_code=400, detail="split_by must be 'month' or 'quarter'")
+        
         # Check if file exists and belongs to the user
         file_record = db.files.find_one({"id": file_id, "user_id": current_user.id})
         if not file_record:
             raise HTTPException(status_code=404, detail="File not found")
         
         # Load the original data
-        with open(f"/tmp/{file_id}_original.json", "r") as f:
-            records = json.load(f)
-            df = pd.DataFrame.from_records(records)
+        df = load_original_dataframe(file_record)
         
         # Parse column mappings
-        column_mapping = json.loads(column_mappings)
+        column_mapping = resolve_rule_set(parse_column_mapping(column_mappings), current_user)
         
         # Apply Xero format using the provided mapping
-        xero_df = apply_xero_format(df, column_mapping)
+        xero_df, values = format_frame(df, column_mapping)
+        
+        # Search and totals reflect the mapping the file was last converted with
+        exponent = _engine().currency_exponent(column_mapping)
+        index_search_entries(file_record, _engine().search_entries(xero_df, values, exponent))
+        set_file_summary(file_record, _engine().summarize(values, exponent))
+        
+        # Periods are labelled before duplicates are dropped, so dropped rows can be attributed
+        labels = _engine().period_labels(values['date'], split_by) if split_by else None
+        
+        # Look the rows up in the duplicate index (and leave duplicates out for "drop")
+        xero_df, hashes, duplicate_report = check_duplicates(
+            xero_df, values, column_mapping, file_record, current_user, duplicates
+        )
         
         # Generate output filename
-        if not formatted_filename:
-            original_filename = file_record["original_filename"]
-            formatted_filename = f"{original_filename.split('.')[0]}_formatted.csv"
-        elif not formatted_filename.endswith('.csv'):
-            formatted_filename += '.csv'
+        formatted_filename = get_formatted_filename(file_record["original_filename"], formatted_filename)
+        
+        if split_by:
+            return convert_split(
+                file_record, xero_df, labels, split_by, formatted_filename, column_mapping, hashes,
+                duplicate_report, current_user
+            )
         
-        # Save the formatted file
-        output_path = f"/tmp/{file_id}_{formatted_filename}"
-        xero_df.to_csv(output_path, index=False)
+        # Save the formatted file (otherwise downloads rebuild it on demand)
+        if storage.PERSIST_CONVERTED_OUTPUTS:
+            output_key = storage.converted_key(file_id, formatted_filename)
+            with observe_stage("serialize", rows=len(xero_df)):
+                storage.put(output_key, _engine().iter_csv_chunks(xero_df))
         
         # Store conversion record in database
-        conversion = {
-            "id": str(uuid.uuid4()),
-            "user_id": current_user.id,
-            "file_id": file_id,
-            "original_filename": file_record["original_filename"],
-            "formatted_filename": formatted_filename,
-            "column_mapping": column_mapping,
-            "created_at": datetime.utcnow()
-        }
+        conversion = build_conversion_record(file_record, formatted_filename, column_mapping, current_user)
+        if duplicates == "drop" and duplicate_report["rows"]:
+            # Downloads that rebuild the output leave the same rows out
+            conversion["dropped_rows"] = duplicate_report["rows"]
         db.conversions.insert_one(conversion)
-        
-        # Handle problematic values for JSON serialization
-        def safe_json_serialize(df):
-            # Replace problematic values
-            df_cleaned = df.copy()
-            # Replace inf/-inf with None
-            df_cleaned = df_cleaned.replace([np.inf, -np.inf], None)
-            # Convert to records
-            records = df_cleaned.to_dict(orient="records")
-            # Convert all NaN to None for JSON serialization
-            for record in records:
-                for k, v in record.items():
-                    if isinstance(v, float) and np.isnan(v):
-                        record[k] = None
-            return records
+        index_conversion(file_record, column_mapping, hashes, conversion["id"], current_user)
         
         # Return the formatted data and download link
-        return {
+        response = {
             "conversion_id": conversion["id"],
             "file_id": file_id,
             "formatted_filename": formatted_filename,
             "formatted_data": safe_json_serialize(xero_df)
         }
+        if duplicate_report is not None:
+            response["duplicates"] = duplicate_report
+        return response
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in convert_file: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def build_zip_archive(members):
+    """
+    Write (name, byte chunks) members to a ZIP in a spooled temporary file
+    (disk-backed past 32 MB), keeping member names unique; returns it rewound.
+    """
+    archive = tempfile.SpooledTemporaryFile(max_size=32 * 1024 * 1024)
+    used_names = set()
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, chunks in members:
+            # Keep archive member names unique
+            base, ext = os.path.splitext(name)
+            counter = 1
+            while name in used_names:
+                name = f"{base}_{counter}{ext}"
+                counter += 1
+            used_names.add(name)
+            with zf.open(name, "w") as member:
+                for chunk in chunks:
+                    member.write(chunk)
+    archive.seek(0)
+    return archive
+
+def iter_archive(archive):
+    try:
+        while True:
+            chunk = archive.read(64 * 1024)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        archive.close()
+
+@app.post("/api/bulk-convert")
+async def bulk_convert(
+    file_ids: str = Form(...),
+    column_mappings: Optional[str] = Form(None),
+    output: str = Form("links"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Convert many files at once on the conversion worker pool.
+    - file_ids: JSON list of file ids
+    - column_mappings: JSON mapping applied to every file; omit to use each file's auto-mapping
+    - output: "links" (per-file download links) or "zip" (single archive of all outputs)
+    """
+    try:
+        file_id_list = json.loads(file_ids)
+        if not isinstance(file_id_list, list) or not file_id_list:
+            raise HTTPException(status_code=400, detail="file_ids must be a non-empty JSON list")
+        if output not in ("links", "zip"):
+            raise HTTPException(status_code=400, detail="output must be 'links' or 'zip'")
+
+        shared_mapping = resolve_rule_set(parse_column_mapping(column_mappings), current_user) if column_mappings else None
+        # Auto-mapped files still get the user's default rule set
+        rule_defaults = resolve_rule_set({}, current_user)
+
+        # Fetch all file records in one query
+        file_records = {
+            record["id"]: record
+            for record in db.files.find({"id": {"$in": file_id_list}, "user_id": current_user.id})
+        }
+
+        results = []
+        jobs = []
+        for file_id in file_id_list:
+            file_record = file_records.get(file_id)
+            if not file_record:
+                results.append({"file_id": file_id, "success": False, "error": "File not found"})
+                continue
+
+            formatted_filename = get_formatted_filename(file_record["original_filename"])
+            # The archive is built from the written outputs, so zip mode always writes them
+            write_output = storage.PERSIST_CONVERTED_OUTPUTS or output == "zip"
+            output_key = storage.converted_key(file_id, formatted_filename) if write_output else None
+            results.append({
+                "file_id": file_id,
+                "filename": file_record["original_filename"],
+                "formatted_filename": formatted_filename
+            })
+            jobs.append((results[-1], file_record, output_key))
+
+        # Run the conversions concurrently on the worker pool
+        outcomes = await asyncio.gather(
+            *[
+                run_in_conversion_pool(
+                    _worker_jobs().convert_stored_file, file_record["id"], shared_mapping, output_key, rule_defaults
+                )
+                for _, file_record, output_key in jobs
+            ],
+            return_exceptions=True
+        )
+
+        conversions = []
+        indexed = []
+        for (result, file_record, output_key), outcome in zip(jobs, outcomes):
+            if isinstance(outcome, Exception):
+                result.update({"success": False, "error": str(outcome)})
+                continue
+
+            column_mapping, row_count, derived = outcome
+            conversion = build_conversion_record(file_record, result["formatted_filename"], column_mapping, current_user)
+            indexed.append((file_record, column_mapping, conversion["id"], derived))
+            conversions.append(conversion)
+            result.update({
+                "success": True,
+                "conversion_id": conversion["id"],
+                "row_count": row_count,
+                "download_url": f"/api/download/{conversion['id']}"
+            })
+
+        # Store all conversion records in a single round-trip
+        if conversions:
+            db.conversions.insert_many(conversions)
+        for file_record, column_mapping, conversion_id, derived in indexed:
+            index_conversion(file_record, column_mapping, derived["hashes"], conversion_id, current_user)
+            index_search_entries(file_record, derived["search_entries"])
+            set_file_summary(file_record, derived["summary"])
+
+        if output == "zip":
+            def members():
+                for result, _, output_key in jobs:
+                    if not result["success"]:
+                        continue
+                    yield result["formatted_filename"], storage.stream(output_key)
+                    if not storage.PERSIST_CONVERTED_OUTPUTS:
+                        storage.delete(output_key)
+
+            archive = build_zip_archive(members())
+            return StreamingResponse(
+                iter_archive(archive),
+                media_type="application/zip",
+                headers={
+                    "Content-Disposition": 'attachment; filename="xero_conversions.zip"',
+                    "X-Conversion-Results": json.dumps([
+                        {k: r.get(k) for k in ("file_id", "success", "conversion_id")} for r in results
+                    ])
+                }
+            )
+
+        return {"results": results}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in bulk_convert: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Debit/credit rule sets
+def validate_rules(rules):
+    try:
+        return _rules().normalize_rules([rule.model_dump() for rule in rules])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def rule_set_response(rule_set):
+    return {
+        "id": rule_set["id"],
+        "name": rule_set["name"],
+        "rules": rule_set["rules"],
+        "is_default": rule_set.get("is_default", False),
+        "created_at": rule_set["created_at"].isoformat(),
+        "updated_at": rule_set["updated_at"].isoformat()
+    }
+
+@app.get("/api/rule-sets")
+async def get_rule_sets(current_user: User = Depends(get_current_user)):
+    try:
+        rule_sets = db.rule_sets.find({"user_id": current_user.id}).sort("created_at", 1)
+        return {
+            "rule_sets": [rule_set_response(rule_set) for rule_set in rule_sets],
+            "builtin_rules": _rules().DEFAULT_RULES
+        }
+    
+    except Exception as e:
+        print(f"Error in get_rule_sets: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/rule-sets")
+async def create_rule_set(rule_set_create: RuleSetCreate, current_user: User = Depends(get_current_user)):
+    try:
+        rules = validate_rules(rule_set_create.rules)
+        
+        # Only one default rule set per user
+        if rule_set_create.is_default:
+            db.rule_sets.update_many({"user_id": current_user.id}, {"$set": {"is_default": False}})
+        
+        rule_set = {
+            "id": str(uuid.uuid4()),
+            "user_id": current_user.id,
+            "name": rule_set_create.name,
+            "rules": rules,
+            "is_default": rule_set_create.is_default,
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow()
+        }
+        db.rule_sets.insert_one(rule_set)
+        
+        return rule_set_response(rule_set)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in create_rule_set: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.put("/api/rule-sets/{rule_set_id}")
+async def update_rule_set(rule_set_id: str, rule_set_create: RuleSetCreate, current_user: User = Depends(get_current_user)):
+    try:
+        # Check if rule set exists and belongs to the user
+        rule_set = db.rule_sets.find_one({"id": rule_set_id, "user_id": current_user.id})
+        if not rule_set:
+            raise HTTPException(status_code=404, detail="Rule set not found")
+        
+        rules = validate_rules(rule_set_create.rules)
+        
+        if rule_set_create.is_default:
+            db.rule_sets.update_many({"user_id": current_user.id}, {"$set": {"is_default": False}})
+        
+        updates = {
+            "name": rule_set_create.name,
+            "rules": rules,
+            "is_default": rule_set_create.is_default,
+            "updated_at": datetime.utcnow()
+        }
+        db.rule_sets.update_one({"id": rule_set_id}, {"$set": updates})
+        
+        return rule_set_response({**rule_set, **updates})
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in update_rule_set: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/api/rule-sets/{rule_set_id}")
+async def delete_rule_set(rule_set_id: str, current_user: User = Depends(get_current_user)):
+    try:
+        result = db.rule_sets.delete_one({"id": rule_set_id, "user_id": current_user.id})
+        if result.deleted_count == 0:
+            raise HTTPException(status_code=404, detail="Rule set not found")
+        
+        return {"message": "Rule set deleted successfully"}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in delete_rule_set: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/rule-sets/explain")
+async def explain_rules(explain_request: RuleExplainRequest, current_user: User = Depends(get_current_user)):
+    """
+    Show which rule decides each transaction type value. Uses, in order: the
+    given rule_set_id, inline rules, the user's default rule set, the built-in rules.
+    """
+    try:
+        column_mapping = {}
+        if explain_request.rule_set_id:
+            column_mapping["rule_set_id"] = explain_request.rule_set_id
+        elif explain_request.rules is not None:
+            column_mapping["dc_rules"] = [rule.model_dump() for rule in explain_request.rules]
+        column_mapping = resolve_rule_set(column_mapping, current_user)
+        
+        evaluator = _rules().compile_rules(column_mapping.get("dc_rules"))
+        return {
+            "rule_set_id": column_mapping.get("rule_set_id"),
+            "rules": evaluator.rules,
+            "results": evaluator.explain(explain_request.values)
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in explain_rules: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/conversions")
 async def get_conversions(current_user: User = Depends(get_current_user)):
     try:
@@ -759,35 +1878,140 @@ async def get_conversions(current_user: User = Depends(get_current_user)):
         conversions = list(db.conversions.find({"user_id": current_user.id}).sort("created_at", -1))
         
         # Parse the MongoDB BSON to JSON
+        from bson.json_util import dumps
         return json.loads(dumps(conversions))
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.delete("/api/conversions/{conversion_id}")
+async def delete_conversion(conversion_id: str, current_user: User = Depends(get_current_user)):
+    try:
+        # Check if conversion exists and belongs to the user
+        conversion = db.conversions.find_one({"id": conversion_id, "user_id": current_user.id})
+        if not conversion:
+            raise HTTPException(status_code=404, detail="Conversion not found")
+        
+        db.conversions.delete_one({"id": conversion_id})
+        
+        # Re-converting a file under the same name reuses the output key, so
+        # only remove it once no other conversion points at it
+        still_referenced = db.conversions.count_documents({
+            "file_id": conversion["file_id"],
+            "formatted_filename": conversion["formatted_filename"]
+        })
+        if not still_referenced:
+            storage.delete(storage.converted_key(conversion["file_id"], conversion["formatted_filename"]))
+        
+        return {"message": "Conversion deleted successfully"}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in delete_conversion: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def get_conversion_etag(conversion):
+    """ETag for a converted CSV, or None if its source dataset is gone"""
+    dataset_hash = conversion.get("dataset_hash")
+    if not dataset_hash:
+        file_record = db.files.find_one({"id": conversion.get("file_id")})
+        dataset_hash = get_dataset_hash(file_record) if file_record else None
+    if not dataset_hash:
+        return None
+    # Dropped duplicates change the content for the same name and mapping
+    dropped = [json.dumps(conversion["dropped_rows"])] if conversion.get("dropped_rows") else []
+    return make_etag(
+        dataset_hash, hash_mapping(conversion.get("column_mapping")), conversion["formatted_filename"], *dropped
+    )
+
+def attachment_headers(filename):
+    """Content-Disposition as FileResponse builds it (RFC 5987 for non-ASCII names)"""
+    quoted = quote(filename)
+    if quoted != filename:
+        return {"Content-Disposition": f"attachment; filename*=utf-8''{quoted}"}
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+def regenerate_conversion(conversion, output_key, etag):
+    """
+    Rebuild a converted CSV whose output is missing from the original dataset
+    and the conversion's stored mapping, formatting and streaming it a chunk
+    at a time.
+    """
+    file_record = db.files.find_one({"id": conversion["file_id"]})
+    if not file_record or not storage.exists(storage.original_key(file_record["id"])):
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    engine = _engine()
+    df = load_original_dataframe(file_record)
+    if conversion.get("dropped_rows"):
+        # Duplicates left out when the conversion ran
+        df = df.drop(index=df.index[conversion["dropped_rows"]])
+    if conversion.get("period"):
+        # One period of a split conversion, labelled from the parsed dates
+        formatted_chunks = engine.format_frame_chunks(engine.iter_frame_chunks(df), conversion["column_mapping"])
+        xero_chunks = engine.select_period(
+            formatted_chunks, conversion["period"]["split_by"], conversion["period"]["label"]
+        )
+    else:
+        xero_chunks = engine.format_chunks(engine.iter_frame_chunks(df), conversion["column_mapping"])
+    chunks = engine.iter_csv_bytes(xero_chunks)
+    if storage.CACHE_REGENERATED_OUTPUTS:
+        chunks = storage.write_through(chunks, output_key)
+    
+    return StreamingResponse(
+        chunks,
+        media_type="text/csv",
+        headers={**attachment_headers(conversion["formatted_filename"]), **etag_headers(etag)}
+    )
+
 @app.get("/api/download/{conversion_id}")
-async def download_conversion(conversion_id: str, current_user: User = Depends(get_current_user)):
+async def download_conversion(request: Request, conversion_id: str, current_user: User = Depends(get_current_user)):
     try:
         # Get conversion record
         conversion = db.conversions.find_one({"id": conversion_id, "user_id": current_user.id})
         if not conversion:
             raise HTTPException(status_code=404, detail="Conversion not found")
         
-        # Get file path
-        file_id = conversion.get("file_id")
-        file_path = f"/tmp/{file_id}_{conversion['formatted_filename']}"
-        
-        # Check if file exists
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=404, detail="File not found")
+        # The client already has this exact CSV
+        etag = get_conversion_etag(conversion)
+        if etag_matches(request, etag):
+            return not_modified(etag)
         
-        # Return file content as a response
-        from fastapi.responses import FileResponse
-        return FileResponse(
-            path=file_path, 
-            filename=conversion['formatted_filename'],
-            media_type="text/csv"
+        # Get the stored output
+        file_id = conversion.get("file_id")
+        output_key = storage.converted_key(file_id, conversion["formatted_filename"])
+        info = storage.stat(output_key)
+        
+        # Output evicted or never written: rebuild it from the original
+        if info is None:
+            return regenerate_conversion(conversion, output_key, etag)
+        
+        # Keep recently downloaded outputs out of LRU eviction
+        storage.touch(output_key)
+        
+        # Local files go out with sendfile; object storage is streamed through
+        file_path = storage.local_path(output_key)
+        if file_path:
+            from fastapi.responses import FileResponse
+            return FileResponse(
+                path=file_path, 
+                filename=conversion['formatted_filename'],
+                media_type="text/csv",
+                headers=etag_headers(etag)
+            )
+        return StreamingResponse(
+            storage.stream(output_key),
+            media_type="text/csv",
+            headers={
+                **attachment_headers(conversion["formatted_filename"]),
+                "Content-Length": str(info.size),
+                **etag_headers(etag)
+            }
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in download_conversion: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -862,6 +2086,7 @@ async def update_folder(folder_id: str, name: str = Form(...), current_user: Use
         # Get updated folder
         updated_folder = db.folders.find_one({"id": folder_id})
         
+        from bson.json_util import dumps
         return json.loads(dumps(updated_folder))
     
     except Exception as e:
@@ -888,6 +2113,7 @@ async def delete_folder(folder_id: str, current_user: User = Depends(get_current
         
         # Delete folder
         db.folders.delete_one({"id": folder_id})
+        get_folder_summaries().remove(current_user.id, folder_id)
         
         return {"message": "Folder deleted successfully"}
     
@@ -938,6 +2164,57 @@ async def get_files_in_folder(folder_id: str, current_user: User = Depends(get_c
         print(f"Error in get_files_in_folder: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def render_summary_units(units, exponent):
+    """Decimal string for an integer amount at exponent decimals, keeping at least 2 decimals"""
+    whole, fraction = divmod(abs(units), 10 ** exponent)
+    fraction = f"{fraction:0{exponent}d}".rstrip("0").ljust(2, "0")
+    return f"{'-' if units < 0 else ''}{whole}.{fraction}"
+
+def summary_totals(totals, exponent):
+    return {
+        "rows": totals.get("rows", 0),
+        "debit_total": render_summary_units(totals.get("debit_units", 0), exponent),
+        "credit_total": render_summary_units(totals.get("credit_units", 0), exponent),
+        "net_total": render_summary_units(totals.get("credit_units", 0) - totals.get("debit_units", 0), exponent)
+    }
+
+@app.get("/api/folders/{folder_id}/summary")
+async def get_folder_summary(folder_id: str, current_user: User = Depends(get_current_user)):
+    """
+    Totals of the folder's files ("root" for unfiled ones), read from the
+    rollup maintained at ingest and convert; datasets are never loaded.
+    Files uploaded before summaries existed count once they're converted.
+    """
+    try:
+        if folder_id != "root":
+            folder = db.folders.find_one({"id": folder_id, "user_id": current_user.id})
+            if not folder:
+                raise HTTPException(status_code=404, detail="Folder not found")
+
+        rollup = get_folder_summaries().get(current_user.id, folder_id) or {}
+        # Totals are stored at the summaries' scale; a folder that never had one totals zero
+        exponent = rollup.get("amount_exponent", 0)
+        months = [
+            {"month": month, **summary_totals(totals, exponent)}
+            for month, totals in sorted(rollup.get("months", {}).items())
+            if totals.get("rows")
+        ]
+
+        return {
+            "folder_id": folder_id,
+            "files": rollup.get("files", 0),
+            **summary_totals(rollup, exponent),
+            "first_date": rollup["first_date"].strftime("%Y-%m-%d") if rollup.get("first_date") else None,
+            "last_date": rollup["last_date"].strftime("%Y-%m-%d") if rollup.get("last_date") else None,
+            "months": months
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in get_folder_summary: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/api/files/move")
 async def move_file(file_id: str = Form(...), target_folder_id: Optional[str] = Form(None), current_user: User = Depends(get_current_user)):
     try:
@@ -958,6 +2235,12 @@ async def move_file(file_id: str = Form(...), target_folder_id: Optional[str] =
             {"$set": {"folder_id": target_folder_id if target_folder_id else None, "updated_at": datetime.utcnow()}}
         )
         
+        # Move its summary between the folder totals
+        rollup_summaries(current_user.id, [
+            (file.get("folder_id"), file.get("summary"), -1),
+            (target_folder_id, file.get("summary"), 1)
+        ])
+        
         return {"message": "File moved successfully"}
     
     except Exception as e:
@@ -972,16 +2255,22 @@ async def delete_file(file_id: str, current_user: User = Depends(get_current_use
         if not file:
             raise HTTPException(status_code=404, detail="File not found")
         
-        # Delete any associated conversions
+        # Delete any associated conversions and their outputs
+        for conversion in db.conversions.find({"file_id": file_id}, {"formatted_filename": 1}):
+            storage.delete(storage.converted_key(file_id, conversion["formatted_filename"]))
         db.conversions.delete_many({"file_id": file_id})
         
-        # Delete the file from database
+        # Its transactions no longer count as seen
+        get_transaction_index().remove_file(current_user.id, file_id)
+        get_transaction_search().remove_file(current_user.id, file_id)
+        
+        # Delete the file from database and take it out of its folder's totals
         db.files.delete_one({"id": file_id})
+        rollup_summaries(current_user.id, [(file.get("folder_id"), file.get("summary"), -1)])
         
         # Delete file from disk if it exists
-        original_file_path = f"/tmp/{file_id}_original.json"
-        if os.path.exists(original_file_path):
-            os.remove(original_file_path)
+        _dataset_cache.pop(file.get("dataset_hash"), None)
+        storage.delete(storage.original_key(file_id))
         
         return {"message": "File deleted successfully"}
     
@@ -990,39 +2279,33 @@ async def delete_file(file_id: str, current_user: User = Depends(get_current_use
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/files/{file_id}")
-async def get_file(file_id: str, current_user: User = Depends(get_current_user)):
+async def get_file(request: Request, file_id: str, current_user: User = Depends(get_current_user)):
     try:
         # Check if file exists and belongs to the user
         file_record = db.files.find_one({"id": file_id, "user_id": current_user.id})
         if not file_record:
             raise HTTPException(status_code=404, detail="File not found")
         
+        # The auto-mapping only depends on the data, so an unchanged record and
+        # rule set mean an unchanged response (updated_at covers moves between folders)
+        rule_defaults = resolve_rule_set({}, current_user)
+        dataset_hash = get_dataset_hash(file_record)
+        updated_at = file_record["updated_at"].isoformat() if "updated_at" in file_record else ""
+        etag = make_etag(
+            dataset_hash, "auto", hash_mapping(rule_defaults), str(file_record.get("folder_id")), updated_at
+        ) if dataset_hash else None
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        
         # Load the original data
-        with open(f"/tmp/{file_id}_original.json", "r") as f:
-            records = json.load(f)
-            df = pd.DataFrame.from_records(records)
+        df = load_original_dataframe(file_record)
         
         # Auto-map columns
-        column_mapping = auto_map_columns(df)
+        column_mapping = {**auto_map_columns(df), **rule_defaults}
         
         # Apply Xero format using the auto-mapping
         xero_df = apply_xero_format(df, column_mapping)
         
-        # Handle problematic values for JSON serialization
-        def safe_json_serialize(df):
-            # Replace problematic values
-            df_cleaned = df.copy()
-            # Replace inf/-inf with None
-            df_cleaned = df_cleaned.replace([np.inf, -np.inf], None)
-            # Convert to records
-            records = df_cleaned.to_dict(orient="records")
-            # Convert all NaN to None for JSON serialization
-            for record in records:
-                for k, v in record.items():
-                    if isinstance(v, float) and np.isnan(v):
-                        record[k] = None
-            return records
-        
         # Get column names for frontend display
         original_columns = df.columns.tolist()
         
@@ -1040,13 +2323,244 @@ async def get_file(file_id: str, current_user: User = Depends(get_current_user))
             "column_mapping": column_mapping
         }
         
-        return response
+        return JSONResponse(content=response, headers=etag_headers(etag))
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in get_file: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Transaction search (see transaction_search)
+SEARCH_MAX_PAGE_SIZE = 200
+
+def parse_search_date(value, name):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d") if value else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be a date as YYYY-MM-DD")
+
+def parse_search_amount(value, name):
+    if not value:
+        return None
+    units = _engine().amount_units([value])[0]
+    if units is None:
+        raise HTTPException(status_code=400, detail=f"{name} must be an amount")
+    return units
+
+@app.get("/api/transactions/search")
+async def search_transactions(
+    q: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    min_amount: Optional[str] = None,
+    max_amount: Optional[str] = None,
+    folder_id: Optional[str] = None,
+    file_id: Optional[str] = None,
+    page: int = 1,
+    page_size: int = 50,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Find transactions across the user's statements.
+    - q: words matched (as prefixes) against description and cheque no.
+    - date_from / date_to: inclusive, YYYY-MM-DD
+    - min_amount / max_amount: inclusive, signed as in the Xero output
+    - folder_id / file_id: limit to one folder ("root" for unfiled) or file
+    Hits point at the file and the row of its dataset, newest first.
+    """
+    try:
+        if page < 1 or not 1 <= page_size <= SEARCH_MAX_PAGE_SIZE:
+            raise HTTPException(
+                status_code=400, detail=f"page must be >= 1 and page_size between 1 and {SEARCH_MAX_PAGE_SIZE}"
+            )
+
+        engine = _engine()
+        terms = engine.tokenize(q)
+        date_from = parse_search_date(date_from, "date_from")
+        date_to = parse_search_date(date_to, "date_to")
+        min_units = parse_search_amount(min_amount, "min_amount")
+        max_units = parse_search_amount(max_amount, "max_amount")
+
+        # Folder and file filters become a list of file ids
+        file_ids = None
+        if folder_id:
+            folder_filter = {"$in": [None, "root"]} if folder_id == "root" else folder_id
+            file_ids = [f["id"] for f in db.files.find({"user_id": current_user.id, "folder_id": folder_filter}, {"id": 1})]
+        if file_id:
+            file_ids = [file_id] if file_ids is None or file_id in file_ids else []
+
+        hits, has_more = get_transaction_search().search(
+            current_user.id, terms, date_from, date_to, min_units, max_units, file_ids, page, page_size
+        )
+
+        # File names and folders for the page's hits in one query
+        files = {
+            record["id"]: record
+            for record in db.files.find(
+                {"id": {"$in": list({hit["file_id"] for hit in hits})}, "user_id": current_user.id},
+                {"_id": 0, "id": 1, "original_filename": 1, "folder_id": 1}
+            )
+        }
+
+        results = []
+        for hit in hits:
+            file_record = files.get(hit["file_id"], {})
+            results.append({
+                "file_id": hit["file_id"],
+                "filename": file_record.get("original_filename"),
+                "folder_id": file_record.get("folder_id"),
+                "row": hit["row"],
+                "date": hit["date"].strftime("%Y-%m-%d") if hit.get("date") else None,
+                "amount": hit.get("amount"),
+                "description": hit.get("description"),
+                "cheque_no": hit.get("cheque_no")
+            })
+
+        return {"results": results, "page": page, "page_size": page_size, "has_more": has_more}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in search_transactions: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Status endpoint
 @app.get("/api/status")
 async def get_status():
     return {"status": "OK", "version": "1.0.0"}
+
+# Readiness probe: the launcher waits for this before routing traffic
+@app.get("/api/ready")
+async def get_ready():
+    checks = {}
+    
+    try:
+        # Fail fast instead of waiting out the driver's 30s server selection timeout
+        with pymongo.timeout(2):
+            db.command("ping")
+        checks["mongo"] = "ok"
+    except Exception as e:
+        checks["mongo"] = f"error: {str(e)}"
+    
+    # Datasets, converted files, upload parts and profiles
+    try:
+        storage.check()
+        checks["storage"] = "ok"
+    except Exception as e:
+        checks["storage"] = f"error: {str(e)}"
+    
+    # Chunked uploads are assembled in the local temp directory
+    try:
+        with tempfile.NamedTemporaryFile(prefix=".ready_") as probe:
+            probe.write(b"ok")
+            probe.flush()
+        checks["upload_spool"] = "ok"
+    except Exception as e:
+        checks["upload_spool"] = f"error: {str(e)}"
+    
+    ready = all(result == "ok" for result in checks.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not ready", "checks": checks}
+    )
+
+# Storage lifecycle: evict stale converted outputs and abandoned uploads in the background
+_storage_sweeper = None
+
+def run_storage_sweep():
+    if UPLOAD_EXPIRY_SECONDS > 0:
+        expired = expire_uploads()
+        if expired:
+            print(f"Expired {expired} abandoned uploads")
+    result = storage.sweep()
+    for reason, evicted in result["evicted"].items():
+        STORAGE_EVICTIONS.labels(reason).inc(evicted["files"])
+        STORAGE_EVICTED_BYTES.labels(reason).inc(evicted["bytes"])
+    if result["over_quota"]:
+        print(f"Storage over quota: {result['total_bytes']} bytes of originals exceed {storage.STORAGE_QUOTA_BYTES}")
+    return result
+
+async def storage_sweeper():
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            await loop.run_in_executor(None, run_storage_sweep)
+        except Exception as e:
+            print(f"Error in storage_sweeper: {str(e)}")
+        await asyncio.sleep(storage.SWEEP_INTERVAL_SECONDS)
+
+@app.on_event("startup")
+async def start_storage_sweeper():
+    global _storage_sweeper
+    if storage.SWEEP_INTERVAL_SECONDS > 0:
+        _storage_sweeper = asyncio.ensure_future(storage_sweeper())
+
+@app.on_event("shutdown")
+async def stop_storage_sweeper():
+    if _storage_sweeper is not None:
+        _storage_sweeper.cancel()
+
+@app.get("/api/storage/usage")
+async def get_storage_usage(current_user: User = Depends(get_current_user)):
+    try:
+        files = list(db.files.find({"user_id": current_user.id}, {"id": 1}))
+        originals_bytes = sum(storage.size_of(storage.original_key(f["id"])) for f in files)
+        
+        # Several conversions can share an output key; count each object once
+        converted_keys = {
+            storage.converted_key(c["file_id"], c["formatted_filename"])
+            for c in db.conversions.find({"user_id": current_user.id}, {"file_id": 1, "formatted_filename": 1})
+        }
+        converted_bytes = sum(storage.size_of(key) for key in converted_keys)
+        
+        return {
+            "files": len(files),
+            "originals_bytes": originals_bytes,
+            "converted_files": len(converted_keys),
+            "converted_bytes": converted_bytes,
+            "total_bytes": originals_bytes + converted_bytes
+        }
+    
+    except Exception as e:
+        print(f"Error in get_storage_usage: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/admin/storage")
+async def get_admin_storage(admin_user: User = Depends(get_admin_user)):
+    usage = storage.usage()
+    return {
+        "backend": storage.STORAGE_BACKEND,
+        "root": storage.STORAGE_ROOT if storage.STORAGE_BACKEND == "local" else f"s3://{storage.S3_BUCKET}/{storage.S3_PREFIX}",
+        "quota_bytes": storage.STORAGE_QUOTA_BYTES,
+        "converted_ttl_seconds": storage.CONVERTED_TTL_SECONDS,
+        "total_bytes": sum(kind["bytes"] for kind in usage.values()),
+        "usage": usage
+    }
+
+# Request profiles (admin only)
+@app.get("/api/admin/profiles")
+async def get_profiles(admin_user: User = Depends(get_admin_user)):
+    profiles = list(db.profiles.find({}, {"_id": 0}).sort("created_at", -1).limit(100))
+    for profile in profiles:
+        profile["created_at"] = profile["created_at"].isoformat()
+    return profiles
+
+@app.get("/api/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, admin_user: User = Depends(get_admin_user)):
+    """Collapsed stacks; load into speedscope or pipe through flamegraph.pl"""
+    profile = db.profiles.find_one({"id": profile_id})
+    profile_key = storage.profile_key(profile_id)
+    if not profile or not storage.exists(profile_key):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    return PlainTextResponse(
+        storage.read(profile_key).decode(),
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.collapsed"'}
+    )
+
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
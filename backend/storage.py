@@ -0,0 +1,451 @@
+"""
+Artifact storage and its lifecycle.
+
+Datasets and converted files are stored as objects under flat keys:
+
+    {file_id}_original.json   parsed upload; the source of truth, never evicted
+    {file_id}_{name}.csv      converted output; can be rebuilt from the original
+                              dataset and the conversion's column mapping
+
+Request state that any API instance may need to read back lives here too,
+outside the lifecycle manager's artifacts:
+
+    upload_{upload_id}_part_{n}   a received part of a resumable upload
+    profile_{profile_id}.collapsed  a request profile
+
+STORAGE_BACKEND picks where they live: "local" (files under STORAGE_ROOT,
+the default) or "s3" (S3_BUCKET, optionally under S3_PREFIX; S3_ENDPOINT_URL
+points it at MinIO or another S3-compatible store). Every backend offers
+put / get_range / stream / delete / stat. Writes are streamed (multipart
+uploads on S3) and reads are chunked or ranged, so large datasets never
+have to be held in memory whole. An object becomes visible only once it has
+been written completely.
+
+sweep() removes converted outputs that haven't been used for
+CONVERTED_TTL_SECONDS, then, while storage holds more than
+STORAGE_QUOTA_BYTES, evicts the least recently used ones. "Used" is the
+object's modification time, which downloads refresh with touch() on local
+storage; on S3 it is the upload time. Either limit is disabled by setting it
+to 0.
+
+Downloads rebuild missing outputs on demand. With
+PERSIST_CONVERTED_OUTPUTS=false conversions don't write their CSV at all, and
+CACHE_REGENERATED_OUTPUTS controls whether a rebuilt CSV is kept afterwards.
+
+Only the standard library is imported up front (boto3 is loaded when the S3
+backend is first used) so conversion pool workers can use this module.
+"""
+import os
+import re
+import tempfile
+import time
+from collections import namedtuple
+
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "local")
+STORAGE_ROOT = os.environ.get("STORAGE_ROOT", "/tmp")
+S3_BUCKET = os.environ.get("S3_BUCKET", "")
+S3_PREFIX = os.environ.get("S3_PREFIX", "")
+S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL") or None
+# S3 requires every part but the last to be at least 5 MB
+S3_PART_SIZE = max(int(os.environ.get("S3_PART_SIZE", str(8 * 1024 * 1024))), 5 * 1024 * 1024)
+
+STORAGE_QUOTA_BYTES = int(os.environ.get("STORAGE_QUOTA_BYTES", str(10 * 1024 ** 3)))
+CONVERTED_TTL_SECONDS = int(os.environ.get("CONVERTED_TTL_SECONDS", str(7 * 24 * 3600)))
+SWEEP_INTERVAL_SECONDS = int(os.environ.get("STORAGE_SWEEP_INTERVAL_SECONDS", "600"))
+PERSIST_CONVERTED_OUTPUTS = os.environ.get("PERSIST_CONVERTED_OUTPUTS", "true").lower() == "true"
+CACHE_REGENERATED_OUTPUTS = os.environ.get("CACHE_REGENERATED_OUTPUTS", "true").lower() == "true"
+
+STREAM_CHUNK_BYTES = 1024 * 1024
+
+# {uuid4}_{rest}; anything else in storage (upload spool, profiles, ...) is left alone
+ARTIFACT_NAME = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}_(.+)$")
+
+ObjectInfo = namedtuple("ObjectInfo", ["key", "size", "mtime"])
+
+
+def original_key(file_id):
+    return f"{file_id}_original.json"
+
+
+def converted_key(file_id, formatted_filename):
+    return f"{file_id}_{formatted_filename}"
+
+
+def upload_part_key(upload_id, part_number):
+    return f"upload_{upload_id}_part_{part_number:06d}"
+
+
+def profile_key(profile_id):
+    return f"profile_{profile_id}.collapsed"
+
+
+class StorageBackend:
+    """
+    Common interface. Subclasses implement open_writer, get_range, stream,
+    delete, stat and list; put is built on open_writer.
+    """
+
+    def put(self, key, chunks):
+        """Store an iterable of byte chunks under key"""
+        writer = self.open_writer(key)
+        try:
+            for chunk in chunks:
+                writer.write(chunk)
+        except BaseException:
+            writer.abort()
+            raise
+        writer.commit()
+
+    def touch(self, key):
+        """Mark an object as recently used, where the backend can"""
+
+    def local_path(self, key):
+        """Filesystem path of an object, if it has one (lets downloads use sendfile)"""
+        return None
+
+
+class LocalWriter:
+    def __init__(self, root, path):
+        fd, self.partial_path = tempfile.mkstemp(dir=root, prefix=".partial_")
+        self.file = os.fdopen(fd, "wb")
+        self.path = path
+
+    def write(self, chunk):
+        self.file.write(chunk)
+
+    def commit(self):
+        self.file.close()
+        os.replace(self.partial_path, self.path)
+
+    def abort(self):
+        self.file.close()
+        try:
+            os.remove(self.partial_path)
+        except FileNotFoundError:
+            pass
+
+
+class LocalStorage(StorageBackend):
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
+
+    def open_writer(self, key):
+        os.makedirs(self.root, exist_ok=True)
+        return LocalWriter(self.root, self._path(key))
+
+    def get_range(self, key, start=0, length=None):
+        with open(self._path(key), "rb") as f:
+            f.seek(start)
+            return f.read() if length is None else f.read(length)
+
+    def stream(self, key, chunk_size=STREAM_CHUNK_BYTES):
+        with open(self._path(key), "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                yield chunk
+
+    def delete(self, key):
+        """Returns False if the object was already gone"""
+        try:
+            os.remove(self._path(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def stat(self, key):
+        try:
+            st = os.stat(self._path(key))
+        except FileNotFoundError:
+            return None
+        return ObjectInfo(key, st.st_size, st.st_mtime)
+
+    def list(self):
+        try:
+            entries = os.scandir(self.root)
+        except FileNotFoundError:
+            return
+        with entries:
+            for entry in entries:
+                try:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    st = entry.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                yield ObjectInfo(entry.name, st.st_size, st.st_mtime)
+
+    def touch(self, key):
+        try:
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def local_path(self, key):
+        return self._path(key)
+
+    def check(self):
+        os.makedirs(self.root, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=self.root, prefix=".ready_") as probe:
+            probe.write(b"ok")
+            probe.flush()
+
+
+class S3MultipartWriter:
+    """
+    Buffers at most one part in memory. Objects smaller than a part are sent
+    with a single PUT; larger ones become a multipart upload that is only
+    completed on commit.
+    """
+
+    def __init__(self, client, bucket, key, part_size):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.buffer = bytearray()
+        self.upload_id = None
+        self.parts = []
+
+    def _upload_part(self, data):
+        if self.upload_id is None:
+            self.upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=self.key)["UploadId"]
+        part_number = len(self.parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, PartNumber=part_number, Body=bytes(data)
+        )
+        self.parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+
+    def write(self, chunk):
+        self.buffer += chunk
+        while len(self.buffer) >= self.part_size:
+            self._upload_part(self.buffer[:self.part_size])
+            del self.buffer[:self.part_size]
+
+    def commit(self):
+        if self.upload_id is None:
+            self.client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self.buffer))
+            return
+        if self.buffer:
+            self._upload_part(self.buffer)
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, MultipartUpload={"Parts": self.parts}
+        )
+
+    def abort(self):
+        if self.upload_id is not None:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+
+
+class S3Storage(StorageBackend):
+    def __init__(self, bucket, prefix="", client=None, endpoint_url=None, part_size=S3_PART_SIZE):
+        if client is None:
+            import boto3
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.part_size = part_size
+
+    def _key(self, key):
+        return self.prefix + key
+
+    def _is_missing(self, error):
+        return error.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+    def open_writer(self, key):
+        return S3MultipartWriter(self.client, self.bucket, self._key(key), self.part_size)
+
+    def get_range(self, key, start=0, length=None):
+        byte_range = f"bytes={start}-" if length is None else f"bytes={start}-{start + length - 1}"
+        response = self.client.get_object(Bucket=self.bucket, Key=self._key(key), Range=byte_range)
+        return response["Body"].read()
+
+    def stream(self, key, chunk_size=STREAM_CHUNK_BYTES):
+        response = self.client.get_object(Bucket=self.bucket, Key=self._key(key))
+        body = response["Body"]
+        try:
+            for chunk in body.iter_chunks(chunk_size):
+                yield chunk
+        finally:
+            body.close()
+
+    def delete(self, key):
+        """S3 doesn't say whether the key existed, so this always returns True"""
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+        return True
+
+    def stat(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as e:
+            if self._is_missing(e):
+                return None
+            raise
+        return ObjectInfo(key, response["ContentLength"], response["LastModified"].timestamp())
+
+    def list(self):
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get("Contents", []):
+                key = item["Key"][len(self.prefix):]
+                if "/" in key:
+                    continue
+                yield ObjectInfo(key, item["Size"], item["LastModified"].timestamp())
+
+    def check(self):
+        self.client.head_bucket(Bucket=self.bucket)
+
+
+_backend = None
+
+
+def backend():
+    """The configured storage backend (created on first use in each process)"""
+    global _backend
+    if _backend is None:
+        if STORAGE_BACKEND == "s3":
+            _backend = S3Storage(S3_BUCKET, S3_PREFIX, endpoint_url=S3_ENDPOINT_URL)
+        elif STORAGE_BACKEND == "local":
+            _backend = LocalStorage(STORAGE_ROOT)
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+    return _backend
+
+
+def put(key, chunks):
+    backend().put(key, chunks)
+
+
+def open_writer(key):
+    """Writer for one object (write / commit / abort); nothing is visible until commit"""
+    return backend().open_writer(key)
+
+
+def get_range(key, start=0, length=None):
+    return backend().get_range(key, start, length)
+
+
+def stream(key, chunk_size=STREAM_CHUNK_BYTES):
+    return backend().stream(key, chunk_size)
+
+
+def read(key):
+    return b"".join(stream(key))
+
+
+def delete(key):
+    return backend().delete(key)
+
+
+def stat(key):
+    return backend().stat(key)
+
+
+def exists(key):
+    return stat(key) is not None
+
+
+def touch(key):
+    """Mark an artifact as recently used so LRU eviction keeps it"""
+    backend().touch(key)
+
+
+def local_path(key):
+    return backend().local_path(key)
+
+
+def check():
+    """Raise if storage can't be written to (readiness probe)"""
+    backend().check()
+
+
+def size_of(key):
+    info = stat(key)
+    return info.size if info else 0
+
+
+def write_through(chunks, key):
+    """
+    Pass byte chunks through unchanged while storing them under key. The
+    object only appears once every chunk has been written, so an interrupted
+    stream never leaves a truncated artifact behind.
+    """
+    writer = backend().open_writer(key)
+    completed = False
+    try:
+        for chunk in chunks:
+            writer.write(chunk)
+            yield chunk
+        writer.commit()
+        completed = True
+    finally:
+        if not completed:
+            writer.abort()
+
+
+def artifact_kind(name):
+    """'original', 'converted' or None for objects the manager doesn't own"""
+    match = ARTIFACT_NAME.match(name)
+    if not match:
+        return None
+    if match.group(1) == "original.json":
+        return "original"
+    if name.endswith(".csv"):
+        return "converted"
+    return None
+
+
+def scan():
+    """List (key, kind, size, mtime) for every managed artifact"""
+    artifacts = []
+    for info in backend().list():
+        kind = artifact_kind(info.key)
+        if kind is not None:
+            artifacts.append((info.key, kind, info.size, info.mtime))
+    return artifacts
+
+
+def usage():
+    """Bytes and object counts per artifact kind across all of storage"""
+    totals = {"original": {"files": 0, "bytes": 0}, "converted": {"files": 0, "bytes": 0}}
+    for _, kind, size, _ in scan():
+        totals[kind]["files"] += 1
+        totals[kind]["bytes"] += size
+    return totals
+
+
+def sweep(now=None):
+    """
+    Run one eviction pass. Returns counts and bytes evicted per reason
+    ("ttl" or "quota") plus the bytes left in storage.
+    """
+    now = time.time() if now is None else now
+    artifacts = scan()
+    evicted = {"ttl": {"files": 0, "bytes": 0}, "quota": {"files": 0, "bytes": 0}}
+
+    def evict(key, size, reason):
+        if delete(key):
+            evicted[reason]["files"] += 1
+            evicted[reason]["bytes"] += size
+
+    remaining = []
+    for key, kind, size, mtime in artifacts:
+        if kind == "converted" and CONVERTED_TTL_SECONDS and now - mtime > CONVERTED_TTL_SECONDS:
+            evict(key, size, "ttl")
+        else:
+            remaining.append((key, kind, size, mtime))
+
+    total_bytes = sum(size for _, _, size, _ in remaining)
+    if STORAGE_QUOTA_BYTES and total_bytes > STORAGE_QUOTA_BYTES:
+        # Least recently used converted outputs go first; originals are never evicted
+        candidates = sorted((a for a in remaining if a[1] == "converted"), key=lambda a: a[3])
+        for key, _, size, _ in candidates:
+            if total_bytes <= STORAGE_QUOTA_BYTES:
+                break
+            evict(key, size, "quota")
+            total_bytes -= size
+
+    return {"evicted": evicted, "total_bytes": total_bytes, "over_quota": bool(STORAGE_QUOTA_BYTES) and total_bytes > STORAGE_QUOTA_BYTES}
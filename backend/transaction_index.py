@@ -0,0 +1,179 @@
+"""
+Persistent index of converted transactions, used to spot duplicates across
+overlapping statements.
+
+Every conversion adds the identity hash of each exported row (see
+xero_converter.transactions) to the transaction_hashes collection, scoped
+to a user and an account. The account is the mapping's "account" if it sets
+one, otherwise the file's folder, so statements for one bank account are
+compared with each other and not with other accounts.
+
+Lookups go through an in-memory Bloom filter per user/account first. Rows
+it rules out (almost all rows of a new statement) never reach Mongo; the
+rest are confirmed with batched $in queries on the unique
+(user_id, account, hash) index. Filters are loaded from Mongo on first use
+and then catch up on hashes inserted since (by any process) before each
+lookup, so they never miss a hash another worker added. Deleting a file
+removes its hashes from Mongo; the filter keeps their bits, which only
+costs an extra confirmed lookup.
+"""
+import math
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError
+
+LOOKUP_BATCH_SIZE = 20_000
+INSERT_BATCH_SIZE = 20_000
+BLOOM_ERROR_RATE = 0.01
+BLOOM_MIN_CAPACITY = 100_000
+# Hashes processed per step, bounding the (hashes x hash_count) position matrix
+BLOOM_SLICE = 250_000
+# Catch-up queries look back this far to cover inserts committed slightly out of order
+SYNC_OVERLAP = timedelta(seconds=30)
+
+
+class BloomFilter:
+    """Bit-array Bloom filter over int64 hashes, vectorized with numpy"""
+
+    def __init__(self, capacity, error_rate=BLOOM_ERROR_RATE):
+        self.capacity = capacity
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+        self.count = 0
+
+    def positions(self, hashes):
+        # Double hashing: the two 32-bit halves of the (already well mixed) hash
+        values = np.asarray(hashes, dtype=np.int64).view(np.uint64)
+        low = values & np.uint64(0xFFFFFFFF)
+        high = (values >> np.uint64(32)) | np.uint64(1)
+        steps = np.arange(self.hash_count, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            return (low[:, None] + steps[None, :] * high[:, None]) % np.uint64(self.size)
+
+    def add(self, hashes):
+        for start in range(0, len(hashes), BLOOM_SLICE):
+            positions = self.positions(hashes[start:start + BLOOM_SLICE]).ravel()
+            masks = np.left_shift(1, positions & np.uint64(7)).astype(np.uint8)
+            np.bitwise_or.at(self.bits, positions >> np.uint64(3), masks)
+        self.count += len(hashes)
+
+    def contains(self, hashes):
+        """Boolean mask: False means definitely absent"""
+        found = np.zeros(len(hashes), dtype=bool)
+        for start in range(0, len(hashes), BLOOM_SLICE):
+            positions = self.positions(hashes[start:start + BLOOM_SLICE])
+            bits = (self.bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+            found[start:start + BLOOM_SLICE] = bits.all(axis=1)
+        return found
+
+    @property
+    def full(self):
+        return self.count > self.capacity
+
+
+class TransactionIndex:
+    def __init__(self, collection):
+        self.collection = collection
+        self.filters = {}
+        self.lock = threading.Lock()
+        self.indexes_ready = False
+
+    def ensure_indexes(self):
+        if self.indexes_ready:
+            return
+        self.collection.create_index(
+            [("user_id", ASCENDING), ("account", ASCENDING), ("hash", ASCENDING)], unique=True
+        )
+        self.collection.create_index([("user_id", ASCENDING), ("account", ASCENDING), ("created_at", ASCENDING)])
+        self.collection.create_index([("user_id", ASCENDING), ("file_id", ASCENDING)])
+        self.indexes_ready = True
+
+    def _load_filter(self, user_id, account):
+        """Build a filter from every stored hash for the account"""
+        scope = {"user_id": user_id, "account": account}
+        capacity = max(BLOOM_MIN_CAPACITY, 2 * self.collection.count_documents(scope))
+        bloom = BloomFilter(capacity)
+        watermark = datetime.utcnow()
+        hashes = [doc["hash"] for doc in self.collection.find(scope, {"hash": 1, "_id": 0})]
+        if hashes:
+            bloom.add(np.array(hashes, dtype=np.int64))
+        return {"bloom": bloom, "watermark": watermark}
+
+    def _filter(self, user_id, account):
+        """The account's filter, caught up with hashes other processes inserted since it was last synced"""
+        key = (user_id, account)
+        with self.lock:
+            entry = self.filters.get(key)
+            if entry is None or entry["bloom"].full:
+                entry = self.filters[key] = self._load_filter(user_id, account)
+                return entry["bloom"]
+
+            watermark = datetime.utcnow()
+            recent = self.collection.find(
+                {"user_id": user_id, "account": account, "created_at": {"$gte": entry["watermark"] - SYNC_OVERLAP}},
+                {"hash": 1, "_id": 0}
+            )
+            hashes = [doc["hash"] for doc in recent]
+            if hashes:
+                entry["bloom"].add(np.array(hashes, dtype=np.int64))
+            entry["watermark"] = watermark
+            return entry["bloom"]
+
+    def find_seen(self, user_id, account, hashes, exclude_file_id=None):
+        """
+        Boolean mask of hashes already indexed for the account. Hits from
+        exclude_file_id (the statement being converted again) don't count.
+        """
+        self.ensure_indexes()
+        hashes = np.asarray(hashes, dtype=np.int64)
+        seen = np.zeros(len(hashes), dtype=bool)
+        candidates = np.flatnonzero(self._filter(user_id, account).contains(hashes))
+
+        found = set()
+        for start in range(0, len(candidates), LOOKUP_BATCH_SIZE):
+            batch = [int(value) for value in hashes[candidates[start:start + LOOKUP_BATCH_SIZE]]]
+            query = {"user_id": user_id, "account": account, "hash": {"$in": batch}}
+            if exclude_file_id:
+                query["file_id"] = {"$ne": exclude_file_id}
+            found.update(doc["hash"] for doc in self.collection.find(query, {"hash": 1, "_id": 0}))
+
+        if found:
+            seen[candidates] = np.isin(hashes[candidates], np.fromiter(found, dtype=np.int64, count=len(found)))
+        return seen
+
+    def add(self, user_id, account, hashes, file_id, conversion_id=None):
+        """Index a conversion's rows; hashes that are already indexed keep their first file"""
+        self.ensure_indexes()
+        hashes = np.asarray(hashes, dtype=np.int64)
+        created_at = datetime.utcnow()
+        for start in range(0, len(hashes), INSERT_BATCH_SIZE):
+            documents = [
+                {
+                    "user_id": user_id,
+                    "account": account,
+                    "hash": int(value),
+                    "file_id": file_id,
+                    "conversion_id": conversion_id,
+                    "created_at": created_at
+                }
+                for value in hashes[start:start + INSERT_BATCH_SIZE]
+            ]
+            try:
+                self.collection.insert_many(documents, ordered=False)
+            except BulkWriteError as bwe:
+                # Duplicate keys are expected (rows converted before); anything else isn't
+                if any(error.get("code") != 11000 for error in bwe.details.get("writeErrors", [])):
+                    raise
+
+        with self.lock:
+            entry = self.filters.get((user_id, account))
+            if entry is not None:
+                entry["bloom"].add(hashes)
+
+    def remove_file(self, user_id, file_id):
+        self.ensure_indexes()
+        return self.collection.delete_many({"user_id": user_id, "file_id": file_id}).deleted_count
@@ -0,0 +1,82 @@
+"""
+Transaction search across a user's uploaded statements.
+
+Every ingested file adds one document per row to the transaction_search
+collection (built by xero_converter.search from the file's formatted rows,
+and rebuilt when the file is converted with another mapping). The indexes:
+
+- (user_id, terms): terms is an array of the words of the description and
+  cheque no., so this multikey index is an inverted index over them
+- (user_id, date) and (user_id, amount_units): range filters
+- (user_id, file_id, row): replacing or removing a file's rows
+
+Every query word must match, as a prefix of an indexed word ("amaz"
+finds "Amazon"); anchored regexes are answered from the terms index.
+Hits are sorted newest first, then by file and row, and paginated with
+page/page_size. One extra document is fetched to tell whether there is a
+next page, so no count is needed.
+"""
+import re
+
+from pymongo import ASCENDING, DESCENDING
+
+INSERT_BATCH_SIZE = 20_000
+HIT_FIELDS = {"_id": 0, "file_id": 1, "row": 1, "date": 1, "amount": 1, "description": 1, "cheque_no": 1}
+HIT_ORDER = [("date", DESCENDING), ("file_id", ASCENDING), ("row", ASCENDING)]
+
+
+class TransactionSearch:
+    def __init__(self, collection):
+        self.collection = collection
+        self.indexes_ready = False
+
+    def ensure_indexes(self):
+        if self.indexes_ready:
+            return
+        self.collection.create_index([("user_id", ASCENDING), ("terms", ASCENDING)])
+        self.collection.create_index([("user_id", ASCENDING), ("date", DESCENDING)])
+        self.collection.create_index([("user_id", ASCENDING), ("amount_units", ASCENDING)])
+        self.collection.create_index([("user_id", ASCENDING), ("file_id", ASCENDING), ("row", ASCENDING)])
+        self.indexes_ready = True
+
+    def index_file(self, user_id, file_id, entries):
+        """Replace the file's rows with entries (see xero_converter.search_entries)"""
+        self.remove_file(user_id, file_id)
+        for start in range(0, len(entries), INSERT_BATCH_SIZE):
+            self.collection.insert_many(
+                [{"user_id": user_id, "file_id": file_id, **entry} for entry in entries[start:start + INSERT_BATCH_SIZE]],
+                ordered=False
+            )
+
+    def remove_file(self, user_id, file_id):
+        self.ensure_indexes()
+        return self.collection.delete_many({"user_id": user_id, "file_id": file_id}).deleted_count
+
+    def search(self, user_id, terms=(), date_from=None, date_to=None, min_units=None, max_units=None,
+               file_ids=None, page=1, page_size=50):
+        """
+        A page of hits and whether more follow. terms are already tokenized;
+        dates are inclusive datetimes and amounts ints at the search exponent.
+        """
+        self.ensure_indexes()
+        query = {"user_id": user_id}
+        if terms:
+            query["$and"] = [{"terms": {"$regex": "^" + re.escape(term)}} for term in terms]
+        if date_from is not None or date_to is not None:
+            query["date"] = {}
+            if date_from is not None:
+                query["date"]["$gte"] = date_from
+            if date_to is not None:
+                query["date"]["$lte"] = date_to
+        if min_units is not None or max_units is not None:
+            query["amount_units"] = {}
+            if min_units is not None:
+                query["amount_units"]["$gte"] = min_units
+            if max_units is not None:
+                query["amount_units"]["$lte"] = max_units
+        if file_ids is not None:
+            query["file_id"] = {"$in": list(file_ids)}
+
+        cursor = self.collection.find(query, HIT_FIELDS).sort(HIT_ORDER).skip((page - 1) * page_size)
+        hits = list(cursor.limit(page_size + 1))
+        return hits[:page_size], len(hits) > page_size
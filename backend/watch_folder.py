@@ -0,0 +1,408 @@
+"""
+Watch-folder ingestion daemon.
+
+Watches directories for new statements and ingests each one into a user's
+folder the way /api/bulk-upload does: the file is parsed and its dataset
+stored on the conversion worker pool, then its file record is bulk-inserted.
+Optionally it is converted in the same pass, with the first matching
+mapping template (same format as xero-convert's) or the auto-mapping.
+
+    scripts/xero-watch --config watch.json
+    scripts/xero-watch --config watch.json --once    # one scan, then exit
+
+watch.json:
+
+    {
+      "checkpoint": "/var/lib/xero-watch/checkpoint.json",
+      "workers": 4,
+      "watches": [
+        {"path": "/share/exports", "user_email": "books@example.com", "folder_id": "<folder id>",
+         "recursive": true, "convert": true, "templates": "templates.json"}
+      ]
+    }
+
+"templates" is a template file or an inline template list. Changes are picked
+up through inotify when watchdog is installed, with a periodic rescan as a
+safety net; otherwise directories are polled every poll_interval seconds. A
+file is only ingested once its size and modification time have stayed the
+same for settle_seconds. Temporary names (dotfiles, *.part, *.tmp, *~) are
+ignored, so writers that rename into place are picked up once complete.
+
+At most max_in_flight files (default: two per worker) are queued on the
+pool. Ready files beyond that wait for the next round, so a large drop
+doesn't pile every parsed file up in memory.
+
+The checkpoint records every file by path with its size and modification
+time. A file whose entry matches is not ingested again, including after a
+restart; a changed file is ingested again as a new upload. Each file id is
+checkpointed as soon as its work is queued, before its record is written, so
+after a crash a file whose record made it into Mongo is not ingested twice,
+and one whose record didn't is retried under the same id.
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+import conversion_worker
+import server
+import storage
+from xero_convert import input_file_type, parse_templates, select_template
+
+DEFAULT_CHECKPOINT = os.environ.get("WATCH_CHECKPOINT", "/tmp/xero_watch_checkpoint.json")
+DEFAULT_SETTLE_SECONDS = 5.0
+DEFAULT_POLL_INTERVAL = 2.0
+# With inotify, a full rescan still runs this often in case an event was missed
+RESCAN_INTERVAL = 60.0
+
+TEMPORARY_SUFFIXES = (".part", ".tmp", ".crdownload", "~")
+
+
+def is_temporary(filename):
+    return filename.startswith(".") or filename.lower().endswith(TEMPORARY_SUFFIXES)
+
+
+class Checkpoint:
+    """Per-file ingest state, persisted as JSON and replaced atomically on save"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f).get("files", {})
+
+    def is_current(self, path, stat):
+        entry = self.entries.get(path)
+        return bool(entry) and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns
+
+    def record(self, path, stat, **fields):
+        self.entries[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, **fields}
+
+    def update(self, path, **fields):
+        self.entries[path].update(fields)
+
+    def pending(self):
+        return {path: entry for path, entry in self.entries.items() if entry.get("status") == "pending"}
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".checkpoint-")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"files": self.entries}, f)
+        os.replace(temp_path, self.path)
+
+
+class Watch:
+    """One watched directory and where its files go"""
+
+    def __init__(self, config, index):
+        self.path = os.path.abspath(config["path"])
+        self.recursive = config.get("recursive", True)
+        self.convert = config.get("convert", False)
+        self.folder_id = config.get("folder_id") or None
+
+        if not os.path.isdir(self.path):
+            raise ValueError(f"watches[{index}]: {self.path} is not a directory")
+        self.user = server.get_user(config.get("user_email", ""))
+        if self.user is None:
+            raise ValueError(f"watches[{index}]: user {config.get('user_email')!r} not found")
+        if self.folder_id and self.folder_id != "root":
+            if not server.db.folders.find_one({"id": self.folder_id, "user_id": self.user.id}):
+                raise ValueError(f"watches[{index}]: folder {self.folder_id} not found")
+
+        templates = config.get("templates", [])
+        if isinstance(templates, str):
+            with open(templates) as f:
+                templates = parse_templates(json.load(f), templates)
+        else:
+            templates = parse_templates(templates, f"watches[{index}].templates")
+        self.templates = templates
+
+    def files(self):
+        """Supported, non-temporary files currently in the directory"""
+        for dirpath, dirnames, filenames in os.walk(self.path):
+            if not self.recursive:
+                dirnames.clear()
+            dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+            for filename in filenames:
+                if not is_temporary(filename) and input_file_type(filename) is not None:
+                    yield os.path.join(dirpath, filename)
+
+    def owns(self, path):
+        return path.startswith(self.path + os.sep) and (self.recursive or os.path.dirname(path) == self.path)
+
+
+class ChangeNotifier:
+    """
+    Wakes the daemon when files change. Uses inotify through watchdog when
+    it is installed; otherwise the daemon just polls.
+    """
+
+    def __init__(self, paths, recursive):
+        self.event = threading.Event()
+        self.observer = None
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return
+
+        notifier = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                notifier.event.set()
+
+        self.observer = Observer()
+        for path in paths:
+            self.observer.schedule(Handler(), path, recursive=recursive)
+        self.observer.start()
+
+    @property
+    def active(self):
+        return self.observer is not None
+
+    def wait(self, timeout):
+        """True if something changed before the timeout"""
+        changed = self.event.wait(timeout)
+        self.event.clear()
+        return changed
+
+    def stop(self):
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
+
+
+class WatchDaemon:
+    def __init__(self, config, workers=None):
+        self.watches = [Watch(watch, index) for index, watch in enumerate(config.get("watches", []))]
+        if not self.watches:
+            raise ValueError("No watches configured")
+        self.checkpoint = Checkpoint(config.get("checkpoint", DEFAULT_CHECKPOINT))
+        self.settle_seconds = float(config.get("settle_seconds", DEFAULT_SETTLE_SECONDS))
+        self.poll_interval = float(config.get("poll_interval", DEFAULT_POLL_INTERVAL))
+        self.workers = workers or int(config.get("workers", server.CONVERSION_WORKERS))
+        self.max_in_flight = int(config.get("max_in_flight", self.workers * 2))
+
+        # path -> ((size, mtime_ns), monotonic time it was first seen with that signature)
+        self.observed = {}
+        self.in_flight = {}
+        self.stopping = False
+        self.notifier = None
+
+    def watch_for(self, path):
+        return next((watch for watch in self.watches if watch.owns(path)), None)
+
+    def settled(self, now):
+        """Files that are new or changed since their checkpoint and have stopped changing"""
+        ready = []
+        seen = set()
+        for watch in self.watches:
+            for path in watch.files():
+                seen.add(path)
+                if path in self.in_flight:
+                    continue
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                # Empty files are usually still being created
+                if stat.st_size == 0 or self.checkpoint.is_current(path, stat):
+                    continue
+                signature = (stat.st_size, stat.st_mtime_ns)
+                previous = self.observed.get(path)
+                if previous is None or previous[0] != signature:
+                    self.observed[path] = (signature, now)
+                elif now - previous[1] >= self.settle_seconds:
+                    ready.append((path, watch, stat))
+        # Forget files that disappeared before settling
+        for path in list(self.observed):
+            if path not in seen:
+                del self.observed[path]
+        return ready
+
+    def submit(self, executor, path, watch, stat, file_id=None):
+        file_id = file_id or str(uuid.uuid4())
+        filename = os.path.basename(path).lower()
+        job = {"path": path, "watch": watch, "file_id": file_id, "filename": filename, "size": stat.st_size}
+
+        column_mapping, output_key = None, None
+        if watch.convert:
+            template = select_template(watch.templates, filename)
+            column_mapping = server.resolve_rule_set(template["column_mapping"], watch.user) if template else None
+            job["formatted_filename"] = server.get_formatted_filename(filename)
+            output_key = (
+                storage.converted_key(file_id, job["formatted_filename"]) if storage.PERSIST_CONVERTED_OUTPUTS else None
+            )
+        args = [
+            file_id, path, input_file_type(filename), watch.convert, column_mapping, output_key,
+            server.resolve_rule_set({}, watch.user)
+        ]
+
+        # The id is checkpointed (saved by the caller) before the work can finish
+        self.checkpoint.record(path, stat, status="pending", file_id=file_id)
+        self.observed.pop(path, None)
+        self.in_flight[path] = job
+        return executor.submit(conversion_worker.ingest_path, *args), job
+
+    def finish(self, completed):
+        """Store records for finished jobs in bulk, then checkpoint them"""
+        pending, results, result_jobs, conversions, indexed = [], [], [], [], []
+        for future, job in completed:
+            watch = job["watch"]
+            try:
+                dataset_hash, column_mapping, row_count, derived = future.result()
+            except Exception as e:
+                print(f"Error ingesting {job['path']}: {str(e)}")
+                self.checkpoint.update(job["path"], status="failed", error=str(e))
+                continue
+
+            file_type = "csv" if input_file_type(job["filename"]) == "csv.gz" else input_file_type(job["filename"])
+            file_record = server.build_file_record(
+                job["file_id"], job["filename"], file_type, job["size"], watch.folder_id, watch.user, dataset_hash
+            )
+            pending.append((file_record, len(results), derived))
+            results.append({"file_id": job["file_id"], "filename": job["filename"], "success": True})
+            result_jobs.append(job)
+            if column_mapping is not None:
+                conversion = server.build_conversion_record(
+                    file_record, job["formatted_filename"], column_mapping, watch.user
+                )
+                conversions.append(conversion)
+                indexed.append((file_record, column_mapping, derived["hashes"], conversion["id"], watch.user))
+            job["row_count"] = row_count
+
+        server.insert_file_records(pending, results)
+        stored = {result["file_id"] for result in results if result.get("success")}
+        conversions = [conversion for conversion in conversions if conversion["file_id"] in stored]
+        if conversions:
+            server.db.conversions.insert_many(conversions)
+        for file_record, column_mapping, hashes, conversion_id, user in indexed:
+            if file_record["id"] in stored:
+                server.index_conversion(file_record, column_mapping, hashes, conversion_id, user)
+        converted = {conversion["file_id"]: conversion["id"] for conversion in conversions}
+
+        for result, job in zip(results, result_jobs):
+            if not result["success"]:
+                # insert_file_records replaced the entry with the error
+                self.checkpoint.update(job["path"], status="failed", error=result.get("error"))
+                continue
+            self.checkpoint.update(
+                job["path"], status="ingested", ingested_at=datetime.utcnow().isoformat(),
+                conversion_id=converted.get(job["file_id"])
+            )
+            print(f"Ingested {job['path']} ({job['row_count']:,} rows) as {job['file_id']}"
+                  + (f", converted {converted[job['file_id']]}" if job["file_id"] in converted else ""))
+
+        for _, job in completed:
+            self.in_flight.pop(job["path"], None)
+        self.checkpoint.save()
+
+    def recover(self, executor):
+        """Resolve files that were in flight when the daemon last stopped"""
+        futures = {}
+        for path, entry in self.checkpoint.pending().items():
+            if server.db.files.find_one({"id": entry["file_id"]}, {"_id": 1}):
+                self.checkpoint.update(path, status="ingested")
+                continue
+            watch = self.watch_for(path)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                stat = None
+            if watch is None or stat is None:
+                del self.checkpoint.entries[path]
+                continue
+            future, job = self.submit(executor, path, watch, stat, file_id=entry["file_id"])
+            futures[future] = job
+        self.checkpoint.save()
+        return futures
+
+    def run(self, once=False):
+        notifier = self.notifier = ChangeNotifier(
+            [watch.path for watch in self.watches], any(watch.recursive for watch in self.watches)
+        )
+        mode = "inotify" if notifier.active else f"polling every {self.poll_interval}s"
+        print(f"Watching {', '.join(watch.path for watch in self.watches)} ({mode}, {self.workers} workers)")
+
+        futures = {}
+        last_scan = None
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                futures.update(self.recover(executor))
+                while not self.stopping:
+                    now = time.monotonic()
+                    # Backpressure: only queue what the pool can take; the rest waits for a later round
+                    submitted = False
+                    for path, watch, stat in self.settled(now):
+                        if len(futures) >= self.max_in_flight:
+                            break
+                        future, job = self.submit(executor, path, watch, stat)
+                        futures[future] = job
+                        submitted = True
+                    if submitted:
+                        self.checkpoint.save()
+                    last_scan = now
+
+                    if futures:
+                        done, _ = wait(futures, timeout=0.5, return_when=FIRST_COMPLETED)
+                        if done:
+                            self.finish([(future, futures.pop(future)) for future in done])
+                            continue
+
+                    if once and not futures and not self.observed:
+                        break
+
+                    # Observed files are re-checked once they may have settled
+                    timeout = self.settle_seconds if self.observed else self.poll_interval
+                    if notifier.active and not self.observed:
+                        timeout = max(0.0, RESCAN_INTERVAL - (time.monotonic() - last_scan))
+                    if not futures:
+                        notifier.wait(timeout)
+
+                # Record whatever was already queued before exiting
+                if futures:
+                    wait(futures)
+                    self.finish(list(futures.items()))
+        finally:
+            notifier.stop()
+
+    def stop(self, *_):
+        self.stopping = True
+        if self.notifier is not None:
+            self.notifier.event.set()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="xero-watch", description="Ingest statements dropped into watched folders")
+    parser.add_argument("--config", required=True, help="Daemon configuration JSON")
+    parser.add_argument("-w", "--workers", type=int, help="Worker processes (overrides the config)")
+    parser.add_argument("--once", action="store_true", help="Ingest what is there now, then exit")
+    args = parser.parse_args(argv)
+
+    try:
+        with open(args.config) as f:
+            config = json.load(f)
+        daemon = WatchDaemon(config, workers=args.workers)
+    except (OSError, ValueError) as e:
+        print(f"xero-watch: {e}", file=sys.stderr)
+        return 2
+
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+    daemon.run(once=args.once)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
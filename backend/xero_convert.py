@@ -0,0 +1,310 @@
+"""
+Offline batch conversion: the API's parse / auto-map / format pipeline run
+over files on disk, with no Mongo, network or running server.
+
+    scripts/xero-convert statements/ --output-dir converted/
+    scripts/xero-convert 'share/**/*.csv' --template templates.json --workers 8 --report run.json
+
+Inputs are files, directories (searched recursively for .csv, .csv.gz and
+.xlsx) or glob patterns; earlier outputs (*_formatted.csv) are ignored so a
+nightly run can point at the same directory again. Each file is converted
+on a process pool and its Xero CSV is streamed to <name>_formatted.csv, next
+to the input or under --output-dir (keeping paths relative to a directory
+argument). Outputs are written to a temporary name and renamed into place
+when complete. Files are parsed whole so column types match the API's;
+--stream reads CSVs a chunk at a time instead, for files too big for memory.
+
+A template file holds one saved mapping or a list of them:
+
+    [
+      {"name": "ANZ", "match": "anz_*.csv",
+       "column_mapping": {"A": "Date", "C": "Details", "D": "Amount", "transaction_type": "Type"},
+       "dc_rules": [{"match": "exact", "pattern": "dr", "side": "debit"}]},
+      {"name": "default", "column_mapping": {...}}
+    ]
+
+The first template whose "match" glob fits the file name is used; one
+without "match" fits every file. "dc_rules" and "currency_exponent" can sit
+next to "column_mapping" or inside it. Files no template fits are
+auto-mapped, as in the API.
+
+A line is printed per file as it finishes (rows, seconds, rows/s, MB/s);
+--report also writes the results as JSON. The exit status is 1 if any file
+failed.
+"""
+import argparse
+import fnmatch
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+INPUT_FILE_TYPES = (".csv.gz", "csv.gz"), (".csv", "csv"), (".xlsx", "xlsx")
+# Mapping options a template can give next to its column mapping
+TEMPLATE_OPTIONS = ("dc_rules", "currency_exponent")
+
+
+def input_file_type(path):
+    """csv, csv.gz or xlsx from the file name; None if unsupported"""
+    name = path.lower()
+    for suffix, file_type in INPUT_FILE_TYPES:
+        if name.endswith(suffix):
+            return file_type
+    return None
+
+
+def formatted_name(filename):
+    """Same naming as the API: <original>_formatted.csv"""
+    return f"{filename.split('.')[0]}_formatted.csv"
+
+
+def is_output(path):
+    return os.path.basename(path).lower().endswith("_formatted.csv")
+
+
+def expand_inputs(patterns):
+    """
+    (input path, path relative to its argument) for every supported file;
+    directories are searched recursively, anything with * ? [ is a glob
+    """
+    found = {}
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for dirpath, _, filenames in os.walk(pattern):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    found.setdefault(os.path.abspath(path), (path, os.path.relpath(path, pattern)))
+        elif glob.has_magic(pattern):
+            for path in glob.glob(pattern, recursive=True):
+                if os.path.isfile(path):
+                    found.setdefault(os.path.abspath(path), (path, os.path.basename(path)))
+        elif os.path.isfile(pattern):
+            found.setdefault(os.path.abspath(pattern), (pattern, os.path.basename(pattern)))
+        else:
+            raise ValueError(f"No such file or directory: {pattern}")
+    return sorted(
+        (entry for entry in found.values() if input_file_type(entry[0]) and not is_output(entry[0])),
+        key=lambda entry: entry[0]
+    )
+
+
+def parse_templates(content, source="templates"):
+    """Validate one template or a list of them (already decoded JSON); raises ValueError"""
+    from xero_converter import normalize_rules
+
+    templates = []
+    entries = content if isinstance(content, list) else [content]
+    for index, entry in enumerate(entries):
+        label = f"{source}[{index}]"
+        if not isinstance(entry, dict):
+            raise ValueError(f"{label}: a template must be an object")
+        mapping = dict(entry.get("column_mapping", entry))
+        for option in TEMPLATE_OPTIONS:
+            if option in entry:
+                mapping[option] = entry[option]
+        for key in ("name", "match", "column_mapping"):
+            mapping.pop(key, None)
+        if "dc_rules" in mapping:
+            try:
+                mapping["dc_rules"] = normalize_rules(mapping["dc_rules"])
+            except ValueError as e:
+                raise ValueError(f"{label}: {e}")
+        templates.append({
+            "name": entry.get("name") or label,
+            "match": entry.get("match"),
+            "column_mapping": mapping
+        })
+    return templates
+
+
+def load_templates(paths):
+    """Read and validate template files; raises ValueError with a readable message"""
+    templates = []
+    for path in paths:
+        with open(path) as f:
+            templates.extend(parse_templates(json.load(f), path))
+    return templates
+
+
+def select_template(templates, filename):
+    for template in templates:
+        if template["match"] is None or fnmatch.fnmatch(filename.lower(), template["match"].lower()):
+            return template
+    return None
+
+
+def convert_path(path, file_type, output_path, column_mapping=None, stream=False):
+    """
+    Pool job: parse, map and format one file and stream its CSV to
+    output_path a chunk at a time. Auto-maps when column_mapping is None.
+    With stream the input is read incrementally too (see xero_converter.streaming).
+    """
+    from xero_converter import (
+        format_chunks, iter_csv_bytes, iter_file_chunks, iter_frame_chunks, parse_file_path, with_auto_mapping
+    )
+
+    start = time.perf_counter()
+    if stream:
+        chunks = iter_file_chunks(path, file_type)
+    else:
+        chunks = iter_frame_chunks(parse_file_path(path, file_type))
+    if column_mapping is None:
+        column_mapping, chunks = with_auto_mapping(chunks)
+
+    rows = 0
+
+    def counted(xero_chunks):
+        nonlocal rows
+        for chunk in xero_chunks:
+            rows += len(chunk)
+            yield chunk
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    partial_path = output_path + ".part"
+    try:
+        with open(partial_path, "wb") as f:
+            for data in iter_csv_bytes(counted(format_chunks(chunks, column_mapping))):
+                f.write(data)
+        os.replace(partial_path, output_path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+
+    return {
+        "rows": rows,
+        "seconds": time.perf_counter() - start,
+        "column_mapping": column_mapping
+    }
+
+
+def plan_jobs(inputs, templates, output_dir, skip_existing):
+    """Work items and the results for files that are skipped outright"""
+    jobs, skipped, outputs = [], [], set()
+    for path, relative in inputs:
+        if output_dir:
+            output_path = os.path.join(output_dir, os.path.dirname(relative), formatted_name(os.path.basename(path)))
+        else:
+            output_path = os.path.join(os.path.dirname(path), formatted_name(os.path.basename(path)))
+
+        result = {"input": path, "output": output_path}
+        if os.path.abspath(output_path) in outputs:
+            skipped.append({**result, "status": "failed", "error": "Output name collides with another input"})
+            continue
+        outputs.add(os.path.abspath(output_path))
+        if skip_existing and os.path.exists(output_path):
+            skipped.append({**result, "status": "skipped"})
+            continue
+
+        template = select_template(templates, os.path.basename(path))
+        jobs.append({
+            **result,
+            "file_type": input_file_type(path),
+            "template": template["name"] if template else None,
+            "column_mapping": template["column_mapping"] if template else None
+        })
+    return jobs, skipped
+
+
+def report_line(result):
+    if result["status"] != "converted":
+        return f"{result['status']:<9} {result['input']}" + (f": {result['error']}" if result.get("error") else "")
+    seconds = result["seconds"]
+    rows_per_second = result["rows"] / seconds if seconds > 0 else 0
+    mb_per_second = result["input_bytes"] / 1e6 / seconds if seconds > 0 else 0
+    return (f"converted {result['input']} -> {result['output']}  {result['rows']:,} rows  "
+            f"{seconds:.2f}s  {rows_per_second:,.0f} rows/s  {mb_per_second:.1f} MB/s"
+            + (f"  [{result['template']}]" if result.get("template") else ""))
+
+
+def run(jobs, workers, on_result, stream=False):
+    """Convert the jobs (in-process when workers is 1); on_result gets each result as it finishes"""
+    def finish(job, outcome=None, error=None):
+        result = {key: job[key] for key in ("input", "output", "template")}
+        result["input_bytes"] = os.path.getsize(job["input"])
+        if error is not None:
+            result.update(status="failed", error=str(error))
+        else:
+            result.update(status="converted", rows=outcome["rows"], seconds=outcome["seconds"])
+        on_result(result)
+
+    args = lambda job: (job["input"], job["file_type"], job["output"], job["column_mapping"], stream)  # noqa: E731
+
+    if workers <= 1:
+        for job in jobs:
+            try:
+                finish(job, convert_path(*args(job)))
+            except Exception as e:
+                finish(job, error=e)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(convert_path, *args(job)): job for job in jobs}
+        for future in as_completed(futures):
+            try:
+                finish(futures[future], future.result())
+            except Exception as e:
+                finish(futures[future], error=e)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="xero-convert", description="Convert bank statements to Xero CSV offline"
+    )
+    parser.add_argument("inputs", nargs="+", help="Files, directories or glob patterns")
+    parser.add_argument("-o", "--output-dir", help="Write outputs here instead of next to each input")
+    parser.add_argument("-t", "--template", action="append", default=[], help="Mapping template JSON (repeatable)")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="Read CSVs incrementally to bound memory (column types are then inferred per chunk)"
+    )
+    parser.add_argument("--skip-existing", action="store_true", help="Leave files whose output already exists")
+    parser.add_argument("--report", help="Write per-file results as JSON to this path")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Only print failures and the summary")
+    args = parser.parse_args(argv)
+
+    try:
+        templates = load_templates(args.template)
+        inputs = expand_inputs(args.inputs)
+    except (OSError, ValueError) as e:
+        print(f"xero-convert: {e}", file=sys.stderr)
+        return 2
+
+    jobs, results = plan_jobs(inputs, templates, args.output_dir, args.skip_existing)
+    for result in results:
+        if not args.quiet or result["status"] == "failed":
+            print(report_line(result))
+
+    def on_result(result):
+        results.append(result)
+        if not args.quiet or result["status"] == "failed":
+            print(report_line(result), flush=True)
+
+    start = time.perf_counter()
+    run(jobs, max(1, min(args.workers, len(jobs))), on_result, args.stream)
+    elapsed = time.perf_counter() - start
+
+    converted = [r for r in results if r["status"] == "converted"]
+    failed = [r for r in results if r["status"] == "failed"]
+    rows = sum(r["rows"] for r in converted)
+    print(f"{len(converted)} converted, {len(results) - len(converted) - len(failed)} skipped, "
+          f"{len(failed)} failed; {rows:,} rows in {elapsed:.2f}s"
+          + (f" ({rows / elapsed:,.0f} rows/s)" if elapsed > 0 and rows else ""))
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({
+                "elapsed_seconds": elapsed,
+                "workers": args.workers,
+                "rows": rows,
+                "results": sorted(results, key=lambda r: r["input"])
+            }, f, indent=2)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
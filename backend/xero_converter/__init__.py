@@ -0,0 +1,62 @@
+"""
+Conversion engine: parse bank statements, auto-map their columns and apply
+the Xero CSV format.
+
+Kept free of web and database imports so it can be loaded lazily by the API
+(pandas/numpy are only imported when a conversion actually runs) and used
+directly by the CLI, the conversion workers and the benchmarks. Importing it
+never opens a connection.
+
+- parsing: statements (CSV, gzipped CSV, XLSX) into dataframes
+- mapping: auto-mapping source columns to the Xero columns
+- formatting: apply_xero_format and its column rules
+- amounts: exact integer minor-unit amounts
+- dc_rules: debit/credit rule sets
+- columns: dictionary encoding of low-cardinality columns
+- records: JSON records for storage and previews
+- streaming: the chunked generator API (see its docstring)
+- transactions: row identity hashes for duplicate detection
+- search: per-row entries for transaction search
+- summary: totals, date span and per-month sums of a statement
+- periods: splitting rows into months or quarters
+"""
+from .amounts import (
+    AMOUNT_PATTERN, DEFAULT_CURRENCY_EXPONENT, MAX_CURRENCY_EXPONENT, MAX_UNIT_DIGITS, currency_exponent,
+    parse_minor_units, render_minor_units, rescale_units
+)
+from .columns import (
+    LOW_CARDINALITY_MAX_RATIO, broadcast, decoded, dictionary_encode, encode_low_cardinality, is_text_column,
+    map_unique
+)
+from .dc_rules import DEFAULT_RULES, RuleEvaluator, compile_rules, normalize_rules
+from .formatting import (
+    XERO_DATE_FORMAT, apply_amount_signs, apply_xero_format, format_date, format_frame, parse_date, raw_amount_text,
+    reference_codes, transaction_sides
+)
+from .mapping import auto_map_columns
+from .parsing import parse_file_content, parse_file_path
+from .periods import PERIODS, UNDATED, partition_by_period, period_labels, select_period
+from .records import (
+    RECORDS_CHUNK_ROWS, dataframe_from_records, iter_records_json, read_records_json, safe_json_serialize
+)
+from .search import SEARCH_AMOUNT_EXPONENT, amount_units, search_entries, tokenize
+from .streaming import (
+    DEFAULT_CHUNK_ROWS, format_chunks, format_frame_chunks, iter_csv_bytes, iter_csv_chunks, iter_file_chunks,
+    iter_frame_chunks, with_auto_mapping
+)
+from .summary import SUMMARY_AMOUNT_EXPONENT, merge_summaries, summarize
+from .transactions import normalize_text, occurrence_hashes, transaction_hashes, transaction_keys
+
+__all__ = [
+    "AMOUNT_PATTERN", "DEFAULT_CURRENCY_EXPONENT", "MAX_CURRENCY_EXPONENT", "MAX_UNIT_DIGITS", "currency_exponent",
+    "parse_minor_units", "render_minor_units", "rescale_units", "LOW_CARDINALITY_MAX_RATIO", "broadcast", "decoded",
+    "dictionary_encode", "encode_low_cardinality", "is_text_column", "map_unique", "DEFAULT_RULES", "RuleEvaluator",
+    "compile_rules", "normalize_rules", "XERO_DATE_FORMAT", "apply_amount_signs", "apply_xero_format",
+    "format_date", "format_frame", "parse_date", "raw_amount_text", "reference_codes", "transaction_sides",
+    "auto_map_columns", "parse_file_content", "parse_file_path", "RECORDS_CHUNK_ROWS", "dataframe_from_records",
+    "iter_records_json", "read_records_json", "safe_json_serialize", "DEFAULT_CHUNK_ROWS", "format_chunks",
+    "format_frame_chunks", "iter_csv_bytes", "iter_csv_chunks", "iter_file_chunks", "iter_frame_chunks",
+    "with_auto_mapping", "normalize_text", "occurrence_hashes", "transaction_hashes", "transaction_keys",
+    "SEARCH_AMOUNT_EXPONENT", "amount_units", "search_entries", "tokenize", "SUMMARY_AMOUNT_EXPONENT",
+    "merge_summaries", "summarize", "PERIODS", "UNDATED", "partition_by_period", "period_labels", "select_period"
+]
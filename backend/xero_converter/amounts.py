@@ -0,0 +1,75 @@
+"""Amounts as exact integer minor units"""
+import pandas as pd
+
+
+# Amounts are handled as integers in minor units (cents for the default
+# exponent of 2) from parsing to output, so there is no float rounding and
+# each amount is parsed exactly once. A mapping can set "currency_exponent"
+# for currencies with a different number of decimals (e.g. 0 for JPY).
+DEFAULT_CURRENCY_EXPONENT = 2
+# ISO 4217 currencies have at most four decimals
+MAX_CURRENCY_EXPONENT = 4
+
+# Optional sign, digits and an optional fraction once everything else is stripped
+AMOUNT_PATTERN = r'^(-?)(\d*)(?:\.(\d*))?$'
+
+# Minor units are int64, so at most 18 digits (whole and fraction together)
+# are parsed; longer amounts are treated as not parsing instead of wrapping
+MAX_UNIT_DIGITS = 18
+INT64_MAX = 2 ** 63 - 1
+
+def currency_exponent(column_mapping):
+    """The mapping's currency_exponent; ValueError unless it is an integer from 0 to MAX_CURRENCY_EXPONENT"""
+    value = column_mapping.get('currency_exponent')
+    if value is None:
+        return DEFAULT_CURRENCY_EXPONENT
+    try:
+        exponent = None if isinstance(value, bool) else int(str(value).strip())
+    except ValueError:
+        exponent = None
+    if exponent is None or not 0 <= exponent <= MAX_CURRENCY_EXPONENT:
+        raise ValueError(f"currency_exponent must be an integer from 0 to {MAX_CURRENCY_EXPONENT}")
+    return exponent
+
+def rescale_units(units, exponent, target=MAX_CURRENCY_EXPONENT):
+    """
+    Minor units at exponent as (exact) units at a target exponent that is at
+    least as large; <NA> where the rescaled amount wouldn't fit in int64
+    """
+    factor = 10 ** (target - exponent)
+    if factor == 1:
+        return units
+    fits = (units.abs() <= INT64_MAX // factor).fillna(False)
+    return units.where(fits) * factor
+
+def parse_minor_units(values, exponent=DEFAULT_CURRENCY_EXPONENT):
+    """
+    Parse amounts into integer minor units without going through float.
+    Everything but digits, "." and "-" is stripped first, so "1,234.50" and
+    "$1234.5" both become 123450; extra decimals are rounded half up.
+    Returns a nullable Int64 series with <NA> where a value doesn't parse,
+    including amounts with more than MAX_UNIT_DIGITS digits in minor units.
+    """
+    text = pd.Series(values, copy=False).astype("string").str.replace(r'[^\d.-]', '', regex=True)
+    parts = text.str.extract(AMOUNT_PATTERN)
+    sign, whole, fraction = parts[0], parts[1].fillna(""), parts[2].fillna("")
+    valid = sign.notna() & ((whole.str.len() > 0) | (fraction.str.len() > 0))
+    valid &= (whole.str.lstrip("0").str.len() + exponent <= MAX_UNIT_DIGITS).fillna(False)
+    
+    scale = 10 ** exponent
+    units = whole.where(whole.str.len() > 0, "0").where(valid).astype("Int64") * scale
+    if exponent > 0:
+        units = units + fraction.str.ljust(exponent, "0").str.slice(0, exponent).where(valid).astype("Int64")
+    round_up = fraction.str.slice(exponent, exponent + 1).where(valid).isin(list("56789"))
+    units = units + round_up.astype("Int64")
+    
+    return units.where(sign != "-", -units)
+
+def render_minor_units(units, exponent=DEFAULT_CURRENCY_EXPONENT):
+    """Render minor units as plain decimal strings ("-1234.50"); <NA> stays <NA>"""
+    scale = 10 ** exponent
+    magnitude = units.abs()
+    text = (magnitude // scale).astype("string")
+    if exponent > 0:
+        text = text + "." + (magnitude % scale).astype("string").str.zfill(exponent)
+    return text.where(~(units < 0).fillna(False), "-" + text)
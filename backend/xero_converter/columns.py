@@ -0,0 +1,61 @@
+"""
+Dictionary encoding: low-cardinality text columns are stored as categoricals
+and per-value work runs once per distinct value
+"""
+import numpy as np
+import pandas as pd
+
+
+# String columns with at most this share of distinct values (transaction
+# types, dates, currencies...) are stored as categoricals: one dictionary of
+# distinct values plus integer codes per row
+LOW_CARDINALITY_MAX_RATIO = 0.5
+
+def encode_low_cardinality(df, max_ratio=LOW_CARDINALITY_MAX_RATIO):
+    """Dictionary-encode low-cardinality string columns as categoricals"""
+    encoded = {}
+    for col in df.columns:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype) or len(values) < 2 or not is_text_column(values):
+            continue
+        present = values.dropna()
+        if present.empty or not present.map(type).eq(str).all():
+            continue
+        if present.nunique() <= max_ratio * len(values):
+            encoded[col] = values.astype("category")
+    return df.assign(**encoded) if encoded else df
+
+def dictionary_encode(values):
+    """
+    (codes, uniques) for a column: uniques holds each distinct non-missing
+    value once and codes[i] is row i's position in it, -1 where missing.
+    Categoricals already carry this encoding.
+    """
+    values = pd.Series(values, copy=False)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), pd.Series(values.cat.categories.astype(object), dtype=object)
+    codes, uniques = pd.factorize(values)
+    return codes, pd.Series(np.asarray(uniques, dtype=object), dtype=object)
+
+def decoded(values):
+    """Plain values for output; categoricals are expanded back to objects"""
+    return values.astype(object) if isinstance(values.dtype, pd.CategoricalDtype) else values
+
+def is_text_column(values):
+    return (
+        isinstance(values.dtype, pd.CategoricalDtype)
+        or pd.api.types.is_object_dtype(values)
+        or pd.api.types.is_string_dtype(values)
+    )
+
+def broadcast(results, codes):
+    """Per-distinct-value results (a series) expanded to the rows of dictionary_encode codes; None where missing"""
+    return np.append(np.asarray(results, dtype=object), None)[codes]
+
+def map_unique(values, func):
+    """
+    func applied once per distinct value (func takes and returns a series) and
+    broadcast back to the rows with a take; missing values come back as None
+    """
+    codes, uniques = dictionary_encode(values)
+    return broadcast(func(uniques), codes)
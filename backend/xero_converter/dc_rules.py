@@ -0,0 +1,159 @@
+"""
+Declarative debit/credit rules for the transaction type column.
+
+A rule set is a list of rules:
+
+    {"match": "exact", "pattern": "dr", "side": "debit", "priority": 10}
+
+- match: "exact" (whole value), "prefix" (value starts with pattern) or
+  "regex" (pattern found anywhere in the value; anchor it to be stricter)
+- side: "debit" or "credit"
+- priority: lower wins when several rules match; ties go to the rule listed first
+
+Values are stripped and compared case-insensitively. compile_rules() builds a
+RuleEvaluator that handles a whole column at once: all exact rules become a
+single dict lookup, so their cost doesn't grow with the number of tokens;
+prefix rules become one lookup per distinct prefix length; each regex is one
+vectorized search.
+"""
+import functools
+import json
+import re
+
+import numpy as np
+import pandas as pd
+
+RULE_MATCH_TYPES = ("exact", "prefix", "regex")
+RULE_SIDES = ("debit", "credit")
+DEFAULT_RULE_PRIORITY = 100
+
+# Transaction type values that mark a debit or credit on their own
+DEBIT_TOKENS = ['db', 'dr', 'debit', 'dbt', 'debited', 'd']
+CREDIT_TOKENS = ['cr', 'credit', 'cdt', 'credited', 'c']
+
+DEFAULT_RULES = (
+    [{"match": "exact", "pattern": token, "side": "debit", "priority": 10} for token in DEBIT_TOKENS]
+    + [{"match": "exact", "pattern": token, "side": "credit", "priority": 10} for token in CREDIT_TOKENS]
+    # "Debit Card", "Credit Transfer", ...
+    + [
+        {"match": "prefix", "pattern": "debit ", "side": "debit", "priority": 20},
+        {"match": "prefix", "pattern": "credit ", "side": "credit", "priority": 20},
+    ]
+)
+
+
+def normalize_rules(rules):
+    """Validate a rule set and fill in defaults; raises ValueError with a readable message"""
+    if not isinstance(rules, list):
+        raise ValueError("Rules must be a list")
+
+    normalized = []
+    for index, rule in enumerate(rules):
+        if not isinstance(rule, dict):
+            raise ValueError(f"Rule {index} must be an object")
+        match = rule.get("match", "exact")
+        pattern = rule.get("pattern")
+        side = rule.get("side")
+        priority = rule.get("priority", DEFAULT_RULE_PRIORITY)
+
+        if match not in RULE_MATCH_TYPES:
+            raise ValueError(f"Rule {index}: match must be one of {', '.join(RULE_MATCH_TYPES)}")
+        if side not in RULE_SIDES:
+            raise ValueError(f"Rule {index}: side must be 'debit' or 'credit'")
+        if not isinstance(pattern, str) or not pattern.strip():
+            raise ValueError(f"Rule {index}: pattern must be a non-empty string")
+        if not isinstance(priority, int) or isinstance(priority, bool):
+            raise ValueError(f"Rule {index}: priority must be an integer")
+        if match == "regex":
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                raise ValueError(f"Rule {index}: invalid regex: {e}")
+        else:
+            pattern = pattern.lower() if match == "prefix" else pattern.strip().lower()
+
+        normalized.append({"match": match, "pattern": pattern, "side": side, "priority": priority})
+    return normalized
+
+
+def stripped_text(values):
+    """Stripped string values; anything that isn't a string becomes NaN and never matches"""
+    values = pd.Series(values, copy=False)
+    if values.dtype == object or pd.api.types.is_string_dtype(values):
+        try:
+            return values.str.strip()
+        except AttributeError:
+            pass
+    return pd.Series(np.nan, index=values.index, dtype=object)
+
+
+class RuleEvaluator:
+    """A compiled rule set (see the module docstring)"""
+
+    def __init__(self, rules):
+        self.rules = normalize_rules(rules)
+
+        # Rank rules by (priority, position) so the winner is simply the lowest rank
+        order = sorted(range(len(self.rules)), key=lambda i: (self.rules[i]["priority"], i))
+        self.rule_by_rank = order
+        self.side_by_rank = np.array([self.rules[i]["side"] for i in order] + [None], dtype=object)
+
+        self.exact = {}
+        self.prefixes = {}
+        self.regexes = []
+        for rank, index in enumerate(order):
+            rule = self.rules[index]
+            if rule["match"] == "exact":
+                self.exact.setdefault(rule["pattern"], rank)
+            elif rule["match"] == "prefix":
+                self.prefixes.setdefault(len(rule["pattern"]), {}).setdefault(rule["pattern"], rank)
+            else:
+                self.regexes.append((rank, re.compile(rule["pattern"], re.IGNORECASE)))
+
+    def ranks(self, values):
+        """Rank of the winning rule per value; len(rules) where nothing matched"""
+        stripped = stripped_text(values)
+        lowered = stripped.str.lower()
+        no_match = len(self.rules)
+        best = np.full(len(stripped), np.inf)
+
+        if self.exact:
+            best = np.fmin(best, lowered.map(self.exact).to_numpy(dtype=float, na_value=np.nan))
+        for length, table in self.prefixes.items():
+            heads = lowered.str.slice(0, length)
+            best = np.fmin(best, heads.map(table).to_numpy(dtype=float, na_value=np.nan))
+        for rank, pattern in self.regexes:
+            found = stripped.str.contains(pattern).fillna(False).to_numpy(dtype=bool)
+            best = np.where(found & (rank < best), rank, best)
+
+        return np.where(np.isinf(best), no_match, best).astype(np.int64)
+
+    def sides(self, values):
+        """"debit", "credit" or None per value"""
+        return self.side_by_rank[self.ranks(values)]
+
+    def explain(self, values):
+        """Which rule decided each value, for the rule-explain API"""
+        explanations = []
+        for value, rank in zip(values, self.ranks(pd.Series(list(values), dtype=object))):
+            if rank == len(self.rules):
+                explanations.append({"value": value, "side": None, "rule_index": None, "rule": None})
+            else:
+                index = self.rule_by_rank[rank]
+                explanations.append({
+                    "value": value,
+                    "side": self.rules[index]["side"],
+                    "rule_index": index,
+                    "rule": self.rules[index]
+                })
+        return explanations
+
+
+@functools.lru_cache(maxsize=64)
+def _compile_cached(rules_json):
+    return RuleEvaluator(json.loads(rules_json))
+
+
+def compile_rules(rules=None):
+    """Compiled evaluator for a rule set (DEFAULT_RULES when None); cached per rule set"""
+    return _compile_cached(json.dumps(DEFAULT_RULES if rules is None else rules, sort_keys=True))
@@ -0,0 +1,138 @@
+"""The Xero CSV format: Date, Cheque No., Description, Amount, Reference"""
+import numpy as np
+import pandas as pd
+
+from .amounts import currency_exponent, parse_minor_units, render_minor_units
+from .columns import broadcast, decoded, dictionary_encode, map_unique
+from .dc_rules import compile_rules
+
+# The date format of the Date column
+XERO_DATE_FORMAT = '%d/%m/%Y'
+
+
+def parse_date(date_str):
+    """The date as a Timestamp, or None if pandas can't parse it"""
+    try:
+        date = pd.to_datetime(date_str)
+    except:
+        return None
+    return None if pd.isna(date) else date
+
+def format_date(date_str):
+    date = parse_date(date_str)
+    # Return the original string if parsing fails
+    return date_str if date is None else date.strftime(XERO_DATE_FORMAT)
+
+def transaction_sides(column_mapping, transaction_types=None):
+    """
+    "debit"/"credit"/None per row from the transaction type column, using the
+    mapping's "dc_rules" (see dc_rules) or the default rules
+    """
+    if transaction_types is None:
+        return None
+    # Evaluated once per distinct transaction type, not per row
+    evaluator = compile_rules(column_mapping.get('dc_rules'))
+    return map_unique(transaction_types, evaluator.sides)
+
+def apply_amount_signs(units, sides=None):
+    """
+    Sign amounts for Xero: credits POSITIVE, debits NEGATIVE; amounts with no
+    recognized transaction type keep their sign
+    """
+    if sides is None:
+        return units
+    magnitude = units.abs()
+    return units.mask(sides == "credit", magnitude).mask(sides == "debit", -magnitude)
+
+def reference_codes(units, sides=None):
+    """
+    Debit/credit code for the Reference column:
+    1. From the transaction type if a rule recognized it
+    2. Otherwise from the amount's sign (negative = D, positive = C); "" if it didn't parse
+    """
+    codes = pd.Series(np.where((units < 0).fillna(False), "D", "C"), index=units.index, dtype=object)
+    codes[units.isna().to_numpy()] = ""
+    if sides is not None:
+        codes[sides == "debit"] = "D"
+        codes[sides == "credit"] = "C"
+    return codes
+
+def raw_amount_text(values):
+    """Fallback output for amounts that don't parse: the original value, "" when missing"""
+    values = pd.Series(values, copy=False)
+    return values.astype(str).where(values.notna(), "")
+
+def apply_xero_format(df, column_mapping):
+    """Apply Xero formatting rules to the data"""
+    return format_frame(df, column_mapping)[0]
+
+def format_frame(df, column_mapping):
+    """
+    apply_xero_format, also returning the values the output was rendered
+    from: a frame indexed like df with "date" (the calendar date, NaT where
+    it didn't parse) and "units" (the signed amount in minor units at the
+    mapping's currency_exponent, <NA> where it didn't parse). Duplicate
+    hashes, search entries and summaries are built from these rather than
+    by parsing the rendered text again.
+    """
+    xero_df = pd.DataFrame()
+    values = pd.DataFrame(index=df.index)
+    
+    # Check if we're using a transaction type column
+    has_transaction_type = 'transaction_type' in column_mapping and column_mapping['transaction_type']
+    
+    # Format date (Column A)
+    if 'A' in column_mapping and column_mapping['A']:
+        # Statements repeat dates, so each distinct value is parsed only once
+        dates = df[column_mapping['A']]
+        codes, uniques = dictionary_encode(dates)
+        parsed = [parse_date(value) for value in uniques]
+        formatted = pd.Series(
+            [value if date is None else date.strftime(XERO_DATE_FORMAT) for value, date in zip(uniques, parsed)],
+            dtype=object
+        )
+        xero_df['Date'] = pd.Series(broadcast(formatted, codes), index=dates.index, dtype=object).where(
+            dates.notna(), dates.astype(object)
+        )
+        calendar_dates = pd.Series(
+            [None if date is None else pd.Timestamp(date.year, date.month, date.day) for date in parsed], dtype=object
+        )
+        values['date'] = pd.to_datetime(pd.Series(broadcast(calendar_dates, codes), index=dates.index, dtype=object))
+    else:
+        xero_df['Date'] = ""
+        values['date'] = pd.NaT
+    
+    # Add Cheque No. (Column B)
+    if 'B' in column_mapping and column_mapping['B']:
+        xero_df['Cheque No.'] = decoded(df[column_mapping['B']])
+    else:
+        xero_df['Cheque No.'] = ""
+    
+    # Add Description (Column C)
+    if 'C' in column_mapping and column_mapping['C']:
+        xero_df['Description'] = decoded(df[column_mapping['C']])
+    else:
+        xero_df['Description'] = ""
+    
+    # Amount (Column D) and Reference (Column E): the amount column is parsed
+    # once into minor units and both columns are derived from it
+    if 'D' in column_mapping and column_mapping['D']:
+        exponent = currency_exponent(column_mapping)
+        amounts = df[column_mapping['D']]
+        transaction_types = df[column_mapping['transaction_type']] if has_transaction_type else None
+        
+        units = parse_minor_units(amounts, exponent)
+        sides = transaction_sides(column_mapping, transaction_types)
+        signed = apply_amount_signs(units, sides)
+        
+        # Rendered to strings only here, as the last step before output
+        rendered = render_minor_units(signed, exponent).astype(object)
+        xero_df['Amount'] = rendered.where(signed.notna(), raw_amount_text(amounts))
+        xero_df['Reference'] = reference_codes(units, sides)
+        values['units'] = signed
+    else:
+        xero_df['Amount'] = ""
+        xero_df['Reference'] = ""
+        values['units'] = pd.Series(pd.NA, index=df.index, dtype="Int64")
+    
+    return xero_df, values
@@ -0,0 +1,69 @@
+"""Auto-mapping source columns to the Xero columns"""
+import re
+
+import pandas as pd
+
+from .columns import is_text_column
+
+
+def auto_map_columns(df):
+    """Auto-map columns to Xero format based on content analysis"""
+    column_mapping = {}
+    columns = df.columns.tolist()
+    
+    # Look for date column
+    date_candidates = [col for col in columns if any(term in col.lower() for term in ['date', 'dt', 'day'])]
+    if date_candidates:
+        column_mapping['A'] = date_candidates[0]
+    else:
+        # Try to find a column with date-like values
+        for col in columns:
+            if is_text_column(df[col]):
+                sample = df[col].dropna().iloc[0] if not df[col].dropna().empty else None
+                if sample and isinstance(sample, str) and re.search(r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}', sample):
+                    column_mapping['A'] = col
+                    break
+    
+    # Look for cheque/reference number
+    cheque_candidates = [col for col in columns if any(term in col.lower() for term in ['cheque', 'check', 'ref', 'reference', 'no', 'num', 'number', 'id'])]
+    if cheque_candidates:
+        column_mapping['B'] = cheque_candidates[0]
+    
+    # Look for description
+    desc_candidates = [col for col in columns if any(term in col.lower() for term in ['desc', 'narration', 'details', 'memo', 'note', 'particular', 'narr', 'transaction', 'name'])]
+    if desc_candidates:
+        column_mapping['C'] = desc_candidates[0]
+    
+    # Look for amount
+    amount_candidates = [col for col in columns if any(term in col.lower() for term in ['amount', 'sum', 'value', 'debit', 'credit', 'amt'])]
+    if amount_candidates:
+        column_mapping['D'] = amount_candidates[0]
+    
+    # Look for transaction type column (for reference field)
+    type_candidates = [col for col in columns if any(term in col.lower() for term in ['type', 'transaction type', 'tr type', 'db/cr', 'dr/cr', 'debit/credit'])]
+    if type_candidates:
+        column_mapping['transaction_type'] = type_candidates[0]
+    
+    # If we couldn't find specific columns, make best guesses
+    if 'A' not in column_mapping and len(columns) > 0:
+        column_mapping['A'] = columns[0]  # First column often contains dates
+    
+    if 'B' not in column_mapping and len(columns) > 1:
+        column_mapping['B'] = columns[1]
+    
+    if 'C' not in column_mapping and len(columns) > 2:
+        column_mapping['C'] = columns[2]
+    
+    if 'D' not in column_mapping and len(columns) > 3:
+        # Look for numeric columns for amount
+        numeric_cols = [col for col in columns if pd.api.types.is_numeric_dtype(df[col])]
+        if numeric_cols:
+            column_mapping['D'] = numeric_cols[0]
+        else:
+            column_mapping['D'] = columns[3] if len(columns) > 3 else ""
+    
+    # For reference, we'll derive it from the amount and transaction type if available
+    if 'D' in column_mapping:
+        column_mapping['E'] = column_mapping['D']  # Reference will be derived from amount and transaction type
+    
+    return column_mapping
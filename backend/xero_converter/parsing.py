@@ -0,0 +1,44 @@
+"""Parsing uploaded statements (CSV, gzipped CSV, XLSX) into dataframes"""
+import io
+import gzip
+
+import pandas as pd
+
+from .columns import encode_low_cardinality
+
+
+# File parsing helper functions
+def parse_file_content(file_content, file_type):
+    if file_type == "csv":
+        # Parse CSV with pandas
+        df = pd.read_csv(io.StringIO(file_content.decode('utf-8')))
+    elif file_type == "csv.gz":
+        # Decompress while parsing rather than inflating the whole file first
+        with gzip.GzipFile(fileobj=io.BytesIO(file_content)) as gz:
+            df = pd.read_csv(gz, encoding='utf-8')
+    elif file_type == "xlsx":
+        # Parse XLSX with pandas
+        df = pd.read_excel(io.BytesIO(file_content))
+    else:
+        raise ValueError("Unsupported file type")
+    
+    # Replace NaN, Infinity, and -Infinity with None to avoid JSON serialization issues
+    df = df.replace([float('inf'), -float('inf'), float('nan')], None)
+    
+    return encode_low_cardinality(df)
+
+def parse_file_path(file_path, file_type):
+    """Parse a file on disk (or an open binary stream); pandas reads it incrementally instead of from an in-memory copy"""
+    if file_type == "csv":
+        df = pd.read_csv(file_path, encoding='utf-8')
+    elif file_type == "csv.gz":
+        df = pd.read_csv(file_path, encoding='utf-8', compression='gzip')
+    elif file_type == "xlsx":
+        df = pd.read_excel(file_path)
+    else:
+        raise ValueError("Unsupported file type")
+    
+    # Replace NaN, Infinity, and -Infinity with None to avoid JSON serialization issues
+    df = df.replace([float('inf'), -float('inf'), float('nan')], None)
+    
+    return encode_low_cardinality(df)
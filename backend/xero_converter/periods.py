@@ -0,0 +1,48 @@
+"""
+Splitting formatted rows into calendar periods.
+
+Rows are labelled "2024-01" (month) or "2024-Q1" (quarter) from their
+parsed date (the "date" values of format_frame, so the same dates the
+preview and summaries use), once per distinct date; rows without one are
+labelled "undated". Labels sort chronologically as strings, with undated
+last, so a single sorted groupby yields the partitions in order.
+"""
+import pandas as pd
+
+from .columns import map_unique
+
+PERIODS = ("month", "quarter")
+UNDATED = "undated"
+
+
+def period_label(date, split_by):
+    if pd.isna(date):
+        return UNDATED
+    if split_by == "quarter":
+        return f"{date.year:04d}-Q{date.quarter}"
+    return f"{date.year:04d}-{date.month:02d}"
+
+
+def period_labels(dates, split_by):
+    """Period label of each row from its parsed date (NaT where undated), as a series indexed like dates"""
+    if split_by not in PERIODS:
+        raise ValueError(f"split_by must be one of {', '.join(PERIODS)}")
+
+    def labels(uniques):
+        return pd.Series([period_label(date, split_by) for date in uniques], dtype=object)
+
+    return pd.Series(map_unique(dates, labels), index=dates.index, dtype=object).fillna(UNDATED)
+
+
+def partition_by_period(xero_df, labels):
+    """(label, rows) for each period present, in order, from one groupby over the labels"""
+    return list(xero_df.groupby(labels.loc[xero_df.index], sort=True))
+
+
+def select_period(formatted_chunks, split_by, label):
+    """
+    The rows of (formatted chunk, values) pairs, as format_frame_chunks
+    yields them, that fall in one period (empty chunks are kept for the CSV header)
+    """
+    for chunk, values in formatted_chunks:
+        yield chunk[period_labels(values['date'], split_by) == label]
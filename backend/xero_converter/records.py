@@ -0,0 +1,78 @@
+"""
+JSON records: how datasets are stored and previews are returned.
+
+Stored datasets are a JSON array with one record per line:
+
+    [
+    {"Date": "2024-01-05", "Amount": 12.5},
+    {"Date": "2024-01-06", "Amount": 1000}
+    ]
+
+so they can be written a chunk of rows at a time and read back a line at a
+time instead of through one string of the whole file. Datasets stored
+before as a single-line array still read back the same way.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+from .columns import encode_low_cardinality
+
+RECORDS_CHUNK_ROWS = 50_000
+
+
+def safe_json_serialize(df):
+    """Convert a dataframe to JSON-safe records (inf/NaN become None)"""
+    # Replace problematic values
+    df_cleaned = df.copy()
+    # Replace inf/-inf with None
+    df_cleaned = df_cleaned.replace([np.inf, -np.inf], None)
+    # Convert to records
+    records = df_cleaned.to_dict(orient="records")
+    # Convert all NaN to None for JSON serialization
+    for record in records:
+        for k, v in record.items():
+            if isinstance(v, float) and np.isnan(v):
+                record[k] = None
+    return records
+
+def dataframe_from_records(records):
+    """Rebuild a dataframe from stored JSON records"""
+    return encode_low_cardinality(pd.DataFrame.from_records(records))
+
+def iter_records_json(df, chunk_rows=RECORDS_CHUNK_ROWS):
+    """The stored JSON of a dataset as byte chunks, serialized chunk_rows rows at a time"""
+    yield b"[\n"
+    separator = b""
+    for start in range(0, len(df), chunk_rows):
+        records = safe_json_serialize(df.iloc[start:start + chunk_rows])
+        yield separator + ",\n".join(json.dumps(record) for record in records).encode()
+        separator = b",\n"
+    yield b"\n]\n"
+
+def iter_lines(chunks):
+    """Lines (without the newline) of a stream of byte chunks"""
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        end = buffer.rfind(b"\n")
+        if end >= 0:
+            yield from bytes(buffer[:end]).split(b"\n")
+            del buffer[:end + 1]
+    if buffer:
+        yield bytes(buffer)
+
+def read_records_json(chunks):
+    """Records of a stored dataset from its byte chunks (see the module docstring)"""
+    records = []
+    for line in iter_lines(chunks):
+        line = line.strip()
+        if line in (b"[", b"]", b""):
+            continue
+        if line.startswith(b"["):
+            # Single-line array
+            records.extend(json.loads(line))
+        else:
+            records.append(json.loads(line.rstrip(b",")))
+    return records
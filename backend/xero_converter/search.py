@@ -0,0 +1,73 @@
+"""
+Search entries for formatted rows.
+
+Each row of a statement becomes one entry: its position in the dataset,
+the date, the amount and the text fields, plus the terms (the lowercased
+words of the description and cheque no.) that the search index is built
+on. Dates and amounts come from the values format_frame parsed the row
+from; amounts are kept as integers at SEARCH_AMOUNT_EXPONENT decimals, so
+range filters compare exactly across currencies with different exponents.
+Dates, amounts and terms are converted once per distinct value.
+"""
+import re
+
+import pandas as pd
+
+from .amounts import MAX_CURRENCY_EXPONENT, parse_minor_units, rescale_units
+from .columns import decoded, map_unique
+
+# Ranges compare amounts at this many decimals (enough for every ISO 4217 currency)
+SEARCH_AMOUNT_EXPONENT = MAX_CURRENCY_EXPONENT
+# Words are runs of letters and digits
+TERM_PATTERN = re.compile(r'[^\W_]+')
+
+
+def tokenize(text):
+    """Distinct lowercased words of text, in order of appearance"""
+    if text is None or (not isinstance(text, str) and pd.isna(text)):
+        return []
+    return list(dict.fromkeys(TERM_PATTERN.findall(str(text).lower())))
+
+
+def amount_units(values):
+    """Amount text (e.g. a query's bounds) as ints at SEARCH_AMOUNT_EXPONENT decimals; None where it doesn't parse"""
+    units = parse_minor_units(decoded(pd.Series(values, copy=False)), SEARCH_AMOUNT_EXPONENT)
+    return [None if pd.isna(value) else int(value) for value in units]
+
+
+def plain_text(values):
+    """Text values with None for missing ones"""
+    return map_unique(values, lambda uniques: uniques.astype(str))
+
+
+def search_entries(xero_df, values, exponent):
+    """
+    One search entry (a plain dict) per row of a formatted frame, keyed by its
+    row position; values are the frame's (see format_frame), with amounts at
+    the given currency exponent
+    """
+    description = xero_df['Description']
+    cheque_no = xero_df['Cheque No.']
+    units = rescale_units(values['units'], exponent, SEARCH_AMOUNT_EXPONENT)
+    columns = zip(
+        xero_df.index,
+        map_unique(values['date'], lambda uniques: pd.Series([date.to_pydatetime() for date in uniques], dtype=object)),
+        map_unique(units, lambda uniques: uniques.map(int)),
+        plain_text(xero_df['Amount']),
+        plain_text(description),
+        plain_text(cheque_no),
+        map_unique(description, lambda uniques: uniques.map(tokenize)),
+        map_unique(cheque_no, lambda uniques: uniques.map(tokenize)),
+    )
+    return [
+        {
+            "row": int(row),
+            "date": date,
+            "amount_units": units,
+            "amount": amount,
+            "description": text,
+            "cheque_no": cheque,
+            "terms": list(dict.fromkeys((text_terms or []) + (cheque_terms or [])))
+        }
+        for row, date, units, amount, text, cheque, text_terms, cheque_terms in columns
+    ]
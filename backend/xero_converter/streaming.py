@@ -0,0 +1,85 @@
+"""
+Generator API: iterate dataframe chunks in, formatted chunks and CSV bytes
+out. Only one chunk of formatted output is held at a time.
+
+    chunks = iter_file_chunks("statement.csv", "csv")
+    column_mapping, chunks = with_auto_mapping(chunks)
+    for data in iter_csv_bytes(format_chunks(chunks, column_mapping)):
+        out.write(data)
+
+Chunks of an already parsed frame (iter_frame_chunks) format exactly like
+the whole frame. iter_file_chunks reads CSVs incrementally instead, so
+pandas infers column types per chunk; a column that is numeric in one
+chunk and text in another can render differently (e.g. "12" vs "12.0").
+"""
+import itertools
+
+import pandas as pd
+
+from .columns import encode_low_cardinality
+from .formatting import apply_xero_format, format_frame
+from .mapping import auto_map_columns
+from .parsing import parse_file_path
+
+DEFAULT_CHUNK_ROWS = 50_000
+
+
+def iter_frame_chunks(df, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Consecutive row slices of a frame (one empty chunk for an empty frame)"""
+    for start in range(0, max(len(df), 1), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def iter_file_chunks(file_path, file_type, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Parsed chunks of a statement on disk (or an open binary stream). CSVs are
+    read chunk_rows at a time; XLSX can't be read incrementally, so it is
+    parsed whole and sliced.
+    """
+    if file_type == "xlsx":
+        yield from iter_frame_chunks(parse_file_path(file_path, file_type), chunk_rows)
+        return
+    if file_type not in ("csv", "csv.gz"):
+        raise ValueError("Unsupported file type")
+
+    compression = "gzip" if file_type == "csv.gz" else None
+    with pd.read_csv(file_path, encoding='utf-8', compression=compression, chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            # Same clean-up as parse_file_path
+            chunk = chunk.replace([float('inf'), -float('inf'), float('nan')], None)
+            yield encode_low_cardinality(chunk)
+
+
+def with_auto_mapping(chunks):
+    """
+    (column_mapping, chunks): the mapping is auto-detected from the first
+    chunk, and the returned iterator still yields every chunk
+    """
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    if first is None:
+        return {}, iter(())
+    return auto_map_columns(first), itertools.chain([first], chunks)
+
+
+def format_chunks(chunks, column_mapping):
+    """apply_xero_format over each chunk as it is consumed"""
+    for chunk in chunks:
+        yield apply_xero_format(chunk, column_mapping)
+
+
+def format_frame_chunks(chunks, column_mapping):
+    """format_frame over each chunk as it is consumed: (formatted chunk, its values) pairs"""
+    for chunk in chunks:
+        yield format_frame(chunk, column_mapping)
+
+
+def iter_csv_bytes(xero_chunks):
+    """CSV bytes for formatted chunks; the header is written with the first one"""
+    for index, chunk in enumerate(xero_chunks):
+        yield chunk.to_csv(index=False, header=index == 0).encode()
+
+
+def iter_csv_chunks(xero_df, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Serialize a formatted frame as CSV bytes, chunk_rows rows at a time"""
+    return iter_csv_bytes(iter_frame_chunks(xero_df, chunk_rows))
@@ -0,0 +1,79 @@
+"""
+Statement summaries: row count, debit and credit totals, date span and
+per-month sums (keyed "YYYY-MM") of a formatted frame.
+
+Summaries are built from the dates and signed amounts format_frame parsed
+the output from. Totals are integers at SUMMARY_AMOUNT_EXPONENT decimals
+(the same exact scale search uses), so summaries of files in currencies
+with different exponents can be added up; the scale is stored with each
+summary as "amount_exponent". Debits are the negative amounts of the Xero
+output and are totalled as positive numbers. Summaries of chunks combine
+with merge_summaries, so a file is summarized in the pass that formats it.
+"""
+import pandas as pd
+
+from .amounts import MAX_CURRENCY_EXPONENT, rescale_units
+
+SUMMARY_AMOUNT_EXPONENT = MAX_CURRENCY_EXPONENT
+
+
+def empty_summary():
+    return {
+        "rows": 0,
+        "debit_units": 0,
+        "credit_units": 0,
+        "amount_exponent": SUMMARY_AMOUNT_EXPONENT,
+        "first_date": None,
+        "last_date": None,
+        "months": {}
+    }
+
+
+def summarize(values, exponent):
+    """
+    Summary of a formatted frame from its values (see format_frame), whose
+    amounts are at the given currency exponent; rows whose date or amount
+    didn't parse only count as rows
+    """
+    units = rescale_units(values['units'].fillna(0), exponent, SUMMARY_AMOUNT_EXPONENT)
+    dates = values['date']
+    frame = pd.DataFrame({
+        # Grouped on a number; only the group keys are formatted
+        "month": dates.dt.year * 100 + dates.dt.month,
+        "debit_units": (-units).clip(lower=0),
+        "credit_units": units.clip(lower=0)
+    })
+    months = frame.groupby("month").agg(
+        rows=("month", "size"), debit_units=("debit_units", "sum"), credit_units=("credit_units", "sum")
+    )
+
+    summary = empty_summary()
+    summary.update({
+        "rows": len(values),
+        "debit_units": int(frame["debit_units"].sum()),
+        "credit_units": int(frame["credit_units"].sum()),
+        "first_date": dates.min().to_pydatetime() if dates.notna().any() else None,
+        "last_date": dates.max().to_pydatetime() if dates.notna().any() else None,
+        "months": {
+            f"{int(month) // 100:04d}-{int(month) % 100:02d}": {key: int(value) for key, value in sums.items()}
+            for month, sums in months.to_dict("index").items()
+        }
+    })
+    return summary
+
+
+def merge_summaries(summaries):
+    """One summary for the rows of several (e.g. a file's chunks)"""
+    merged = empty_summary()
+    for summary in summaries:
+        for key in ("rows", "debit_units", "credit_units"):
+            merged[key] += summary[key]
+        for month, sums in summary["months"].items():
+            target = merged["months"].setdefault(month, {"rows": 0, "debit_units": 0, "credit_units": 0})
+            for key, value in sums.items():
+                target[key] += value
+        dates = [date for date in (merged["first_date"], summary["first_date"]) if date is not None]
+        merged["first_date"] = min(dates) if dates else None
+        dates = [date for date in (merged["last_date"], summary["last_date"]) if date is not None]
+        merged["last_date"] = max(dates) if dates else None
+    return merged
@@ -0,0 +1,93 @@
+"""
+Transaction identity for duplicate detection.
+
+A formatted row is identified by its date, signed amount in minor units
+(the units format_frame rendered it from), normalized description and
+cheque no. Identical rows within one statement are told apart by their
+occurrence number (the second identical coffee on the same day is a
+different transaction from the first), so an overlapping export matches
+the same number of rows it shares with the earlier one.
+
+Hashes are 64-bit: each field is normalized and hashed (blake2b) once per
+distinct value, and the field hashes and occurrence number are combined
+with splitmix64, so the per-row work is vectorized. They are returned as
+int64 so they can be stored in Mongo as plain integers.
+"""
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from .columns import dictionary_encode
+
+# splitmix64 constants
+GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+MIX_2 = np.uint64(0x94D049BB133111EB)
+
+
+def normalize_text(values):
+    """Lowercased, whitespace-collapsed text; "" when missing"""
+    values = pd.Series(values, copy=False)
+    text = values.astype(object).where(values.notna(), "").astype(str)
+    return text.str.lower().str.replace(r'\s+', ' ', regex=True).str.strip()
+
+
+def digest64(texts):
+    """uint64 blake2b digest of each string"""
+    digests = b"".join(hashlib.blake2b(text.encode(), digest_size=8).digest() for text in texts)
+    return np.frombuffer(digests, dtype="<u8").copy()
+
+
+def field_hashes(values, normalize):
+    """digest64 of each row's normalized value, computed once per distinct value"""
+    codes, uniques = dictionary_encode(values)
+    table = np.append(digest64(normalize(uniques)), digest64(normalize(pd.Series([None], dtype=object))))
+    return table[codes]
+
+
+def amount_text(units, amounts):
+    """Minor units as text, or the normalized output amount (marked with "?") where it didn't parse"""
+    text = pd.Series(units, copy=False).astype("string")
+    missing = text.isna().to_numpy()
+    if missing.any():
+        text[missing] = normalize_text(amounts[missing]).radd("?").to_numpy()
+    return text
+
+
+def transaction_keys(xero_df, units):
+    """
+    uint64 hash of each formatted row's identifying fields (without the
+    occurrence number); units are the row's signed minor units (format_frame's "units")
+    """
+    fields = (
+        field_hashes(xero_df["Date"], normalize_text),
+        field_hashes(amount_text(units, xero_df["Amount"]), normalize_text),
+        field_hashes(xero_df["Description"], normalize_text),
+        field_hashes(xero_df["Cheque No."], normalize_text),
+    )
+    keys = np.zeros(len(xero_df), dtype=np.uint64)
+    for field in fields:
+        keys = splitmix64(keys ^ field)
+    return keys
+
+
+def splitmix64(values):
+    with np.errstate(over="ignore"):
+        z = values + GOLDEN_GAMMA
+        z = (z ^ (z >> np.uint64(30))) * MIX_1
+        z = (z ^ (z >> np.uint64(27))) * MIX_2
+        return z ^ (z >> np.uint64(31))
+
+
+def occurrence_hashes(keys):
+    """Final int64 hashes: each key mixed with how many times it occurred before"""
+    keys = np.asarray(keys, dtype=np.uint64)
+    occurrences = pd.Series(keys).groupby(keys, sort=False).cumcount().to_numpy(dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        return splitmix64(keys ^ (occurrences * GOLDEN_GAMMA)).view(np.int64)
+
+
+def transaction_hashes(xero_df, units):
+    """int64 identity hash per formatted row (see the module docstring)"""
+    return occurrence_hashes(transaction_keys(xero_df, units))
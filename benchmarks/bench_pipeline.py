@@ -0,0 +1,186 @@
+"""
+Offline benchmark for the conversion pipeline.
+
+Times parse_file_content, auto_map_columns, apply_xero_format and
+serialization (CSV output and JSON records) on synthetic statements, plus the
+chunked generator pipeline (parse, format and CSV a chunk at a time), reports
+peak traced memory per stage and writes JSON that can be compared across
+commits:
+
+    python benchmarks/bench_pipeline.py --sizes 1000 100000 --output before.json
+    python benchmarks/bench_pipeline.py --sizes 1000 100000 --compare before.json
+
+No network, Mongo or running server is needed.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "backend"))
+
+from synthetic import DATE_FORMATS, DC_ENCODINGS, generate_csv_bytes  # noqa: E402
+from xero_converter import (  # noqa: E402
+    apply_xero_format, auto_map_columns, format_chunks, iter_csv_bytes, iter_file_chunks, parse_file_content,
+    safe_json_serialize, with_auto_mapping
+)
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def serialize(xero_df):
+    """What the API does with a formatted frame: CSV for download, JSON records for preview"""
+    buffer = io.StringIO()
+    xero_df.to_csv(buffer, index=False)
+    safe_json_serialize(xero_df)
+    return buffer
+
+
+def stream(csv_bytes, chunk_rows):
+    """The whole pipeline through the generator API; returns bytes written"""
+    column_mapping, chunks = with_auto_mapping(iter_file_chunks(io.BytesIO(csv_bytes), "csv", chunk_rows))
+    return sum(len(data) for data in iter_csv_bytes(format_chunks(chunks, column_mapping)))
+
+
+def measure(func, repeat, trace_memory):
+    """Run func `repeat` times; returns (result, timings, peak traced bytes)"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+
+    peak = None
+    if trace_memory:
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, timings, peak
+
+
+def bench_size(rows, args):
+    csv_bytes = generate_csv_bytes(
+        rows,
+        extra_columns=args.extra_columns,
+        date_format=args.date_format,
+        dc_encoding=args.dc_encoding,
+        dirty_ratio=args.dirty_ratio,
+        seed=args.seed,
+    )
+
+    results = []
+
+    def record(stage, timings, peak):
+        best = min(timings)
+        results.append({
+            "rows": rows,
+            "stage": stage,
+            "seconds_min": best,
+            "seconds_median": statistics.median(timings),
+            "rows_per_second": rows / best if best > 0 else None,
+            "peak_memory_bytes": peak,
+        })
+        print(f"{rows:>10,} rows  {stage:<10} {best:9.4f}s  "
+              f"{(rows / best if best > 0 else 0):>12,.0f} rows/s"
+              + (f"  peak {peak / 1e6:8.1f} MB" if peak is not None else ""))
+
+    trace = not args.skip_memory
+    df, timings, peak = measure(lambda: parse_file_content(csv_bytes, "csv"), args.repeat, trace)
+    record("parse", timings, peak)
+
+    column_mapping, timings, peak = measure(lambda: auto_map_columns(df), args.repeat, trace)
+    record("auto_map", timings, peak)
+
+    xero_df, timings, peak = measure(lambda: apply_xero_format(df, column_mapping), args.repeat, trace)
+    record("format", timings, peak)
+
+    _, timings, peak = measure(lambda: serialize(xero_df), args.repeat, trace)
+    record("serialize", timings, peak)
+
+    _, timings, peak = measure(lambda: stream(csv_bytes, args.chunk_rows), args.repeat, trace)
+    record("stream", timings, peak)
+
+    return results
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(r["rows"], r["stage"]): r for r in baseline["results"]}
+
+    print(f"\nComparison against {baseline_path} (commit {baseline['meta'].get('commit')})")
+    for result in results:
+        before = previous.get((result["rows"], result["stage"]))
+        if not before:
+            continue
+        ratio = result["seconds_min"] / before["seconds_min"] if before["seconds_min"] else float("nan")
+        print(f"{result['rows']:>10,} rows  {result['stage']:<10} "
+              f"{before['seconds_min']:9.4f}s -> {result['seconds_min']:9.4f}s  ({ratio:5.2f}x time)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Xero conversion pipeline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Row counts to benchmark")
+    parser.add_argument("--repeat", type=int, default=1, help="Timed runs per stage (best is reported)")
+    parser.add_argument("--extra-columns", type=int, default=0)
+    parser.add_argument("--date-format", choices=sorted(DATE_FORMATS), default="iso")
+    parser.add_argument("--dc-encoding", choices=sorted(DC_ENCODINGS), default="drcr")
+    parser.add_argument("--dirty-ratio", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-rows", type=int, default=50_000, help="Chunk size for the stream stage")
+    parser.add_argument("--skip-memory", action="store_true", help="Don't re-run stages under tracemalloc")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--compare", help="Baseline JSON from an earlier run")
+    args = parser.parse_args()
+
+    results = []
+    for rows in args.sizes:
+        results.extend(bench_size(rows, args))
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "params": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
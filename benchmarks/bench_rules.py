@@ -0,0 +1,79 @@
+"""
+Offline benchmark for debit/credit rule evaluation.
+
+Times RuleEvaluator.sides over a synthetic transaction type column for rule
+sets of increasing size. Exact-token rules compile to a single dict lookup,
+so their cost should stay flat as the rule count grows; regex rules are
+included for contrast (one vectorized search each):
+
+    python benchmarks/bench_rules.py --rows 1000000 --rule-counts 1 10 100 1000 10000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "backend"))
+
+from xero_converter.dc_rules import RuleEvaluator  # noqa: E402
+
+DEFAULT_RULE_COUNTS = [1, 10, 100, 1_000, 10_000]
+
+
+def exact_rules(count):
+    return [
+        {"match": "exact", "pattern": f"tok{i}", "side": "debit" if i % 2 else "credit"}
+        for i in range(count)
+    ]
+
+
+def regex_rules(count):
+    return [
+        {"match": "regex", "pattern": f"^tok{i}$", "side": "debit" if i % 2 else "credit"}
+        for i in range(count)
+    ]
+
+
+def best_time(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark debit/credit rule evaluation")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--rule-counts", type=int, nargs="+", default=DEFAULT_RULE_COUNTS)
+    parser.add_argument("--max-regex-rules", type=int, default=100, help="Skip regex sets larger than this")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    # Values are drawn from the first 20 tokens plus some unmatched noise
+    vocabulary = np.array([f"TOK{i}" for i in range(20)] + ["transfer", "", "misc"], dtype=object)
+    values = pd.Series(vocabulary[rng.integers(0, len(vocabulary), args.rows)], dtype=object)
+
+    print(f"{args.rows:,} values")
+    for count in args.rule_counts:
+        evaluator = RuleEvaluator(exact_rules(count))
+        seconds = best_time(lambda: evaluator.sides(values), args.repeat)
+        print(f"exact  {count:>7,} rules  {seconds:9.4f}s  {args.rows / seconds:>14,.0f} values/s")
+
+    for count in args.rule_counts:
+        if count > args.max_regex_rules:
+            continue
+        evaluator = RuleEvaluator(regex_rules(count))
+        seconds = best_time(lambda: evaluator.sides(values), args.repeat)
+        print(f"regex  {count:>7,} rules  {seconds:9.4f}s  {args.rows / seconds:>14,.0f} values/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Synthetic bank-statement generator for benchmarks.
+
+Produces reproducible CSV statements (seeded RNG) with configurable row
+count, extra columns, date formats, debit/credit encodings and a share of
+"dirty" amount strings such as "$1,234.50 CR" or "(12.00)".
+"""
+import argparse
+import io
+
+import numpy as np
+import pandas as pd
+
+DATE_FORMATS = {
+    "iso": "%Y-%m-%d",
+    "dmy": "%d/%m/%Y",
+    "mdy": "%m/%d/%Y",
+    "text": "%d %b %Y",
+}
+
+# Debit/credit encodings: (debit token, credit token); None = signed amounts only
+DC_ENCODINGS = {
+    "drcr": ("DR", "CR"),
+    "dc": ("D", "C"),
+    "words": ("Debit", "Credit"),
+    "mixed": None,  # filled per row from all of the above, in random case
+    "signed": None,  # no transaction type column
+}
+
+DESCRIPTIONS = np.array([
+    "CARD PURCHASE WOOLWORTHS", "TRANSFER TO SAVINGS", "SALARY ACME PTY LTD",
+    "DIRECT DEBIT INSURANCE", "ATM WITHDRAWAL", "INTEREST CREDIT",
+    "BPAY ELECTRICITY", "EFTPOS COFFEE CLUB", "REFUND AMAZON", "MONTHLY FEE",
+])
+
+
+def _dirty_amounts(rng, amounts, is_debit, dirty_ratio):
+    """Render amounts as strings, a share of them in messy bank formats"""
+    clean = np.char.mod("%.2f", amounts)
+    if dirty_ratio <= 0:
+        return clean
+
+    with_commas = np.array([f"{a:,.2f}" for a in amounts])
+    styles = rng.integers(0, 4, size=len(amounts))
+    dirty = np.where(
+        styles == 0, np.char.add("$", with_commas),
+        np.where(
+            styles == 1, np.char.add(with_commas, np.where(is_debit, " DR", " CR")),
+            np.where(
+                styles == 2, np.char.add(np.char.add("(", with_commas), ")"),
+                np.char.add(np.char.add("$", with_commas), np.where(is_debit, " DR", " CR")),
+            ),
+        ),
+    )
+    use_dirty = rng.random(len(amounts)) < dirty_ratio
+    return np.where(use_dirty, dirty, clean)
+
+
+def generate_statement(rows, extra_columns=0, date_format="iso", dc_encoding="drcr",
+                       dirty_ratio=0.2, seed=42):
+    """Return a DataFrame shaped like a bank statement export"""
+    rng = np.random.default_rng(seed)
+
+    start = np.datetime64("2023-01-01")
+    dates = pd.to_datetime(start + rng.integers(0, 730, size=rows).astype("timedelta64[D]"))
+    amounts = np.round(rng.lognormal(mean=4, sigma=1.2, size=rows), 2)
+    is_debit = rng.random(rows) < 0.7
+
+    data = {
+        "Transaction Date": dates.strftime(DATE_FORMATS[date_format]),
+        "Reference No": np.char.add("REF", rng.integers(100000, 999999, size=rows).astype(str)),
+        "Description": DESCRIPTIONS[rng.integers(0, len(DESCRIPTIONS), size=rows)],
+    }
+
+    if dc_encoding == "signed":
+        signed = np.where(is_debit, -amounts, amounts)
+        data["Amount"] = _dirty_amounts(rng, signed, is_debit, dirty_ratio)
+    else:
+        data["Amount"] = _dirty_amounts(rng, amounts, is_debit, dirty_ratio)
+        if dc_encoding == "mixed":
+            debit_tokens = np.array(["DR", "D", "Debit", "dr", "DEBIT", "db"])
+            credit_tokens = np.array(["CR", "C", "Credit", "cr", "CREDIT", "cdt"])
+            picks = rng.integers(0, len(debit_tokens), size=rows)
+            data["Type"] = np.where(is_debit, debit_tokens[picks], credit_tokens[picks])
+        else:
+            debit_token, credit_token = DC_ENCODINGS[dc_encoding]
+            data["Type"] = np.where(is_debit, debit_token, credit_token)
+
+    for i in range(extra_columns):
+        data[f"Extra {i + 1}"] = rng.integers(0, 1000, size=rows)
+
+    return pd.DataFrame(data)
+
+
+def generate_csv_bytes(rows, **kwargs):
+    """Same as generate_statement, serialized the way an upload arrives"""
+    buffer = io.StringIO()
+    generate_statement(rows, **kwargs).to_csv(buffer, index=False)
+    return buffer.getvalue().encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic bank statement CSV")
+    parser.add_argument("output", help="Path of the CSV to write")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--extra-columns", type=int, default=0)
+    parser.add_argument("--date-format", choices=sorted(DATE_FORMATS), default="iso")
+    parser.add_argument("--dc-encoding", choices=sorted(DC_ENCODINGS), default="drcr")
+    parser.add_argument("--dirty-ratio", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with open(args.output, "wb") as f:
+        f.write(generate_csv_bytes(
+            args.rows,
+            extra_columns=args.extra_columns,
+            date_format=args.date_format,
+            dc_encoding=args.dc_encoding,
+            dirty_ratio=args.dirty_ratio,
+            seed=args.seed,
+        ))
+
+
+if __name__ == "__main__":
+    main()
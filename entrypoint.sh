@@ -5,24 +5,36 @@ set -e
 cd /backend || { echo "Backend directory not found"; exit 1; }
 
 echo "Starting FastAPI backend"
-# Start Uvicorn with proper host binding
-uvicorn server:app --host 0.0.0.0 --port 8001 &
+# gunicorn runs WEB_CONCURRENCY uvicorn workers (default: one per CPU)
+gunicorn -c gunicorn.conf.py server:app &
 BACKEND_PID=$!
 
-echo "Waiting for backend to start..."
-sleep 30
-
-if ! kill -0 $BACKEND_PID 2>/dev/null; then
-    echo "Backend failed to start at initialization, exiting"
-    exit 1
-fi
+# Wait until the API reports ready (Mongo reachable, storage writable)
+READY_TIMEOUT=${READY_TIMEOUT:-120}
+echo "Waiting for backend to become ready (timeout ${READY_TIMEOUT}s)..."
+elapsed=0
+until wget -q -O /dev/null http://127.0.0.1:8001/api/ready; do
+    if ! kill -0 $BACKEND_PID 2>/dev/null; then
+        echo "Backend failed to start at initialization, exiting"
+        exit 1
+    fi
+    if [ "$elapsed" -ge "$READY_TIMEOUT" ]; then
+        echo "Backend not ready after ${READY_TIMEOUT}s, exiting"
+        kill $BACKEND_PID
+        exit 1
+    fi
+    sleep 1
+    elapsed=$((elapsed + 1))
+done
+echo "Backend ready after ${elapsed}s"
 
 # Start Nginx
 nginx -g 'daemon off;' &
 NGINX_PID=$!
 
-# Handle termination signals
-trap 'kill $BACKEND_PID $NGINX_PID; exit 0' SIGTERM SIGINT
+# Handle termination signals; SIGHUP gracefully reloads the backend workers
+trap 'kill $BACKEND_PID $NGINX_PID; exit 0' TERM INT
+trap 'kill -HUP $BACKEND_PID' HUP
 
 # Check if processes are still running
 while kill -0 $BACKEND_PID 2>/dev/null && kill -0 $NGINX_PID 2>/dev/null; do
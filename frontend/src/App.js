@@ -1,4 +1,4 @@
-import React, { useState, useEffect, createContext, useContext } from 'react';
+import React, { useState, useEffect, useRef, createContext, useContext } from 'react';
 import { BrowserRouter as Router, Routes, Route, Navigate, Link, useNavigate } from 'react-router-dom';
 import axios from 'axios';
 import { useDropzone } from 'react-dropzone';
@@ -9,6 +9,81 @@ import './App.css';
 // Get backend URL from environment
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8001';
 
+// Files above this size are sent with the resumable chunked upload API
+const CHUNKED_UPLOAD_THRESHOLD = 20 * 1024 * 1024;
+const CHUNKED_UPLOAD_PART_SIZE = 8 * 1024 * 1024;
+const CHUNKED_UPLOAD_PART_RETRIES = 3;
+// Most rows the live preview socket keeps up to date (the server's viewport limit)
+const LIVE_PREVIEW_MAX_ROWS = 1000;
+
+async function sha256Hex(buffer) {
+  const hash = await crypto.subtle.digest('SHA-256', buffer);
+  return Array.from(new Uint8Array(hash)).map((b) => b.toString(16).padStart(2, '0')).join('');
+}
+
+// Upload a large file in parts. The upload id is remembered so that a retry
+// after a dropped connection only sends the parts the server doesn't have yet.
+async function chunkedUpload(file, folderId, token) {
+  const headers = { Authorization: `Bearer ${token}` };
+  const resumeKey = `chunked-upload:${file.name}:${file.size}:${file.lastModified}`;
+  let uploadId = localStorage.getItem(resumeKey);
+  let partSize = CHUNKED_UPLOAD_PART_SIZE;
+  let totalParts = 0;
+  let receivedParts = new Set();
+
+  if (uploadId) {
+    try {
+      const status = await axios.get(`${BACKEND_URL}/api/uploads/${uploadId}`, { headers });
+      if (status.data.status === 'pending') {
+        partSize = status.data.part_size;
+        totalParts = status.data.total_parts;
+        receivedParts = new Set(status.data.received_parts);
+      } else {
+        uploadId = null;
+      }
+    } catch (error) {
+      uploadId = null;
+    }
+  }
+
+  if (!uploadId) {
+    const formData = new FormData();
+    formData.append('filename', file.name);
+    formData.append('size_bytes', file.size);
+    formData.append('part_size', CHUNKED_UPLOAD_PART_SIZE);
+    if (folderId) {
+      formData.append('folder_id', folderId);
+    }
+    const init = await axios.post(`${BACKEND_URL}/api/uploads/init`, formData, { headers });
+    uploadId = init.data.upload_id;
+    partSize = init.data.part_size;
+    totalParts = init.data.total_parts;
+    localStorage.setItem(resumeKey, uploadId);
+  }
+
+  for (let partNumber = 1; partNumber <= totalParts; partNumber++) {
+    if (receivedParts.has(partNumber)) continue;
+
+    const part = await file.slice((partNumber - 1) * partSize, partNumber * partSize).arrayBuffer();
+    const checksum = await sha256Hex(part);
+
+    for (let attempt = 1; ; attempt++) {
+      try {
+        await axios.put(`${BACKEND_URL}/api/uploads/${uploadId}/parts/${partNumber}`, part, {
+          headers: { ...headers, 'Content-Type': 'application/octet-stream', 'X-Part-Checksum': checksum }
+        });
+        break;
+      } catch (error) {
+        if (attempt >= CHUNKED_UPLOAD_PART_RETRIES) throw error;
+      }
+    }
+  }
+
+  const response = await axios.post(`${BACKEND_URL}/api/uploads/${uploadId}/complete`, null, { headers });
+  localStorage.removeItem(resumeKey);
+  return response;
+}
+
 // Logo Component
 function Logo({ className = "" }) {
   return (
@@ -124,13 +199,16 @@ function ProtectedRoute({ children }) {
 
 // File Upload Component
 function FileUploader({ onFileProcessed, folderId }) {
+  const navigate = useNavigate();
   const [isUploading, setIsUploading] = useState(false);
   const [uploadError, setUploadError] = useState(null);
   
   const { getRootProps, getInputProps } = useDropzone({
     accept: {
       'text/csv': ['.csv'],
-      'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': ['.xlsx']
+      'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': ['.xlsx'],
+      'application/zip': ['.zip'],
+      'application/gzip': ['.gz']
     },
     multiple: false,
     onDrop: async (acceptedFiles) => {
@@ -141,21 +219,36 @@ function FileUploader({ onFileProcessed, folderId }) {
       setIsUploading(true);
       
       try {
-        const formData = new FormData();
-        formData.append('file', file);
+        const token = localStorage.getItem('token');
+        let response;
         
-        // Add folder ID if provided
-        if (folderId) {
-          formData.append('folder_id', folderId);
+        if (file.size > CHUNKED_UPLOAD_THRESHOLD) {
+          // Large files go through the resumable chunked upload API
+          response = await chunkedUpload(file, folderId, token);
+        } else {
+          const formData = new FormData();
+          formData.append('file', file);
+          
+          // Add folder ID if provided
+          if (folderId) {
+            formData.append('folder_id', folderId);
+          }
+          
+          response = await axios.post(`${BACKEND_URL}/api/upload`, formData, {
+            headers: {
+              'Content-Type': 'multipart/form-data',
+              'Authorization': `Bearer ${token}`
+            }
+          });
         }
         
-        const token = localStorage.getItem('token');
-        const response = await axios.post(`${BACKEND_URL}/api/upload`, formData, {
-          headers: {
-            'Content-Type': 'multipart/form-data',
-            'Authorization': `Bearer ${token}`
-          }
-        });
+        if (response.data.results) {
+          // ZIP archives are unpacked into several files; they appear on the dashboard
+          const successCount = response.data.results.filter(r => r.success).length;
+          toast.success(`${successCount} of ${response.data.results.length} files extracted from the archive`);
+          navigate('/');
+          return;
+        }
         
         onFileProcessed(response.data, file.name);
         toast.success('File uploaded successfully!');
@@ -187,7 +280,7 @@ function FileUploader({ onFileProcessed, folderId }) {
               </svg>
               <p className="mt-4 text-sm text-gray-600">
                 <span className="font-medium text-indigo-600 hover:text-indigo-500">
-                  Drag and drop your CSV or XLSX file here, or click to browse
+                  Drag and drop your CSV, XLSX, ZIP or CSV.GZ file here, or click to browse
                 </span>
               </p>
               <p className="mt-1 text-xs text-gray-500">Files will be automatically mapped to Xero format</p>
@@ -784,6 +877,12 @@ function FileConversion() {
   const [fileId, setFileId] = useState(fileIdFromUrl || null);
   const [folderId, setFolderId] = useState(folderIdFromUrl || 'root');
   const [isLoading, setIsLoading] = useState(!!fileIdFromUrl);
+  const previewSocketRef = useRef(null);
+  // Rows (from the top of the table) the socket's patches cover
+  const liveWindowRowsRef = useRef(0);
+  const columnMappingRef = useRef(columnMapping);
+  // Previews by file and mapping JSON, with the ETag the server sent for each
+  const previewCacheRef = useRef({});
 
   useEffect(() => {
     if (fileId) {
@@ -791,6 +890,52 @@ function FileConversion() {
     }
   }, [fileId]);
 
+  useEffect(() => {
+    columnMappingRef.current = columnMapping;
+  }, [columnMapping]);
+
+  // Live preview channel: mapping edits are sent as deltas and only changed rows come back
+  useEffect(() => {
+    if (!fileId || !fileData) return;
+
+    const token = localStorage.getItem('token');
+    const wsUrl = `${BACKEND_URL.replace(/^http/, 'ws')}/api/ws/preview/${fileId}?token=${encodeURIComponent(token)}`;
+    const socket = new WebSocket(wsUrl);
+
+    socket.onopen = () => {
+      // Sync the server with the mapping currently shown in the UI
+      socket.send(JSON.stringify({ type: 'mapping', delta: columnMappingRef.current }));
+    };
+
+    socket.onmessage = (event) => {
+      const message = JSON.parse(event.data);
+      if (message.type === 'snapshot') {
+        // The socket's window becomes the table, so every row shown is one it patches
+        liveWindowRowsRef.current = message.rows.length;
+        setFormattedData(message.rows);
+      } else if (message.type === 'patch') {
+        setFormattedData((rows) => {
+          const nextRows = [...rows];
+          message.rows.forEach(({ index, values }) => {
+            if (nextRows[index]) {
+              nextRows[index] = { ...nextRows[index], ...values };
+            }
+          });
+          return nextRows;
+        });
+      } else if (message.type === 'error') {
+        toast.error('Failed to update preview: ' + message.detail);
+      }
+    };
+
+    previewSocketRef.current = socket;
+
+    return () => {
+      socket.close();
+      previewSocketRef.current = null;
+    };
+  }, [fileId, fileData]);
+
   const fetchFileData = async (id) => {
     setIsLoading(true);
     try {
@@ -823,6 +968,28 @@ function FileConversion() {
     setFormattedFilename(filename.replace(/\.[^/.]+$/, '') + '_formatted.csv');
   };
 
+  const handleMappingChange = (newMapping) => {
+    const delta = {};
+    Object.keys(newMapping).forEach((key) => {
+      if (newMapping[key] !== columnMapping[key]) {
+        delta[key] = newMapping[key];
+      }
+    });
+    setColumnMapping(newMapping);
+
+    const socket = previewSocketRef.current;
+    if (socket && socket.readyState === WebSocket.OPEN && Object.keys(delta).length > 0) {
+      // After "Update Preview" the table can hold more rows than the socket's
+      // window; widen the window to cover them first (its snapshot replaces the table)
+      const rowsShown = Math.min(formattedData.length, LIVE_PREVIEW_MAX_ROWS);
+      if (rowsShown > 0 && rowsShown !== liveWindowRowsRef.current) {
+        liveWindowRowsRef.current = rowsShown;
+        socket.send(JSON.stringify({ type: 'viewport', offset: 0, limit: rowsShown }));
+      }
+      socket.send(JSON.stringify({ type: 'mapping', delta }));
+    }
+  };
+
   const handleUpdatePreview = async () => {
     if (!fileData) return;
     
@@ -830,19 +997,31 @@ function FileConversion() {
     
     try {
       const token = localStorage.getItem('token');
+      const mappingKey = JSON.stringify(columnMapping);
+      const cacheKey = `${fileId}:${mappingKey}`;
+      const cached = previewCacheRef.current[cacheKey];
       const formData = new FormData();
       formData.append('file_id', fileId);
-      formData.append('column_mappings', JSON.stringify(columnMapping));
+      formData.append('column_mappings', mappingKey);
       formData.append('preview_only', 'true');
       
       const response = await axios.post(`${BACKEND_URL}/api/preview`, formData, {
         headers: {
           'Content-Type': 'multipart/form-data',
-          'Authorization': `Bearer ${token}`
-        }
+          'Authorization': `Bearer ${token}`,
+          ...(cached ? { 'If-None-Match': cached.etag } : {})
+        },
+        validateStatus: (status) => (status >= 200 && status < 300) || status === 304
       });
       
-      setFormattedData(response.data.formatted_data);
+      if (response.status === 304) {
+        setFormattedData(cached.data);
+      } else {
+        setFormattedData(response.data.formatted_data);
+        if (response.headers.etag) {
+          previewCacheRef.current[cacheKey] = { etag: response.headers.etag, data: response.data.formatted_data };
+        }
+      }
       toast.success('Preview updated with new column mapping!');
     } catch (error) {
       toast.error('Failed to update preview: ' + (error.response?.data?.detail || 'Unknown error'));
@@ -945,7 +1124,7 @@ function FileConversion() {
                   <div className="bg-blue-50 p-4 rounded-lg mb-6">
                     <h3 className="text-md font-medium text-blue-800 mb-2">File Format Guidelines:</h3>
                     <ul className="list-disc pl-5 text-sm text-blue-700 space-y-1">
-                      <li>Upload CSV or XLSX files containing financial transaction data</li>
+                      <li>Upload CSV or XLSX files (or ZIP / CSV.GZ archives of them) containing financial transaction data</li>
                       <li>Ensure your file has columns for date, description, and amount</li>
                       <li>Files with headers will be automatically mapped to Xero format</li>
                       <li>Dates should be in a standard format (e.g., YYYY-MM-DD or MM/DD/YYYY)</li>
@@ -983,7 +1162,7 @@ function FileConversion() {
                   <ColumnMapper
                     originalColumns={fileData.original_columns}
                     columnMapping={columnMapping}
-                    onMappingChange={setColumnMapping}
+                    onMappingChange={handleMappingChange}
                     onUpdatePreview={handleUpdatePreview}
                     isUpdatingPreview={isUpdatingPreview}
                   />
@@ -1497,7 +1676,9 @@ function BulkUploader({ onFilesProcessed, folderId }) {
   const { getRootProps, getInputProps } = useDropzone({
     accept: {
       'text/csv': ['.csv'],
-      'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': ['.xlsx']
+      'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': ['.xlsx'],
+      'application/zip': ['.zip'],
+      'application/gzip': ['.gz']
     },
     multiple: true,
     onDrop: async (acceptedFiles) => {
@@ -1528,7 +1709,7 @@ function BulkUploader({ onFilesProcessed, folderId }) {
         
         // Count successful uploads
         const successCount = response.data.results.filter(r => r.success).length;
-        toast.success(`${successCount} of ${acceptedFiles.length} files uploaded successfully!`);
+        toast.success(`${successCount} of ${response.data.results.length} files uploaded successfully!`);
       } catch (error) {
         const errorMessage = error.response?.data?.detail || 'Unknown error occurred';
         setUploadError(errorMessage);
@@ -1557,7 +1738,7 @@ function BulkUploader({ onFilesProcessed, folderId }) {
               </svg>
               <p className="mt-4 text-sm text-gray-600">
                 <span className="font-medium text-indigo-600 hover:text-indigo-500">
-                  Drag and drop multiple CSV or XLSX files here, or click to browse
+                  Drag and drop multiple CSV, XLSX, ZIP or CSV.GZ files here, or click to browse
                 </span>
               </p>
               <p className="mt-1 text-xs text-gray-500">Upload up to 20 files at once (10MB max per file)</p>
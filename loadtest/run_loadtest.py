@@ -0,0 +1,218 @@
+"""
+End-to-end HTTP load test for the converter API.
+
+Drives realistic user journeys at a configurable concurrency:
+
+    register -> token -> upload -> preview x N -> convert -> download -> folder listing
+
+By default the FastAPI app is booted in-process (httpx ASGI transport) against
+a throwaway database on the mongod at --mongo-url (MONGO_URL, or localhost):
+
+    python loadtest/run_loadtest.py --users 20 --journeys 100 --rows 2000
+
+--mongomock runs without a database for smoke tests only: mongomock checks
+unique indexes by scanning the collection, so inserts get slower as the
+collection grows and its numbers are not representative. Use --base-url to
+load an already running server (e.g. under uvicorn).
+Reports p50/p95/p99 latency and throughput per endpoint.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from collections import defaultdict
+
+import httpx
+
+LOADTEST_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(LOADTEST_DIR, "..", "benchmarks"))
+sys.path.insert(0, os.path.join(LOADTEST_DIR, "..", "backend"))
+
+from synthetic import generate_csv_bytes  # noqa: E402
+
+
+MOCK_WARNING = (
+    "WARNING: running against mongomock. Its unique-index checks scan the whole collection, "
+    "so latencies grow with the data and are not representative; use a real mongod for numbers."
+)
+
+
+def build_in_process_client(mongo_url, use_mongomock=False):
+    """Import the app with its database swapped for a throwaway mongod database or mongomock"""
+    import server
+
+    if use_mongomock:
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("--mongomock needs mongomock installed (pip install mongomock)")
+        print(MOCK_WARNING, file=sys.stderr)
+        server.client = mongomock.MongoClient()
+    else:
+        from pymongo import MongoClient
+        from pymongo.errors import PyMongoError
+        server.client = MongoClient(mongo_url, serverSelectionTimeoutMS=5000)
+        try:
+            server.client.admin.command("ping")
+        except PyMongoError as e:
+            sys.exit(f"Cannot reach mongod at {mongo_url} ({e}); start one, pass --mongo-url, or use --mongomock")
+    server.db = server.client[f"loadtest_{uuid.uuid4().hex[:8]}"]
+
+    transport = httpx.ASGITransport(app=server.app)
+    return httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None)
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def call(self, client, endpoint, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except Exception:
+            self.errors[endpoint] += 1
+            raise
+        self.latencies[endpoint].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[endpoint] += 1
+            raise RuntimeError(f"{endpoint} returned {response.status_code}: {response.text[:200]}")
+        return response
+
+
+async def run_journey(client, recorder, statement, previews):
+    email = f"load_{uuid.uuid4().hex}@example.com"
+    password = "loadtest-password"
+
+    await recorder.call(client, "POST /api/register", "POST", "/api/register",
+                        json={"email": email, "password": password})
+    token = (await recorder.call(client, "POST /api/token", "POST", "/api/token",
+                                 data={"username": email, "password": password})).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    upload = (await recorder.call(client, "POST /api/upload", "POST", "/api/upload", headers=headers,
+                                  files={"file": ("statement.csv", statement, "text/csv")})).json()
+    file_id = upload["file_id"]
+    column_mapping = upload["column_mapping"]
+
+    # Simulate the user nudging the mapping a few times
+    columns = upload["original_columns"]
+    for i in range(previews):
+        mapping = dict(column_mapping)
+        mapping["B"] = columns[i % len(columns)]
+        await recorder.call(client, "POST /api/preview", "POST", "/api/preview", headers=headers,
+                            data={"file_id": file_id, "column_mappings": json.dumps(mapping), "preview_only": "true"})
+
+    conversion = (await recorder.call(client, "POST /api/convert", "POST", "/api/convert", headers=headers,
+                                      data={"file_id": file_id, "column_mappings": json.dumps(column_mapping)})).json()
+    await recorder.call(client, "GET /api/download/{conversion_id}", "GET",
+                        f"/api/download/{conversion['conversion_id']}", headers=headers)
+    await recorder.call(client, "GET /api/folders/{folder_id}/files", "GET", "/api/folders/root/files", headers=headers)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def build_report(recorder, wall_seconds, journeys_done, journeys_failed, args):
+    endpoints = {}
+    for endpoint, values in recorder.latencies.items():
+        values = sorted(values)
+        endpoints[endpoint] = {
+            "requests": len(values),
+            "errors": recorder.errors.get(endpoint, 0),
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "max_ms": values[-1] * 1000,
+            "throughput_rps": len(values) / wall_seconds,
+        }
+    return {
+        "params": {k: v for k, v in vars(args).items() if k != "output"},
+        "wall_seconds": wall_seconds,
+        "journeys_completed": journeys_done,
+        "journeys_failed": journeys_failed,
+        "journeys_per_second": journeys_done / wall_seconds,
+        "endpoints": endpoints,
+    }
+
+
+def print_report(report):
+    print(f"\n{report['journeys_completed']} journeys in {report['wall_seconds']:.2f}s "
+          f"({report['journeys_per_second']:.2f}/s), {report['journeys_failed']} failed\n")
+    print(f"{'endpoint':<38} {'reqs':>6} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8}")
+    for endpoint, stats in report["endpoints"].items():
+        print(f"{endpoint:<38} {stats['requests']:>6} {stats['errors']:>4} {stats['p50_ms']:>9.1f} "
+              f"{stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f} {stats['throughput_rps']:>8.1f}")
+
+
+async def main_async(args):
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=None)
+    else:
+        client = build_in_process_client(args.mongo_url, args.mongomock)
+
+    statement = generate_csv_bytes(args.rows, dc_encoding="mixed", seed=args.seed)
+    recorder = Recorder()
+    queue = asyncio.Queue()
+    for _ in range(args.journeys):
+        queue.put_nowait(None)
+    counts = {"done": 0, "failed": 0}
+
+    async def virtual_user():
+        while True:
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                await run_journey(client, recorder, statement, args.previews)
+                counts["done"] += 1
+            except Exception as e:
+                counts["failed"] += 1
+                if args.verbose:
+                    print(f"journey failed: {e}")
+
+    start = time.perf_counter()
+    async with client:
+        await asyncio.gather(*[virtual_user() for _ in range(args.users)])
+    wall_seconds = time.perf_counter() - start
+
+    return build_report(recorder, wall_seconds, counts["done"], counts["failed"], args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the converter API with realistic user journeys")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent virtual users")
+    parser.add_argument("--journeys", type=int, default=50, help="Total journeys to run")
+    parser.add_argument("--previews", type=int, default=3, help="Preview requests per journey")
+    parser.add_argument("--rows", type=int, default=1000, help="Rows in the uploaded statement")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--base-url", help="Load an already running server instead of booting the app in-process")
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"),
+                        help="In-process mode: mongod to create a throwaway database on")
+    parser.add_argument("--mongomock", action="store_true",
+                        help="In-process mode: use mongomock instead of mongod (smoke tests only, not representative)")
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    print_report(report)
+    if args.mongomock and not args.base_url:
+        print(f"\n{MOCK_WARNING}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
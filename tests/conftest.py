@@ -0,0 +1,66 @@
+"""
+Shared fixtures. The backend runs from backend/ and imports its modules
+bare, so that directory goes on sys.path here once for every test module.
+Modules that import the conversion engine at the top are skipped as a
+whole when pandas, numpy or mongomock is missing.
+"""
+import importlib.util
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+ENGINE_TEST_MODULES = ["test_summaries.py", "test_transaction_index.py", "test_transaction_search.py"]
+if any(importlib.util.find_spec(name) is None for name in ("pandas", "numpy", "mongomock")):
+    collect_ignore = ENGINE_TEST_MODULES
+
+STATEMENT_COLUMNS = ["Date", "Cheque No.", "Description", "Amount"]
+
+
+@pytest.fixture
+def statement():
+    """Build a raw statement dataframe from rows, with STATEMENT_COLUMNS unless columns are given"""
+    pd = pytest.importorskip("pandas")
+
+    def build(rows, columns=STATEMENT_COLUMNS):
+        return pd.DataFrame(rows, columns=list(columns))
+    return build
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """
+    A TestClient against the app with mongomock and local storage under
+    tmp_path, signed in as a fresh user. Conversions run on a thread pool
+    so the workers see the same storage.
+    """
+    pytest.importorskip("pandas")
+    pytest.importorskip("httpx")
+    mongomock = pytest.importorskip("mongomock")
+    from fastapi.testclient import TestClient
+
+    import server
+    import storage
+
+    (tmp_path / "store").mkdir()
+    monkeypatch.setattr(server, "db", mongomock.MongoClient()["api"])
+    monkeypatch.setattr(storage, "_backend", storage.LocalStorage(str(tmp_path / "store")))
+    executor = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(server, "_conversion_executor", executor)
+    server._dataset_cache.clear()
+
+    client = TestClient(server.app)
+    client.post("/api/register", json={"email": "books@example.com", "password": "pw"})
+    token = client.post("/api/token", data={"username": "books@example.com", "password": "pw"}).json()["access_token"]
+    yield SimpleNamespace(
+        client=client,
+        headers={"Authorization": f"Bearer {token}"},
+        db=server.db,
+        server=server,
+        root=tmp_path
+    )
+    executor.shutdown()
@@ -0,0 +1,171 @@
+"""
+Conversion endpoints: preview, convert and bulk-convert requests, their
+validation, and the responses they produce.
+"""
+import io
+import json
+import zipfile
+
+import pytest
+
+STATEMENT = b"Date,Details,Amount,Type\n2024-01-05,Coffee,12.50,DR\n2024-01-06,Salary,1000,CR\n2024-02-01,Rent,500,DR\n"
+MAPPING = {"A": "Date", "C": "Details", "D": "Amount", "transaction_type": "Type"}
+
+
+@pytest.fixture
+def file_id(api):
+    response = api.client.post("/api/upload", files={"file": ("jan.csv", STATEMENT)}, headers=api.headers)
+    return response.json()["file_id"]
+
+
+@pytest.mark.parametrize("endpoint", ["/api/preview", "/api/convert"])
+def test_invalid_mappings_are_client_errors(api, file_id, endpoint):
+    for column_mappings in ("{not json", "[1, 2]", json.dumps({**MAPPING, "currency_exponent": "x"}),
+                            json.dumps({**MAPPING, "currency_exponent": 9})):
+        response = api.client.post(
+            endpoint, data={"file_id": file_id, "column_mappings": column_mappings}, headers=api.headers
+        )
+        assert response.status_code == 400, (column_mappings, response.text)
+
+    response = api.client.post(
+        endpoint,
+        data={"file_id": file_id, "column_mappings": json.dumps({**MAPPING, "currency_exponent": "0"})},
+        headers=api.headers
+    )
+    assert response.status_code == 200, response.text
+
+
+def test_bulk_convert_rejects_invalid_mappings(api, file_id):
+    response = api.client.post(
+        "/api/bulk-convert",
+        data={"file_ids": json.dumps([file_id]), "column_mappings": json.dumps({"currency_exponent": -1})},
+        headers=api.headers
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("persist", [True, False])
+def test_bulk_convert_links_and_zip(api, file_id, monkeypatch, persist):
+    monkeypatch.setattr(api.server.storage, "PERSIST_CONVERTED_OUTPUTS", persist)
+    other = api.client.post("/api/upload", files={"file": ("feb.csv", STATEMENT)}, headers=api.headers).json()["file_id"]
+    data = {"file_ids": json.dumps([file_id, "missing", other]), "column_mappings": json.dumps(MAPPING)}
+
+    response = api.client.post("/api/bulk-convert", data=data, headers=api.headers)
+    assert response.status_code == 200, response.text
+    results = response.json()["results"]
+    assert [(r["file_id"], r["success"]) for r in results] == [(file_id, True), ("missing", False), (other, True)]
+    assert results[0]["row_count"] == 3 and results[0]["formatted_filename"] == "jan_formatted.csv"
+    download = api.client.get(results[2]["download_url"], headers=api.headers)
+    assert download.status_code == 200
+    assert download.content.splitlines()[:2] == [b"Date,Cheque No.,Description,Amount,Reference", b"05/01/2024,,Coffee,-12.50,D"]
+
+    response = api.client.post("/api/bulk-convert", data={**data, "output": "zip"}, headers=api.headers)
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"] == "application/zip"
+    header = json.loads(response.headers["X-Conversion-Results"])
+    assert [(r["file_id"], r["success"]) for r in header] == [(file_id, True), ("missing", False), (other, True)]
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.namelist() == ["jan_formatted.csv", "feb_formatted.csv"]
+        assert archive.read("jan_formatted.csv") == archive.read("feb_formatted.csv") == download.content
+    # Outputs written only to build the archive are not kept
+    outputs = [name for name in (api.root / "store").iterdir() if "formatted" in name.name]
+    assert bool(outputs) == persist
+
+    response = api.client.post("/api/bulk-convert", data={**data, "output": "tar"}, headers=api.headers)
+    assert response.status_code == 400
+
+
+def test_preview_answers_conditional_requests(api, file_id):
+    def preview(mapping=MAPPING, etag=None, **data):
+        headers = {**api.headers, "If-None-Match": etag} if etag else api.headers
+        return api.client.post(
+            "/api/preview",
+            data={"file_id": file_id, "column_mappings": json.dumps(mapping), "preview_only": "true", **data},
+            headers=headers
+        )
+
+    first = preview()
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and first.headers["Cache-Control"] == "private, no-cache"
+
+    assert preview(etag=etag).status_code == 304
+    assert preview(etag=f'"other", W/{etag}').status_code == 304
+    changed = preview({**MAPPING, "currency_exponent": 3}, etag=etag)
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+    # Duplicate checks depend on other conversions, so they are never cached
+    flagged = preview(etag=etag, duplicates="flag")
+    assert flagged.status_code == 200 and "ETag" not in flagged.headers
+
+
+def test_file_details_answer_conditional_requests(api, file_id):
+    first = api.client.get(f"/api/files/{file_id}", headers=api.headers)
+    etag = first.headers["ETag"]
+    assert first.status_code == 200
+
+    response = api.client.get(f"/api/files/{file_id}", headers={**api.headers, "If-None-Match": etag})
+    assert response.status_code == 304 and response.headers["ETag"] == etag and not response.content
+
+    # Records stored before dataset hashes get one backfilled, with the same ETag
+    dataset_hash = api.db.files.find_one({"id": file_id})["dataset_hash"]
+    api.db.files.update_one({"id": file_id}, {"$unset": {"dataset_hash": ""}})
+    response = api.client.get(f"/api/files/{file_id}", headers={**api.headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert api.db.files.find_one({"id": file_id})["dataset_hash"] == dataset_hash
+
+    api.db.files.update_one({"id": file_id}, {"$set": {"folder_id": "elsewhere"}})
+    response = api.client.get(f"/api/files/{file_id}", headers={**api.headers, "If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["ETag"] != etag
+
+
+@pytest.mark.parametrize("persist", [True, False])
+def test_convert_split_by_period(api, monkeypatch, persist):
+    monkeypatch.setattr(api.server.storage, "PERSIST_CONVERTED_OUTPUTS", persist)
+    content = STATEMENT + b"someday,Refund,5,CR\n2024-04-02,Fee,1,DR\n"
+    file_id = api.client.post("/api/upload", files={"file": ("jan.csv", content)}, headers=api.headers).json()["file_id"]
+
+    def convert(split_by):
+        return api.client.post(
+            "/api/convert",
+            data={"file_id": file_id, "column_mappings": json.dumps(MAPPING), "split_by": split_by},
+            headers=api.headers
+        )
+
+    response = convert("month")
+    assert response.status_code == 200, response.text
+    assert 'jan_formatted_by_month.zip' in response.headers["content-disposition"]
+    results = json.loads(response.headers["X-Conversion-Results"])
+    assert [r["period"] for r in results] == ["2024-01", "2024-02", "2024-04", "undated"]
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        members = {name: archive.read(name) for name in archive.namelist()}
+    assert list(members) == [f"jan_formatted_{r['period']}.csv" for r in results]
+    assert members["jan_formatted_2024-01.csv"].count(b"\n") == 3
+    assert b"Refund" in members["jan_formatted_undated.csv"]
+
+    # Each period downloads on its own, stored or rebuilt from the dataset
+    for result in results:
+        download = api.client.get(f"/api/download/{result['conversion_id']}", headers=api.headers)
+        assert download.status_code == 200
+        assert download.content == members[f"jan_formatted_{result['period']}.csv"]
+
+    response = convert("quarter")
+    assert [r["period"] for r in json.loads(response.headers["X-Conversion-Results"])] == ["2024-Q1", "2024-Q2", "undated"]
+    assert convert("week").status_code == 400
+
+
+def test_dataset_cache_is_keyed_by_dataset_hash(api, file_id):
+    def preview(target):
+        return api.client.post(
+            "/api/preview", data={"file_id": target, "column_mappings": json.dumps(MAPPING)}, headers=api.headers
+        )
+
+    assert preview(file_id).status_code == 200
+    copy = api.client.post("/api/upload", files={"file": ("copy.csv", STATEMENT)}, headers=api.headers).json()["file_id"]
+    assert preview(copy).status_code == 200
+    dataset_hash = api.db.files.find_one({"id": file_id})["dataset_hash"]
+    assert list(api.server._dataset_cache) == [dataset_hash]
+
+    # Deleted by another worker: this worker's entry can't be reached without the record
+    api.db.files.delete_one({"id": file_id})
+    assert preview(file_id).status_code == 404
+    assert api.client.delete(f"/api/files/{copy}", headers=api.headers).status_code == 200
+    assert list(api.server._dataset_cache) == []
@@ -0,0 +1,55 @@
+"""
+Debit/credit rule sets: validation, match types, priority order and the
+explanation returned by the rule-explain API.
+"""
+import os
+import sys
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from xero_converter.dc_rules import RuleEvaluator, compile_rules, normalize_rules  # noqa: E402
+
+
+def test_default_rules_match_whole_tokens_not_substrings():
+    values = pd.Series([" DR ", "cr", "Debit Card", "Credit Transfer", "Cash", "Account", None, 12], dtype=object)
+
+    assert compile_rules().sides(values).tolist() == ["debit", "credit", "debit", "credit", None, None, None, None]
+
+
+def test_priority_then_position_decides_between_matches():
+    evaluator = RuleEvaluator([
+        {"match": "prefix", "pattern": "ref", "side": "debit"},
+        {"match": "regex", "pattern": "refund", "side": "credit", "priority": 5},
+        {"match": "exact", "pattern": "refund", "side": "debit", "priority": 5},
+    ])
+
+    assert evaluator.sides(pd.Series(["Refund", "refund fee", "Reference"])).tolist() == ["credit", "credit", "debit"]
+
+
+def test_explain_names_the_winning_rule():
+    rules = [
+        {"match": "exact", "pattern": "dr", "side": "debit"},
+        {"match": "regex", "pattern": r"^pay", "side": "credit", "priority": 1},
+    ]
+
+    explanations = compile_rules(rules).explain(["Payroll", "DR", "other"])
+
+    assert [e["rule_index"] for e in explanations] == [1, 0, None]
+    assert explanations[0]["side"] == "credit" and explanations[2]["side"] is None
+
+
+@pytest.mark.parametrize("rules, message", [
+    ({"match": "exact"}, "must be a list"),
+    ([{"match": "glob", "pattern": "x", "side": "debit"}], "match must be"),
+    ([{"pattern": "x", "side": "left"}], "side must be"),
+    ([{"pattern": " ", "side": "debit"}], "non-empty"),
+    ([{"pattern": "x", "side": "debit", "priority": "high"}], "priority"),
+    ([{"match": "regex", "pattern": "(", "side": "debit"}], "invalid regex"),
+])
+def test_invalid_rules_are_rejected(rules, message):
+    with pytest.raises(ValueError, match=message):
+        normalize_rules(rules)
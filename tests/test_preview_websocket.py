@@ -0,0 +1,54 @@
+"""
+Live preview channel: snapshots, patches of changed cells, and error
+replies to malformed messages that leave the connection usable.
+"""
+import pytest
+
+STATEMENT = b"Date,Details,Amount,Posted\n2024-01-05,Coffee,12.50,Cafe\n2024-01-06,Salary,1000,Employer\n"
+
+
+@pytest.fixture
+def preview(api):
+    file_id = api.client.post("/api/upload", files={"file": ("jan.csv", STATEMENT)}, headers=api.headers).json()["file_id"]
+    token = api.headers["Authorization"].split()[1]
+    with api.client.websocket_connect(f"/api/ws/preview/{file_id}?token={token}") as websocket:
+        yield websocket
+
+
+def test_mapping_and_viewport_messages(preview):
+    snapshot = preview.receive_json()
+    assert snapshot["type"] == "snapshot" and snapshot["total_rows"] == 2
+    assert snapshot["rows"][0]["Description"] == "Coffee"
+
+    preview.send_json({"type": "mapping", "delta": {"C": "Posted"}})
+    patch = preview.receive_json()
+    assert patch["type"] == "patch"
+    assert patch["rows"] == [
+        {"index": 0, "values": {"Description": "Cafe"}},
+        {"index": 1, "values": {"Description": "Employer"}},
+    ]
+
+    preview.send_json({"type": "viewport", "offset": 1, "limit": 10})
+    snapshot = preview.receive_json()
+    assert (snapshot["offset"], [row["Description"] for row in snapshot["rows"]]) == (1, ["Employer"])
+
+
+def test_malformed_messages_get_an_error_reply(preview):
+    preview.receive_json()
+    for send in (
+        lambda: preview.send_text("not json"),
+        lambda: preview.send_bytes(b"{}"),
+        lambda: preview.send_json(["mapping"]),
+        lambda: preview.send_json({"type": "mapping", "delta": ["C", "Posted"]}),
+        lambda: preview.send_json({"type": "mapping", "delta": {"C": "Missing column"}}),
+        lambda: preview.send_json({"type": "viewport", "offset": "x"}),
+        lambda: preview.send_json({"type": "viewport", "limit": None}),
+        lambda: preview.send_json({"type": "resize"}),
+    ):
+        send()
+        assert preview.receive_json()["type"] == "error"
+
+    # Still connected, with the last good mapping and viewport
+    preview.send_json({"type": "viewport", "offset": 0})
+    snapshot = preview.receive_json()
+    assert snapshot["type"] == "snapshot" and snapshot["rows"][0]["Description"] == "Coffee"
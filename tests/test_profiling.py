@@ -0,0 +1,54 @@
+"""
+Request profiling: admins get a collapsed-stack profile of a request back
+from any instance, with a count of the requests that overlapped it on the
+worker. The middleware is only installed when there are admins.
+"""
+import pytest
+
+STATEMENT = b"Date,Details,Amount,Type\n2024-01-05,Coffee,12.50,DR\n"
+
+
+@pytest.fixture
+def profiled(api):
+    """A client for the app behind the profiling middleware, whatever ADMIN_EMAILS was at import"""
+    from fastapi.testclient import TestClient
+    return TestClient(api.server.RequestProfiler(api.server.app))
+
+
+def upload(client, api, **params):
+    return client.post("/api/upload", params=params, files={"file": ("a.csv", STATEMENT)}, headers=api.headers)
+
+
+def test_admins_profile_requests(api, profiled, monkeypatch):
+    assert upload(profiled, api, profile=1).status_code == 403
+
+    monkeypatch.setattr(api.server, "ADMIN_EMAILS", {"books@example.com"})
+    response = upload(profiled, api, profile=1)
+    assert response.status_code == 200, response.text
+    profile_id = response.headers["X-Profile-Id"]
+
+    listed = api.client.get("/api/admin/profiles", headers=api.headers).json()
+    assert [(p["id"], p["route"], p["status_code"], p["overlapping_requests"]) for p in listed] == [
+        (profile_id, "/api/upload", 200, 0)
+    ]
+    stacks = api.client.get(f"/api/admin/profiles/{profile_id}", headers=api.headers)
+    assert stacks.status_code == 200
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in stacks.text.splitlines())
+
+    assert "X-Profile-Id" not in upload(profiled, api).headers
+    assert "X-Profile-Id" not in profiled.get("/api/me", params={"profile": 1}, headers=api.headers).headers
+
+
+def test_profiles_count_overlapping_requests(api, profiled, monkeypatch):
+    running = {"overlapping_requests": 0}
+    monkeypatch.setattr(api.server, "_running_profiles", [running])
+
+    assert profiled.get("/api/me", headers=api.headers).status_code == 200
+    assert upload(profiled, api).status_code == 200
+    assert running["overlapping_requests"] == 2
+    assert api.server._requests_in_flight == 0
+
+
+def test_middleware_is_only_installed_with_admins(api):
+    installed = any(middleware.cls is api.server.RequestProfiler for middleware in api.server.app.user_middleware)
+    assert installed == bool(api.server.ADMIN_EMAILS)
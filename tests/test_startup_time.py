@@ -0,0 +1,56 @@
+"""
+Startup-time budget for the API process.
+
+Importing server.py happens in every worker spawn, so it must not pull in
+the conversion engine (pandas/numpy/openpyxl) or the auth stack
+(passlib/bcrypt/jose). Measured with `python -X importtime` in a fresh
+interpreter; the budget can be overridden with SERVER_IMPORT_BUDGET_SECONDS
+on slow CI machines.
+"""
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("prometheus_client")
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+IMPORT_BUDGET_SECONDS = float(os.environ.get("SERVER_IMPORT_BUDGET_SECONDS", "1.0"))
+LAZY_MODULES = {"pandas", "numpy", "openpyxl", "passlib", "bcrypt", "jose"}
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def import_server_with_importtime():
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "MONGO_URL": "mongodb://localhost:27017"},
+    )
+    assert result.returncode == 0, result.stderr
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            modules[match.group(4)] = int(match.group(2))
+    return modules
+
+
+def test_server_import_skips_heavy_modules():
+    modules = import_server_with_importtime()
+    loaded = {name.split(".")[0] for name in modules}
+    assert not (loaded & LAZY_MODULES), f"eagerly imported: {sorted(loaded & LAZY_MODULES)}"
+
+
+def test_server_import_within_budget():
+    modules = import_server_with_importtime()
+    cumulative_seconds = modules["server"] / 1e6
+    assert cumulative_seconds < IMPORT_BUDGET_SECONDS, (
+        f"importing server took {cumulative_seconds:.3f}s (budget {IMPORT_BUDGET_SECONDS}s)"
+    )
@@ -0,0 +1,173 @@
+"""
+Artifact storage: the backend contract (put / get_range / stream / delete /
+stat) for the local filesystem and for S3 against moto's in-process stand-in,
+plus the eviction rules of the lifecycle manager. Converted outputs expire by
+TTL and are evicted least-recently-used first over quota. Originals and
+objects the manager doesn't own are never touched.
+"""
+import functools
+import hashlib
+import os
+import sys
+import time
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+import storage  # noqa: E402
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "_backend", storage.LocalStorage(str(tmp_path)))
+    monkeypatch.setattr(storage, "STORAGE_QUOTA_BYTES", 0)
+    monkeypatch.setattr(storage, "CONVERTED_TTL_SECONDS", 0)
+    return tmp_path
+
+
+@pytest.fixture
+def s3_backend():
+    moto = pytest.importorskip("moto")
+    boto3 = pytest.importorskip("boto3")
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="artifacts")
+        yield storage.S3Storage("artifacts", prefix="datasets/", client=client, part_size=5 * 1024 * 1024)
+
+
+@pytest.fixture(params=["local", "s3"])
+def backend(request, tmp_path):
+    if request.param == "local":
+        return storage.LocalStorage(str(tmp_path))
+    return request.getfixturevalue("s3_backend")
+
+
+def write(key, size, age=0):
+    path = storage.local_path(key)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return key
+
+
+def test_backend_round_trip(backend):
+    key = storage.converted_key(str(uuid.uuid4()), "out.csv")
+    assert backend.stat(key) is None
+
+    backend.put(key, [b"Date,Amount\n", b"01/01/2024,-12.50\n"])
+
+    assert backend.stat(key).size == 30
+    assert b"".join(backend.stream(key, chunk_size=7)) == b"Date,Amount\n01/01/2024,-12.50\n"
+    assert backend.get_range(key, 5, 6) == b"Amount"
+    assert backend.get_range(key, 12) == b"01/01/2024,-12.50\n"
+    assert [info.key for info in backend.list()] == [key]
+
+    backend.delete(key)
+    assert backend.stat(key) is None
+
+
+def test_backend_large_objects_are_written_in_parts(backend):
+    key = storage.original_key(str(uuid.uuid4()))
+    block = bytes(range(256)) * 4096  # 1 MiB
+    backend.put(key, (block for _ in range(12)))
+
+    assert backend.stat(key).size == 12 * len(block)
+    assert backend.get_range(key, 11 * len(block) + 10, 3) == block[10:13]
+
+
+def test_s3_multipart_upload_is_aborted_on_failure(s3_backend):
+    key = storage.original_key(str(uuid.uuid4()))
+
+    def chunks():
+        yield b"x" * (6 * 1024 * 1024)
+        raise RuntimeError("client went away")
+
+    with pytest.raises(RuntimeError):
+        s3_backend.put(key, chunks())
+
+    assert s3_backend.stat(key) is None
+    assert not s3_backend.client.list_multipart_uploads(Bucket="artifacts").get("Uploads")
+
+
+def test_ttl_evicts_only_stale_converted_outputs(root, monkeypatch):
+    monkeypatch.setattr(storage, "CONVERTED_TTL_SECONDS", 3600)
+    file_id = str(uuid.uuid4())
+    original = write(storage.original_key(file_id), 10, age=7200)
+    stale = write(storage.converted_key(file_id, "old.csv"), 10, age=7200)
+    fresh = write(storage.converted_key(file_id, "new.csv"), 10)
+    unmanaged = write("notes.csv", 10, age=7200)
+
+    result = storage.sweep()
+
+    assert result["evicted"]["ttl"] == {"files": 1, "bytes": 10}
+    assert not storage.exists(stale)
+    assert all(storage.exists(key) for key in (original, fresh, unmanaged))
+
+
+def test_quota_evicts_least_recently_used_first(root, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_QUOTA_BYTES", 250)
+    file_id = str(uuid.uuid4())
+    write(storage.original_key(file_id), 100)
+    oldest = write(storage.converted_key(file_id, "a.csv"), 100, age=300)
+    middle = write(storage.converted_key(file_id, "b.csv"), 100, age=200)
+    newest = write(storage.converted_key(file_id, "c.csv"), 100, age=100)
+    storage.touch(middle)
+
+    result = storage.sweep()
+
+    assert result["evicted"]["quota"]["files"] == 2
+    assert result["total_bytes"] == 200
+    assert not storage.exists(oldest) and not storage.exists(newest)
+    assert storage.exists(middle)
+
+
+def test_originals_are_never_evicted(root, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_QUOTA_BYTES", 50)
+    original = write(storage.original_key(str(uuid.uuid4())), 100)
+
+    result = storage.sweep()
+
+    assert storage.exists(original)
+    assert result["over_quota"]
+
+
+def test_write_through_only_keeps_complete_streams(root):
+    key = storage.converted_key(str(uuid.uuid4()), "out.csv")
+
+    assert b"".join(storage.write_through(iter([b"a,b\n", b"1,2\n"]), key)) == b"a,b\n1,2\n"
+    assert storage.read(key) == b"a,b\n1,2\n"
+
+    storage.delete(key)
+    stream = storage.write_through(iter([b"a,b\n", b"1,2\n"]), key)
+    next(stream)
+    stream.close()
+    assert os.listdir(root) == []
+
+
+def test_datasets_are_stored_a_chunk_of_rows_at_a_time(root, monkeypatch):
+    pd = pytest.importorskip("pandas")
+    import conversion_worker
+    from xero_converter import iter_records_json
+
+    monkeypatch.setattr(conversion_worker, "iter_records_json", functools.partial(iter_records_json, chunk_rows=2))
+    df = pd.DataFrame({"Date": ["2024-01-05", "2024-01-06", "2024-01-07"], "Amount": [12.5, None, -3.0]})
+    file_id = str(uuid.uuid4())
+    digest = conversion_worker.write_original_dataframe(file_id, df)
+
+    stored = storage.read(storage.original_key(file_id))
+    assert stored.splitlines()[1:4] == [
+        b'{"Date": "2024-01-05", "Amount": 12.5},',
+        b'{"Date": "2024-01-06", "Amount": null},',
+        b'{"Date": "2024-01-07", "Amount": -3.0}',
+    ]
+    assert digest == hashlib.sha256(stored).hexdigest()
+    restored = conversion_worker.read_original_dataframe(file_id)
+    assert restored["Date"].tolist() == df["Date"].tolist()
+    assert restored["Amount"].isna().tolist() == [False, True, False]
+
+    # Datasets stored as a single-line array still read back
+    storage.put(storage.original_key(file_id), [b'[{"Date": "2024-01-05", "Amount": 1}]'])
+    assert conversion_worker.read_original_dataframe(file_id)["Amount"].tolist() == [1]
@@ -0,0 +1,82 @@
+"""
+Summary rollups: a statement's summary is the same whether it is computed
+whole or merged from chunks, and folder totals follow files being added,
+re-summarized, moved and removed, including the date span.
+"""
+from datetime import datetime
+
+import mongomock
+import pytest
+
+from folder_summaries import FolderSummaries
+from xero_converter import format_frame, merge_summaries, summarize
+
+# Three decimals, so totals are rescaled to the summary's four
+MAPPING = {"A": "Date", "D": "Amount", "currency_exponent": 3}
+
+
+@pytest.fixture
+def dated(statement):
+    """A statement of (date, amount) rows"""
+    return lambda rows: statement(rows, columns=["Date", "Amount"])
+
+
+def summary_of(df):
+    _, values = format_frame(df, MAPPING)
+    return summarize(values, 3)
+
+
+def test_summary_totals_span_and_months(dated):
+    df = dated([
+        ("2023-12-30", "25.125"),
+        ("2024-01-05", "-4.50"),
+        ("2024-01-31 14:30", "100.00"),
+        ("not a date", "-1"),
+        ("2024-02-02", "n/a"),
+    ])
+    summary = summary_of(df)
+
+    assert summary["rows"] == 5
+    assert (summary["debit_units"], summary["credit_units"]) == (55_000, 1_251_250)
+    assert (summary["first_date"], summary["last_date"]) == (datetime(2023, 12, 30), datetime(2024, 2, 2))
+    assert summary["months"] == {
+        "2023-12": {"rows": 1, "debit_units": 0, "credit_units": 251_250},
+        "2024-01": {"rows": 2, "debit_units": 45_000, "credit_units": 1_000_000},
+        "2024-02": {"rows": 1, "debit_units": 0, "credit_units": 0},
+    }
+    assert summary["amount_exponent"] == 4
+    assert merge_summaries([summary_of(df.iloc[:2]), summary_of(df.iloc[2:4]), summary_of(df.iloc[4:])]) == summary
+
+
+def test_folder_totals_follow_files(dated):
+    db = mongomock.MongoClient()["rollups"]
+    folders = FolderSummaries(db.folder_summaries, db.files)
+    january = summary_of(dated([("2024-01-05", "-10.00"), ("2024-01-06", "20.00")]))
+    march = summary_of(dated([("2024-03-01", "-1.00")]))
+
+    db.files.insert_many([
+        {"id": "jan", "user_id": "u1", "folder_id": "f1", "summary": january},
+        {"id": "mar", "user_id": "u1", "folder_id": "f1", "summary": march},
+    ])
+    folders.apply("u1", [("f1", january, 1), ("f1", march, 1)])
+    rollup = folders.get("u1", "f1")
+    assert (rollup["files"], rollup["rows"], rollup["debit_units"], rollup["credit_units"]) == (2, 3, 110_000, 200_000)
+    assert rollup["amount_exponent"] == 4
+    assert (rollup["first_date"], rollup["last_date"]) == (datetime(2024, 1, 5), datetime(2024, 3, 1))
+    assert rollup["months"]["2024-03"] == {"rows": 1, "debit_units": 10_000, "credit_units": 0}
+
+    # Moving March to the unfiled root shrinks the folder's span
+    db.files.update_one({"id": "mar"}, {"$set": {"folder_id": None}})
+    folders.apply("u1", [("f1", march, -1), (None, march, 1)])
+    rollup = folders.get("u1", "f1")
+    assert (rollup["files"], rollup["debit_units"], rollup["last_date"]) == (1, 100_000, datetime(2024, 1, 6))
+    assert folders.get("u1", "root")["files"] == 1
+
+    # Removing the last dated file clears the span; a new one sets it again
+    db.files.delete_one({"id": "jan"})
+    folders.apply("u1", [("f1", january, -1)])
+    rollup = folders.get("u1", "f1")
+    assert rollup["files"] == 0 and "first_date" not in rollup
+    folders.apply("u1", [("f1", march, 1)])
+    assert folders.get("u1", "f1")["first_date"] == datetime(2024, 3, 1)
+    assert folders.get("u2", "f1") is None
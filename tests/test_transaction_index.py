@@ -0,0 +1,75 @@
+"""
+Duplicate detection: row identity hashes are stable across formatting
+differences, repeated identical rows are counted rather than collapsed, and
+the persistent index (Bloom filter in front of Mongo) never misses a hash,
+including ones inserted by another process.
+"""
+import mongomock
+import numpy as np
+
+from transaction_index import BloomFilter, TransactionIndex
+from xero_converter import format_frame, transaction_hashes
+
+MAPPING = {"A": "Date", "B": "Cheque No.", "C": "Description", "D": "Amount"}
+
+
+def hashes_of(df):
+    xero_df, values = format_frame(df, MAPPING)
+    return transaction_hashes(xero_df, values["units"])
+
+
+def test_hashes_ignore_formatting_but_count_repeats(statement):
+    first = statement([
+        ["2024-01-05", "", "Coffee", "-4.50"],
+        ["2024-01-05", "", "Coffee", "-4.50"],
+        ["2024-02-01", "", "Rent", "-1000.00"],
+        ["2024-02-02", "", "Fee", "n/a"],
+    ])
+    second = statement([
+        ["1 Feb 2024", None, " RENT ", "$-1,000"],
+        ["2024-01-05 09:30", None, "coffee", "-4.5"],
+        ["2024-02-02", None, "fee", " N/A"],
+    ])
+
+    a, b = hashes_of(first), hashes_of(second)
+
+    assert a.dtype == np.int64
+    assert a[0] != a[1]
+    assert b[0] == a[2]
+    assert b[1] == a[0]
+    assert b[2] == a[3]
+    assert (hashes_of(first) == a).all()
+
+
+def test_bloom_filter_has_no_false_negatives():
+    hashes = np.random.default_rng(7).integers(-2**63, 2**63 - 1, size=50_000, dtype=np.int64)
+    bloom = BloomFilter(100_000)
+    bloom.add(hashes[:25_000])
+
+    assert bloom.contains(hashes[:25_000]).all()
+    assert bloom.contains(hashes[25_000:]).mean() < 0.02
+
+
+def test_find_seen_across_statements_and_processes():
+    collection = mongomock.MongoClient()["dedupe"]["transaction_hashes"]
+    index = TransactionIndex(collection)
+    hashes = np.arange(1, 11, dtype=np.int64) * 7_919
+
+    index.add("u1", "acct", hashes[:6], "file-a")
+    seen = index.find_seen("u1", "acct", hashes[3:])
+
+    assert seen.tolist() == [True, True, True, False, False, False, False]
+    assert not index.find_seen("u1", "acct", hashes[:6], exclude_file_id="file-a").any()
+    assert not index.find_seen("u1", "other", hashes[:6]).any()
+    assert not index.find_seen("u2", "acct", hashes[:6]).any()
+
+    # Another worker indexes more rows; this process's cached filter catches up
+    TransactionIndex(collection).add("u1", "acct", hashes[6:], "file-b")
+    assert index.find_seen("u1", "acct", hashes).all()
+
+    # Re-adding keeps the first file and doesn't raise on the unique index
+    index.add("u1", "acct", hashes[:2], "file-c")
+    assert collection.count_documents({"file_id": "file-c"}) == 0
+
+    assert index.remove_file("u1", "file-a") == 6
+    assert index.find_seen("u1", "acct", hashes).tolist() == [False] * 6 + [True] * 4
@@ -0,0 +1,77 @@
+"""
+Transaction search: formatted rows become entries with parsed dates, exact
+amounts and description/cheque terms, and the Mongo index answers prefix,
+range and file queries a page at a time.
+"""
+from datetime import datetime
+
+import mongomock
+import pytest
+
+from transaction_search import TransactionSearch
+from xero_converter import amount_units, format_frame, search_entries, tokenize
+
+MAPPING = {"A": "Date", "B": "Cheque No.", "C": "Description", "D": "Amount"}
+
+
+@pytest.fixture
+def entries_of(statement):
+    """Search entries of raw statement rows"""
+    def entries(rows):
+        xero_df, values = format_frame(statement(rows), MAPPING)
+        return search_entries(xero_df, values, 2)
+    return entries
+
+
+def test_search_entries_from_formatted_rows(entries_of):
+    entries = entries_of([
+        ["2024-01-05", "CHQ-1001", "Payment to ACME Ltd", "-1000.00"],
+        ["not a date", None, None, "n/a"],
+    ])
+
+    assert entries[0] == {
+        "row": 0,
+        "date": datetime(2024, 1, 5),
+        "amount_units": -10_000_000,
+        "amount": "-1000.00",
+        "description": "Payment to ACME Ltd",
+        "cheque_no": "CHQ-1001",
+        "terms": ["payment", "to", "acme", "ltd", "chq", "1001"]
+    }
+    assert entries[1]["date"] is None and entries[1]["amount_units"] is None and entries[1]["terms"] == []
+    assert tokenize("  Café_Noir, café ") == ["café", "noir"]
+    assert amount_units(["12.3456", "-0.5", "x"]) == [123456, -5000, None]
+
+
+def test_search_filters_and_pages(entries_of):
+    index = TransactionSearch(mongomock.MongoClient()["search"]["transaction_search"])
+    index.index_file("u1", "jan", entries_of([
+        ["2024-01-05", "", "Amazon Marketplace", "-25.99"],
+        ["2024-01-06", "", "Salary", "3000.00"],
+        ["2024-01-07", "", "amazon prime", "-8.99"],
+    ]))
+    index.index_file("u1", "feb", entries_of([
+        ["2024-02-01", "", "AMAZON", "-100.00"],
+    ]))
+    index.index_file("u2", "other", entries_of([
+        ["2024-02-01", "", "Amazon", "-1.00"],
+    ]))
+
+    hits, has_more = index.search("u1", ["amaz"])
+    assert [(hit["file_id"], hit["row"]) for hit in hits] == [("feb", 0), ("jan", 2), ("jan", 0)]
+    assert not has_more
+
+    assert [hit["description"] for hit in index.search("u1", ["amazon", "pri"])[0]] == ["amazon prime"]
+    assert len(index.search("u1", min_units=-300_000, max_units=0)[0]) == 2
+    assert len(index.search("u1", date_from=datetime(2024, 1, 6), date_to=datetime(2024, 1, 7))[0]) == 2
+    assert len(index.search("u1", ["amazon"], file_ids=["jan"])[0]) == 2
+
+    first, more = index.search("u1", page_size=3)
+    last, no_more = index.search("u1", page=2, page_size=3)
+    assert more and not no_more and len(first) == 3 and len(last) == 1
+
+    # Re-indexing a file replaces its rows; removing it drops them
+    index.index_file("u1", "jan", entries_of([["2024-01-05", "", "Coffee", "-4.50"]]))
+    assert [hit["file_id"] for hit in index.search("u1", ["amazon"])[0]] == ["feb"]
+    assert index.remove_file("u1", "feb") == 1
+    assert index.search("u1", ["amazon"])[0] == []
@@ -0,0 +1,208 @@
+"""
+Upload endpoints: single-request, bulk and resumable chunked uploads of
+CSV, XLSX, CSV.GZ and ZIP files, and the errors they report.
+"""
+import gzip
+import hashlib
+import io
+import os
+import zipfile
+from datetime import datetime, timedelta
+
+import pytest
+
+STATEMENT = b"Date,Details,Amount,Type\n2024-01-05,Coffee,12.50,DR\n2024-01-06,Salary,1000,CR\n"
+
+
+def zip_archive(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, content in members.items():
+            zf.writestr(name, content)
+    return buffer.getvalue()
+
+
+def init_upload(api, filename, content, part_size):
+    init = api.client.post(
+        "/api/uploads/init",
+        data={"filename": filename, "size_bytes": len(content), "part_size": part_size},
+        headers=api.headers
+    )
+    assert init.status_code == 200, init.text
+    return init.json()["upload_id"], init.json()["total_parts"]
+
+
+def send_part(api, upload_id, number, part, checksum=None):
+    return api.client.put(
+        f"/api/uploads/{upload_id}/parts/{number}",
+        content=part,
+        headers={**api.headers, "X-Part-Checksum": checksum or hashlib.sha256(part).hexdigest()}
+    )
+
+
+def chunked_upload(api, filename, content, part_size=64):
+    upload_id, total_parts = init_upload(api, filename, content, part_size)
+    for number in range(1, total_parts + 1):
+        response = send_part(api, upload_id, number, content[(number - 1) * part_size:number * part_size])
+        assert response.status_code == 200, response.text
+    return upload_id, api.client.post(f"/api/uploads/{upload_id}/complete", headers=api.headers)
+
+
+def stored_parts(api, upload_id):
+    return sorted(name for name in os.listdir(api.root / "store") if name.startswith(f"upload_{upload_id}_"))
+
+
+def test_chunked_upload_resumes_and_rejects_bad_parts(api):
+    content = STATEMENT + b"2024-01-07,Rent,500,DR\n" * 6
+    upload_id, total_parts = init_upload(api, "statement.csv", content, 64)
+    parts = [content[i:i + 64] for i in range(0, len(content), 64)]
+    assert total_parts == len(parts) == 4
+
+    # A part whose checksum doesn't match is rejected and not kept
+    response = send_part(api, upload_id, 1, parts[0], checksum=hashlib.sha256(b"other").hexdigest())
+    assert response.status_code == 400
+    assert send_part(api, upload_id, 5, parts[0]).status_code == 400
+    assert send_part(api, upload_id, 2, parts[1] + b"x" * 64).status_code == 413
+    assert stored_parts(api, upload_id) == []
+
+    for number in (1, 2, 4):
+        assert send_part(api, upload_id, number, parts[number - 1]).status_code == 200
+    response = api.client.post(f"/api/uploads/{upload_id}/complete", headers=api.headers)
+    assert response.status_code == 400 and "[3]" in response.json()["detail"]
+
+    # Resume by sending only what the status doesn't list
+    status = api.client.get(f"/api/uploads/{upload_id}", headers=api.headers).json()
+    assert status["received_parts"] == [1, 2, 4] and status["status"] == "pending"
+    for number in set(range(1, total_parts + 1)) - set(status["received_parts"]):
+        assert send_part(api, upload_id, number, parts[number - 1]).status_code == 200
+    response = api.client.post(f"/api/uploads/{upload_id}/complete", headers=api.headers)
+
+    assert response.status_code == 200, response.text
+    assert api.db.files.find_one({"id": response.json()["file_id"]})["summary"]["rows"] == 8
+    assert stored_parts(api, upload_id) == []
+    assert api.client.post(f"/api/uploads/{upload_id}/complete", headers=api.headers).status_code == 409
+
+
+def test_abandoned_uploads_expire(api, monkeypatch):
+    monkeypatch.setattr(api.server, "UPLOAD_EXPIRY_SECONDS", 3600)
+    stale, _ = init_upload(api, "stale.csv", STATEMENT, 64)
+    fresh, _ = init_upload(api, "fresh.csv", STATEMENT, 64)
+    for upload_id in (stale, fresh):
+        assert send_part(api, upload_id, 1, STATEMENT[:64]).status_code == 200
+    done, _ = chunked_upload(api, "done.csv", STATEMENT)
+    api.db.uploads.update_many({"id": {"$in": [stale, done]}}, {"$set": {"updated_at": datetime(2024, 1, 1)}})
+
+    assert api.server.expire_uploads() == 1
+    assert api.db.uploads.find_one({"id": stale}) is None
+    assert stored_parts(api, stale) == []
+    assert api.client.get(f"/api/uploads/{stale}", headers=api.headers).status_code == 404
+    assert stored_parts(api, fresh) == [f"upload_{fresh}_part_000001"]
+    assert api.db.uploads.find_one({"id": done})["status"] == "complete"
+
+    # The fresh upload expires too once it has been idle long enough
+    assert api.server.expire_uploads(now=datetime.utcnow() + timedelta(hours=2)) == 1
+    assert api.db.uploads.find_one({"id": fresh}) is None
+
+
+def test_chunked_upload_of_archives(api):
+    archive = zip_archive({"jan.csv": STATEMENT, "feb.csv.gz": gzip.compress(STATEMENT), "notes.txt": b"x"})
+    upload_id, response = chunked_upload(api, "Statements.zip", archive)
+
+    assert response.status_code == 200, response.text
+    results = response.json()["results"]
+    assert [(r["filename"], r["success"]) for r in results] == [
+        ("jan.csv", True), ("feb.csv.gz", True), ("notes.txt", False)
+    ]
+    assert api.db.files.count_documents({}) == 2
+    upload = api.db.uploads.find_one({"id": upload_id})
+    assert upload["status"] == "complete" and len(upload["file_ids"]) == 2
+
+    _, response = chunked_upload(api, "march.csv.gz", gzip.compress(STATEMENT))
+    assert response.status_code == 200, response.text
+    file_record = api.db.files.find_one({"id": response.json()["file_id"]})
+    assert file_record["file_type"] == "csv" and file_record["summary"]["rows"] == 2
+
+
+def test_zip_members_over_the_limits_are_not_read(api, monkeypatch):
+    monkeypatch.setattr(api.server, "ARCHIVE_MAX_MEMBER_BYTES", 256 * 1024)
+    monkeypatch.setattr(api.server, "ARCHIVE_RATIO_MIN_BYTES", 64 * 1024)
+    monkeypatch.setattr(api.server, "ARCHIVE_MAX_TOTAL_BYTES", 200 * 1024 + 2 * len(STATEMENT))
+    rows = b"".join(b"2024-01-07,Rent %d,%d.%02d,DR\n" % (i, i * 7919 % 100_000, i % 100) for i in range(8_000))
+    archive = zip_archive({
+        "jan.csv": STATEMENT,
+        "huge.csv": STATEMENT + b"0" * 300 * 1024,
+        "bomb.csv": STATEMENT + b"\n" * 200 * 1024,
+        "big.csv": STATEMENT + rows[:200 * 1024],
+        "feb.csv": STATEMENT,
+    })
+    response = api.client.post(
+        "/api/upload", files={"file": ("statements.zip", archive, "application/zip")}, headers=api.headers
+    )
+
+    assert response.status_code == 200, response.text
+    errors = {r["filename"]: r.get("error") for r in response.json()["results"]}
+    assert errors["jan.csv"] is None
+    assert "larger than" in errors["huge.csv"]
+    assert "compresses more than" in errors["bomb.csv"]
+    assert errors["big.csv"] is None
+    assert "expands to more than" in errors["feb.csv"]
+    assert api.db.files.count_documents({}) == 2
+
+
+def test_bad_uploads_are_client_errors(api):
+    def upload(name, content):
+        return api.client.post("/api/upload", files={"file": (name, content)}, headers=api.headers)
+
+    assert upload("notes.txt", b"x").status_code == 400
+    assert upload("statements.zip", b"not a zip").status_code == 400
+    assert upload("statement.csv.gz", b"not gzip").status_code == 400
+    assert upload("statement.csv.gz", gzip.compress(STATEMENT)[:-12]).status_code == 400
+    assert api.client.post(
+        "/api/upload", files={"file": ("a.csv", STATEMENT)}, data={"folder_id": "missing"}, headers=api.headers
+    ).status_code == 404
+    assert api.client.post(
+        "/api/bulk-upload", files=[("files", ("a.csv", STATEMENT))], data={"folder_id": "missing"}, headers=api.headers
+    ).status_code == 404
+
+    response = api.client.post(
+        "/api/bulk-upload", files=[("files", ("a.zip", b"not a zip")), ("files", ("b.csv", STATEMENT))], headers=api.headers
+    )
+    assert [r["success"] for r in response.json()["results"]] == [False, True]
+
+    _, response = chunked_upload(api, "statements.zip", b"not a zip")
+    assert response.status_code == 400
+
+
+def test_bulk_upload_maps_insert_errors_back_to_files(api):
+    # A duplicate key on one record fails only that file in the unordered insert
+    api.db.files.create_index("original_filename", unique=True)
+    api.db.files.insert_one({"id": "existing", "user_id": "someone", "original_filename": "b.csv"})
+
+    response = api.client.post(
+        "/api/bulk-upload",
+        files=[("files", ("a.csv", STATEMENT)), ("files", ("b.csv", STATEMENT)), ("files", ("c.csv", STATEMENT))],
+        headers=api.headers
+    )
+
+    assert response.status_code == 200, response.text
+    results = response.json()["results"]
+    assert [(r["filename"], r["success"]) for r in results] == [("a.csv", True), ("b.csv", False), ("c.csv", True)]
+    assert "duplicate" in results[1]["error"].lower()
+    stored = {record["id"] for record in api.db.files.find({"user_id": {"$ne": "someone"}})}
+    assert stored == {results[0]["file_id"], results[2]["file_id"]}
+    originals = sorted(path.name for path in (api.root / "store").iterdir() if path.name.endswith("_original.json"))
+    assert originals == sorted(f"{file_id}_original.json" for file_id in stored)
+    assert set(api.db.transaction_search.distinct("file_id")) == stored
+    assert api.db.folder_summaries.find_one({"folder_id": "root"})["files"] == 2
+
+
+def test_zip_members_are_spooled_to_disk_with_their_size_checked(api, monkeypatch):
+    with zipfile.ZipFile(io.BytesIO(zip_archive({"jan.csv": STATEMENT * 4}))) as zf:
+        info = zf.infolist()[0]
+        monkeypatch.setattr(api.server, "ARCHIVE_COPY_CHUNK_BYTES", 16)
+        api.server.spool_archive_member(zf, info, api.root / "jan.csv")
+        assert (api.root / "jan.csv").read_bytes() == STATEMENT * 4
+
+        monkeypatch.setattr(api.server, "ARCHIVE_MAX_MEMBER_BYTES", len(STATEMENT))
+        with pytest.raises(ValueError):
+            api.server.spool_archive_member(zf, info, api.root / "jan.csv")
@@ -0,0 +1,95 @@
+"""
+Watch-folder daemon: settled files are ingested into the configured user's
+folder (and converted with the matching template), temporary and unchanged
+files are left alone, and the checkpoint carries state across restarts.
+"""
+import json
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("fastapi")
+mongomock = pytest.importorskip("mongomock")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+import server  # noqa: E402
+import storage  # noqa: E402
+import watch_folder  # noqa: E402
+
+STATEMENT = b"Date,Details,Amount,Type\n2024-01-05,Coffee,12.50,DR\n2024-01-06,Salary,1000,CR\n"
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    db = mongomock.MongoClient()["watch"]
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setenv("STORAGE_ROOT", str(tmp_path / "store"))
+    (tmp_path / "store").mkdir()
+    monkeypatch.setattr(storage, "_backend", storage.LocalStorage(str(tmp_path / "store")))
+    db.users.insert_one({"id": "u1", "email": "books@example.com", "hashed_password": "x", "created_at": None})
+    db.folders.insert_one({"id": "f1", "user_id": "u1", "name": "Inbox"})
+    (tmp_path / "drop").mkdir()
+    return tmp_path, db
+
+
+def daemon(tmp_path, **watch):
+    config = {
+        "checkpoint": str(tmp_path / "checkpoint.json"),
+        "settle_seconds": 0,
+        "poll_interval": 0.05,
+        "workers": 1,
+        "watches": [{"path": str(tmp_path / "drop"), "user_email": "books@example.com", "folder_id": "f1", **watch}]
+    }
+    return watch_folder.WatchDaemon(config)
+
+
+def test_ingests_and_converts_settled_files_once(env):
+    tmp_path, db = env
+    (tmp_path / "drop" / "anz_jan.csv").write_bytes(STATEMENT)
+    (tmp_path / "drop" / "other.csv.part").write_bytes(STATEMENT)
+    (tmp_path / "drop" / "empty.csv").write_bytes(b"")
+    templates = [{"name": "ANZ", "match": "anz_*", "column_mapping": {"A": "Date", "C": "Details", "D": "Amount"}}]
+
+    daemon(tmp_path, convert=True, templates=templates).run(once=True)
+
+    file_record = db.files.find_one({"original_filename": "anz_jan.csv"})
+    assert file_record["folder_id"] == "f1" and file_record["user_id"] == "u1"
+    assert db.files.count_documents({}) == 1
+    conversion = db.conversions.find_one({"file_id": file_record["id"]})
+    assert conversion["column_mapping"]["C"] == "Details"
+    assert "transaction_type" not in conversion["column_mapping"]
+
+    # A restart doesn't ingest the same file again; a changed file is a new upload
+    daemon(tmp_path, convert=True, templates=templates).run(once=True)
+    assert db.files.count_documents({}) == 1
+
+    (tmp_path / "drop" / "anz_jan.csv").write_bytes(STATEMENT + b"2024-01-07,Rent,500,DR\n")
+    daemon(tmp_path).run(once=True)
+    assert db.files.count_documents({}) == 2
+
+
+def test_recovers_files_that_were_in_flight(env):
+    tmp_path, db = env
+    for name in ("done.csv", "lost.csv"):
+        (tmp_path / "drop" / name).write_bytes(STATEMENT)
+    checkpoint = watch_folder.Checkpoint(str(tmp_path / "checkpoint.json"))
+    for name, file_id in (("done.csv", "id-done"), ("lost.csv", "id-lost")):
+        path = str(tmp_path / "drop" / name)
+        checkpoint.record(path, os.stat(path), status="pending", file_id=file_id)
+    checkpoint.save()
+    db.files.insert_one({"id": "id-done", "user_id": "u1", "original_filename": "done.csv"})
+
+    daemon(tmp_path).run(once=True)
+
+    assert sorted(record["id"] for record in db.files.find()) == ["id-done", "id-lost"]
+    entries = json.loads((tmp_path / "checkpoint.json").read_text())["files"]
+    assert {entry["status"] for entry in entries.values()} == {"ingested"}
+
+
+def test_rejects_unknown_users(env):
+    tmp_path, _ = env
+    with pytest.raises(ValueError, match="not found"):
+        watch_folder.WatchDaemon({"watches": [{"path": str(tmp_path / "drop"), "user_email": "nobody@example.com"}]})
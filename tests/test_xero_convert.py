@@ -0,0 +1,85 @@
+"""
+Offline batch conversion CLI: input expansion, template selection, output
+layout, failure reporting and independence from the web stack.
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("pandas")
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+import xero_convert  # noqa: E402
+
+STATEMENT = b"Date,Details,Amount,Type\n2024-01-05,Coffee,12.50,DR\n2024-01-06,Salary,1000,CR\n"
+
+
+@pytest.fixture
+def statements(tmp_path):
+    (tmp_path / "in" / "sub").mkdir(parents=True)
+    (tmp_path / "in" / "anz_jan.csv").write_bytes(STATEMENT)
+    (tmp_path / "in" / "sub" / "other.csv").write_bytes(STATEMENT)
+    (tmp_path / "in" / "readme.txt").write_text("not a statement")
+    return tmp_path
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_converts_a_directory_with_templates(statements, workers):
+    template = statements / "templates.json"
+    template.write_text(json.dumps([{
+        "name": "ANZ",
+        "match": "anz_*.csv",
+        "column_mapping": {"A": "Date", "C": "Details", "D": "Amount", "transaction_type": "Type"},
+        "dc_rules": [{"match": "exact", "pattern": "dr", "side": "credit"}]
+    }]))
+    report = statements / "report.json"
+
+    status = xero_convert.main([
+        str(statements / "in"), "-o", str(statements / "out"), "-t", str(template),
+        "-w", str(workers), "--report", str(report), "-q"
+    ])
+
+    assert status == 0
+    anz = (statements / "out" / "anz_jan_formatted.csv").read_text().splitlines()
+    assert anz[1:] == ["05/01/2024,,Coffee,12.50,C", "06/01/2024,,Salary,1000.00,C"]
+    other = (statements / "out" / "sub" / "other_formatted.csv").read_text().splitlines()
+    assert other[1].endswith(",-12.50,D")
+
+    results = json.loads(report.read_text())["results"]
+    assert [(r["template"], r["rows"]) for r in results] == [("ANZ", 2), (None, 2)]
+
+
+def test_failures_and_existing_outputs(statements):
+    (statements / "in" / "empty.csv").write_bytes(b"")
+    (statements / "in" / "sub" / "other_formatted.csv").write_bytes(b"old")
+
+    status = xero_convert.main([str(statements / "in"), "--skip-existing", "-w", "1", "-q"])
+
+    assert status == 1
+    assert (statements / "in" / "anz_jan_formatted.csv").exists()
+    assert (statements / "in" / "sub" / "other_formatted.csv").read_bytes() == b"old"
+    assert sorted(os.listdir(statements / "in" / "sub")) == ["other.csv", "other_formatted.csv"]
+    assert not (statements / "in" / "empty_formatted.csv").exists()
+    assert not any(name.endswith(".part") for name in os.listdir(statements / "in"))
+
+
+def test_invalid_template_is_rejected(statements, capsys):
+    template = statements / "bad.json"
+    template.write_text(json.dumps({"column_mapping": {"D": "Amount"}, "dc_rules": [{"pattern": "dr", "side": "up"}]}))
+
+    assert xero_convert.main([str(statements / "in"), "-t", str(template)]) == 2
+    assert "side must be" in capsys.readouterr().err
+
+
+def test_does_not_load_the_web_stack():
+    code = (
+        "import sys, xero_convert, xero_converter, conversion_worker; "
+        "print(sorted(m for m in ('server', 'pymongo', 'fastapi') if m in sys.modules))"
+    )
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=BACKEND_DIR)
+    assert output.decode().strip() == "[]"
@@ -0,0 +1,160 @@
+"""
+Conversion engine behaviour: amounts parsed to integer minor units, the
+Xero sign rules, the Reference column, the chunked generator API and
+splitting rows by period.
+"""
+import io
+import os
+import sys
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from xero_converter import (  # noqa: E402
+    apply_xero_format, auto_map_columns, currency_exponent, dataframe_from_records, encode_low_cardinality,
+    format_chunks, format_frame, format_frame_chunks, iter_csv_bytes, iter_csv_chunks, iter_file_chunks,
+    iter_frame_chunks, map_unique, parse_file_content, parse_minor_units, partition_by_period, period_labels,
+    render_minor_units, rescale_units, select_period, with_auto_mapping
+)
+
+
+def test_parse_minor_units_is_exact():
+    values = pd.Series(["1,234.50", "$-7", ".5", "12.505", 1000, 12.5, "0.1", None, "abc", "1.2.3", "-"], dtype=object)
+
+    units = parse_minor_units(values)
+
+    assert units.tolist()[:7] == [123450, -700, 50, 1251, 100000, 1250, 10]
+    assert units.isna().tolist()[7:] == [True] * 4
+
+
+def test_amounts_too_large_for_int64_do_not_parse():
+    values = pd.Series(["99999999999999999", "12345678901234567890", "9999999999999999", "-00099999999999999999.99"])
+
+    units = parse_minor_units(values)
+
+    assert units.isna().tolist() == [True, True, False, True]
+    assert units[2] == 999_999_999_999_999_900
+    assert rescale_units(units, 2, 4).isna().tolist() == [True, True, True, True]
+    assert rescale_units(pd.Series([-125, 10**14], dtype="Int64"), 2, 4).tolist() == [-12_500, 10**16]
+
+    # They fall back to the raw text rather than wrapping into a wrong amount
+    xero_df = apply_xero_format(pd.DataFrame({"Amount": values}), {"D": "Amount"})
+    assert xero_df["Amount"].tolist()[:2] == ["99999999999999999", "12345678901234567890"]
+
+
+def test_render_minor_units_respects_the_exponent():
+    assert render_minor_units(pd.Series([123450, -5, 0], dtype="Int64")).tolist() == ["1234.50", "-0.05", "0.00"]
+    assert render_minor_units(parse_minor_units(pd.Series(["1234.5", "-7"]), 0), 0).tolist() == ["1235", "-7"]
+
+
+def test_amount_signs_and_references():
+    df = pd.DataFrame({
+        "Date": ["2024-01-05"] * 5,
+        "Amount": ["12.50", "-1,000", "-3.20", "abc", "4"],
+        "Type": ["DR", "CR", None, "Debit", "Misc"],
+    })
+
+    xero_df = apply_xero_format(df, {"A": "Date", "D": "Amount", "transaction_type": "Type"})
+
+    assert xero_df["Amount"].tolist() == ["-12.50", "1000.00", "-3.20", "abc", "4.00"]
+    assert xero_df["Reference"].tolist() == ["D", "C", "D", "D", "C"]
+
+
+def test_currency_exponent_from_mapping():
+    df = pd.DataFrame({"Amount": ["1500", "-20"]})
+
+    xero_df = apply_xero_format(df, {"D": "Amount", "currency_exponent": 0})
+
+    assert xero_df["Amount"].tolist() == ["1500", "-20"]
+    mappings = ({}, {"currency_exponent": None}, {"currency_exponent": " 3"})
+    assert [currency_exponent(mapping) for mapping in mappings] == [2, 2, 3]
+    for value in ("x", "2.5", 5, -1, True):
+        with pytest.raises(ValueError):
+            currency_exponent({"currency_exponent": value})
+
+
+def test_low_cardinality_text_columns_are_dictionary_encoded():
+    df = pd.DataFrame({
+        "Type": ["DR", "CR", None, "DR"] * 50,
+        "Description": [f"Payment {i}" for i in range(200)],
+        "Amount": [1.5] * 200,
+        "Mixed": ["1", 2, "1", 2] * 50,
+    })
+
+    encoded = encode_low_cardinality(df)
+
+    assert isinstance(encoded["Type"].dtype, pd.CategoricalDtype)
+    # Unique text, numbers and mixed types are left alone
+    assert not any(isinstance(encoded[col].dtype, pd.CategoricalDtype) for col in ("Description", "Amount", "Mixed"))
+
+
+def test_map_unique_evaluates_each_distinct_value_once():
+    seen = []
+
+    def upper(uniques):
+        seen.extend(uniques)
+        return uniques.str.upper()
+
+    result = map_unique(pd.Series(["dr", "cr", None, "dr", "cr"]), upper)
+
+    assert sorted(seen) == ["cr", "dr"]
+    assert result.tolist() == ["DR", "CR", None, "DR", "CR"]
+
+
+def test_encoded_frames_format_like_plain_ones():
+    records = [
+        {"Date": "2024-01-05", "Ref": None, "Amount": "12.50", "Type": "DR"},
+        {"Date": "2024-01-05", "Ref": "A1", "Amount": "-3", "Type": "CR"},
+        {"Date": None, "Ref": "A2", "Amount": "7", "Type": "DR"},
+        {"Date": "2024-01-05", "Ref": "A3", "Amount": "1", "Type": None},
+    ]
+    mapping = {"A": "Date", "B": "Ref", "D": "Amount", "transaction_type": "Type"}
+
+    plain = apply_xero_format(pd.DataFrame.from_records(records), mapping)
+    encoded = apply_xero_format(dataframe_from_records(records), mapping)
+
+    assert encoded.astype(object).equals(plain.astype(object))
+    assert encoded["Date"].isna().tolist() == [False, False, True, False]
+    assert encoded["Date"].dropna().unique().tolist() == ["05/01/2024"]
+
+
+def test_chunked_pipeline_matches_whole_frame_output():
+    rows = "".join(f"2024-01-{day % 28 + 1:02d},Item {day},{day}.5,{'DR' if day % 3 else 'CR'}\n" for day in range(25))
+    content = ("Date,Description,Amount,Type\n" + rows).encode()
+    df = parse_file_content(content, "csv")
+    column_mapping = auto_map_columns(df)
+    expected = b"".join(iter_csv_chunks(apply_xero_format(df, column_mapping)))
+
+    from_frame = b"".join(iter_csv_bytes(format_chunks(iter_frame_chunks(df, 7), column_mapping)))
+    streamed_mapping, chunks = with_auto_mapping(iter_file_chunks(io.BytesIO(content), "csv", chunk_rows=7))
+    from_file = b"".join(iter_csv_bytes(format_chunks(chunks, streamed_mapping)))
+
+    assert streamed_mapping == column_mapping
+    assert from_frame == expected
+    assert from_file == expected
+    assert expected.count(b"Date,Cheque No.") == 1
+
+
+def test_periods_partition_in_order_and_match_rebuilt_chunks():
+    df = parse_file_content(
+        b"Date,Description,Amount\n2024-04-02,b,2\nnot a date,c,3\n2023-12-31,a,1\n2024-01-15 10:30,d,4\n", "csv"
+    )
+    mapping = auto_map_columns(df)
+    xero_df, values = format_frame(df, mapping)
+
+    assert period_labels(values["date"], "month").tolist() == ["2024-04", "undated", "2023-12", "2024-01"]
+    quarters = period_labels(values["date"], "quarter")
+    partitions = partition_by_period(xero_df, quarters)
+    assert [(label, rows.index.tolist()) for label, rows in partitions] == [
+        ("2023-Q4", [2]), ("2024-Q1", [3]), ("2024-Q2", [0]), ("undated", [1])
+    ]
+    with pytest.raises(ValueError):
+        period_labels(values["date"], "week")
+
+    # A period rebuilt chunk by chunk is the same CSV as its partition
+    formatted_chunks = format_frame_chunks(iter_frame_chunks(df, 1), mapping)
+    rebuilt = b"".join(iter_csv_bytes(select_period(formatted_chunks, "quarter", "2024-Q1")))
+    assert rebuilt == b"".join(iter_csv_chunks(partitions[1][1]))